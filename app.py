@@ -6,7 +6,7 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
-from utils.timezone import utc_to_ist
+from utils.timezone import format_datetime_for_timezone
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -42,6 +42,15 @@ if not session_secret:
 app.secret_key = session_secret
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
+# Stream uploads straight into the file store, with per-file and per-request size limits
+from utils.upload_stream import UploadRequest, MAX_UPLOAD_REQUEST_SIZE
+app.request_class = UploadRequest
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_REQUEST_SIZE
+
+# Attachment downloads: sent by the worker or offloaded to the front proxy (FILE_DELIVERY)
+from utils.file_delivery import configure_file_delivery
+configure_file_delivery(app)
+
 # Configure the database - PostgreSQL primary database
 app.config["SQLALCHEMY_DATABASE_URI"] = get_database_uri()
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
@@ -53,25 +62,40 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 # Initialize the app with the extension
 db.init_app(app)
 
-def utc_to_ist(dt):
-    """Convert UTC datetime to IST"""
-    if dt:
-        from datetime import timezone, timedelta
-        # IST is UTC+5:30
-        ist_timezone = timezone(timedelta(hours=5, minutes=30))
-        if dt.tzinfo is None:
-            # Assume UTC if no timezone info
-            dt = dt.replace(tzinfo=timezone.utc)
-        return dt.astimezone(ist_timezone)
-    return dt
+# Per-request query counting and N+1 detection (debug/testing or QUERY_DEBUG=1)
+from utils.query_debug import init_query_debug
+app.config["QUERY_DEBUG"] = os.environ.get("QUERY_DEBUG") == "1"
+init_query_debug(app)
+
+# Notifications are queued in the email_outbox table and delivered after commit
+from utils.email_outbox import init_email_outbox
+init_email_outbox(app, db)
+
+# Master data and settings are cached per worker behind a shared version counter
+from utils.master_data_cache import init_master_data_cache
+init_master_data_cache(db)
 
 @app.template_filter('to_ist')
 def to_ist_filter(dt):
-    if dt:
-        converted_dt = utc_to_ist(dt)
-        if converted_dt:
-            return converted_dt.strftime('%Y-%m-%d %H:%M:%S')
-    return ''
+    """Format a UTC datetime in the configured timezone"""
+    return format_datetime_for_timezone(dt)
+
+@app.template_global('keyset_page_url')
+def keyset_page_url(prefix='', after=None, before=None):
+    """URL for the current view with one pager's keyset cursor replaced"""
+    from flask import request, url_for
+    args = request.args.to_dict()
+    args.pop(f'{prefix}after', None)
+    args.pop(f'{prefix}before', None)
+    if after:
+        args[f'{prefix}after'] = after
+    if before:
+        args[f'{prefix}before'] = before
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+# Signed, expiring file links for templates (served without database lookups)
+from utils.signed_urls import signed_file_url
+app.add_template_global(signed_file_url, 'file_url')
 
 # Add custom Jinja2 filter for line breaks
 @app.template_filter('nl2br')
@@ -87,8 +111,23 @@ with app.app_context():
     db.create_all()
     logging.info("Database tables created")
     
+    # Columns added to attachments for the content-addressed file store
+    from utils.file_store import ensure_attachment_columns
+    try:
+        ensure_attachment_columns()
+    except Exception as e:
+        logging.error(f"Error adding attachment storage columns: {e}")
+    
+    # create_all() skips indexes on tables that already exist, so add any that are missing
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=db.engine, checkfirst=True)
+            except Exception as e:
+                logging.error(f"Error creating index {index.name}: {e}")
+    
     # Create default master data
-    from models import User, MasterDataCategory, MasterDataPriority, MasterDataStatus, EmailSettings, TimezoneSettings, BackupSettings
+    from models import User, MasterDataCategory, MasterDataPriority, MasterDataStatus, EmailSettings, TimezoneSettings, BackupSettings, TicketCounter
     from werkzeug.security import generate_password_hash
     
     # Create default categories
@@ -162,6 +201,10 @@ with app.app_context():
         )
         db.session.add(backup_settings)
     
+    # Version counter that invalidates every worker's master data cache
+    if db.session.get(TicketCounter, 'master_data_version') is None:
+        db.session.add(TicketCounter(name='master_data_version', value=0))
+    
     # Create default users if they don't exist
     if User.query.count() == 0:
         # Create super admin
@@ -207,3 +250,33 @@ with app.app_context():
     except Exception as e:
         db.session.rollback()
         logging.error(f"Error creating default data: {e}")
+    
+    # Ticket number sequence (PostgreSQL) or counter row (other databases)
+    from utils.ticket_numbers import ensure_ticket_number_allocator
+    try:
+        ensure_ticket_number_allocator()
+    except Exception as e:
+        logging.error(f"Error preparing ticket number allocator: {e}")
+    
+    # Full-text search table (PostgreSQL tsvector/GIN or SQLite FTS5)
+    from utils.search import ensure_search_index
+    try:
+        ensure_search_index()
+    except Exception as e:
+        logging.error(f"Error preparing search index: {e}")
+    
+    # Seed the daily ticket rollup for databases that predate it
+    from utils.ticket_rollup import ensure_ticket_rollup
+    try:
+        ensure_ticket_rollup()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error building ticket rollup: {e}")
+    
+    # Seed the daily notification rollup for databases that predate it
+    from utils.notification_rollup import ensure_notification_rollup
+    try:
+        ensure_notification_rollup()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error building notification rollup: {e}")
@@ -0,0 +1,119 @@
+import click
+from app import app
+
+
+@app.cli.command('rebuild-ticket-stats')
+def rebuild_ticket_stats_command():
+    """Rebuild the ticket_daily_stats rollup table from scratch"""
+    from utils.ticket_rollup import rebuild_ticket_rollup
+    row_count = rebuild_ticket_rollup()
+    click.echo(f'Ticket rollup rebuilt: {row_count} rows')
+
+
+@app.cli.command('explain-hot-queries')
+def explain_hot_queries_command():
+    """EXPLAIN the hot ticket/attachment/notification queries and check they use indexes"""
+    from utils.query_plans import explain_hot_queries
+    failures = 0
+    for name, uses_index, plan_lines in explain_hot_queries():
+        click.echo(f"{'OK  ' if uses_index else 'FAIL'} {name}")
+        for line in plan_lines:
+            click.echo(f'       {line}')
+        if not uses_index:
+            failures += 1
+    if failures:
+        raise SystemExit(f'{failures} hot queries do not use an index')
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-index all tickets for full-text search"""
+    from utils.search import rebuild_search_index
+    ticket_count = rebuild_search_index()
+    click.echo(f'Search index rebuilt: {ticket_count} tickets')
+
+
+@app.cli.command('import-r05')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Validate the workbook without importing anything')
+@click.option('--default-user', help='Username to attribute tickets to when the raiser is unknown')
+def import_r05_command(path, dry_run, default_user):
+    """Import tickets from an R05 complaint register workbook"""
+    from models import User
+    from utils.ticket_import import import_r05_workbook
+    default_user_id = None
+    if default_user:
+        user = User.query.filter_by(username=default_user).first()
+        if user is None:
+            raise SystemExit(f'Unknown user {default_user}')
+        default_user_id = user.id
+    report = import_r05_workbook(path, dry_run=dry_run, default_user_id=default_user_id)
+    for row_number, reason in report.rejected:
+        click.echo(f'REJECTED row {row_number}: {reason}')
+    for row_number, message in report.warnings:
+        click.echo(f'WARNING  row {row_number}: {message}')
+    click.echo(f'{report.rows_read} rows read, {report.accepted} accepted, {len(report.rejected)} rejected, '
+               f'{report.duplicates} duplicates, {report.imported} imported{" (dry run)" if dry_run else ""}')
+
+
+@app.cli.command('deliver-emails')
+@click.option('--once', is_flag=True, help='Deliver what is due now and exit instead of polling')
+@click.option('--interval', default=5, show_default=True, help='Seconds between outbox polls')
+def deliver_emails_command(once, interval):
+    """Deliver queued notification emails from the email outbox"""
+    import time
+    from app import db
+    from utils.email_outbox import drain_outbox
+    while True:
+        delivered = drain_outbox()
+        if delivered:
+            click.echo(f'Email outbox: {delivered} messages processed')
+        if once:
+            return
+        db.session.remove()
+        time.sleep(interval)
+
+
+@app.cli.command('rebuild-notification-stats')
+def rebuild_notification_stats_command():
+    """Rebuild the daily notification rollup for the days still in the notification log"""
+    from utils.notification_rollup import rebuild_notification_rollup
+    row_count = rebuild_notification_rollup()
+    click.echo(f'Notification rollup rebuilt: {row_count} rows')
+
+
+@app.cli.command('purge-notification-logs')
+@click.option('--days', type=int, help='Retention window in days (default NOTIFICATION_LOG_RETENTION_DAYS)')
+def purge_notification_logs_command(days):
+    """Delete notification log rows older than the retention window, in batches (schedule it daily)"""
+    from utils.notification_retention import NOTIFICATION_LOG_RETENTION_DAYS, purge_notification_logs
+    deleted = purge_notification_logs(days or NOTIFICATION_LOG_RETENTION_DAYS)
+    click.echo(f'Notification logs purged: {deleted} rows')
+
+
+@app.cli.command('partition-notification-logs')
+def partition_notification_logs_command():
+    """Convert the notification log to monthly partitions (PostgreSQL, run once)"""
+    from utils.notification_retention import partition_notification_logs
+    try:
+        created = partition_notification_logs()
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    click.echo(f'Notification log partitioned; partitions created: {", ".join(created) or "none"}')
+
+
+@app.cli.command('migrate-uploads')
+@click.option('--keep-originals', is_flag=True, help='Leave the original files in uploads/ after copying them into the store')
+def migrate_uploads_command(keep_originals):
+    """Move legacy uploads into the content-addressed file store"""
+    from utils.file_store import migrate_legacy_uploads
+    migrated, duplicates, freed = migrate_legacy_uploads(keep_originals=keep_originals)
+    click.echo(f'Uploads migrated: {migrated} files, {duplicates} duplicates, {freed} bytes freed')
+
+
+@app.cli.command('collect-file-garbage')
+def collect_file_garbage_command():
+    """Delete files left in the store by failed uploads"""
+    from utils.file_store import collect_garbage
+    removed = collect_garbage()
+    click.echo(f'Orphaned stored files removed: {removed}')
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileAllowed
+from flask_wtf.file import FileField, FileAllowed, FileRequired
 from wtforms import StringField, TextAreaField, SelectField, SubmitField, EmailField, PasswordField, BooleanField, IntegerField, TimeField
 from wtforms.validators import DataRequired, Email, Length, EqualTo, Optional, NumberRange
 from datetime import time
@@ -21,15 +21,11 @@ class TicketForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(TicketForm, self).__init__(*args, **kwargs)
-        from models import MasterDataCategory, MasterDataPriority
+        from utils.master_data_cache import get_active_categories, get_active_priorities
         
-        # Load categories from master data
-        categories = MasterDataCategory.query.filter_by(is_active=True).all()
-        self.category.choices = [(cat.name, cat.name) for cat in categories]
-        
-        # Load priorities from master data
-        priorities = MasterDataPriority.query.filter_by(is_active=True).order_by(MasterDataPriority.level).all()
-        self.priority.choices = [(pri.name, pri.name) for pri in priorities]
+        # Load categories and priorities from the cached master data
+        self.category.choices = [(name, name) for name in get_active_categories()]
+        self.priority.choices = [(name, name) for name in get_active_priorities()]
 
 class UpdateTicketForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired(), Length(min=5, max=200)])
@@ -41,19 +37,12 @@ class UpdateTicketForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(UpdateTicketForm, self).__init__(*args, **kwargs)
-        from models import MasterDataCategory, MasterDataPriority, MasterDataStatus
-        
-        # Load categories from master data
-        categories = MasterDataCategory.query.filter_by(is_active=True).all()
-        self.category.choices = [(cat.name, cat.name) for cat in categories]
+        from utils.master_data_cache import get_active_categories, get_active_priorities, get_active_statuses
         
-        # Load priorities from master data
-        priorities = MasterDataPriority.query.filter_by(is_active=True).order_by(MasterDataPriority.level).all()
-        self.priority.choices = [(pri.name, pri.name) for pri in priorities]
-        
-        # Load statuses from master data
-        statuses = MasterDataStatus.query.filter_by(is_active=True).all()
-        self.status.choices = [(stat.name, stat.name) for stat in statuses]
+        # Load categories, priorities and statuses from the cached master data
+        self.category.choices = [(name, name) for name in get_active_categories()]
+        self.priority.choices = [(name, name) for name in get_active_priorities()]
+        self.status.choices = [(name, name) for name in get_active_statuses()]
 
 class CommentForm(FlaskForm):
     comment = TextAreaField('Comment', validators=[DataRequired(), Length(min=5)])
@@ -105,7 +94,8 @@ class AssignTicketForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(AssignTicketForm, self).__init__(*args, **kwargs)
-        self.assigned_to.choices = [(user.id, user.full_name) for user in User.query.filter(User.role.in_(['super_admin'])).all()]
+        from utils.master_data_cache import get_super_admins
+        self.assigned_to.choices = [(admin.id, admin.full_name) for admin in get_super_admins()]
 
 
 # Master Data Forms
@@ -138,6 +128,13 @@ class MasterDataStatusForm(FlaskForm):
     submit = SubmitField('Save Status')
 
 
+class TicketImportForm(FlaskForm):
+    workbook = FileField('R05 Complaint Register (.xlsx)', validators=[FileRequired(), FileAllowed(['xlsx'], 'Excel workbooks (.xlsx) only!')])
+    dry_run = BooleanField('Dry run (validate only, import nothing)', default=True)
+    assign_unknown_to_me = BooleanField('Attribute tickets from unknown users to me')
+    submit = SubmitField('Import Tickets')
+
+
 
 
 
@@ -198,3 +195,12 @@ class BackupSettingsForm(FlaskForm):
                                     render_kw={'placeholder': 'admin@company.com'})
     is_active = BooleanField('Active', default=True)
     submit = SubmitField('Save Backup Settings')
+
+class NotificationPreferenceForm(FlaskForm):
+    digest = SelectField('Email Notifications', validators=[DataRequired()])
+    submit = SubmitField('Save Preference')
+
+    def __init__(self, *args, **kwargs):
+        super(NotificationPreferenceForm, self).__init__(*args, **kwargs)
+        from utils.notification_digest import DIGEST_CHOICES
+        self.digest.choices = DIGEST_CHOICES
@@ -4,6 +4,10 @@ from app import db
 
 class User(db.Model):
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_username', 'username'),  # login lookup
+        db.Index('ix_users_role', 'role'),  # admin lists and counts
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), nullable=False)
@@ -58,6 +62,14 @@ class User(db.Model):
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Listings filter on one column and sort newest first
+        db.Index('ix_tickets_user_id_created_at', 'user_id', 'created_at'),
+        db.Index('ix_tickets_assigned_to_created_at', 'assigned_to', 'created_at'),
+        db.Index('ix_tickets_status_created_at', 'status', 'created_at'),
+        db.Index('ix_tickets_created_at', 'created_at'),
+        db.Index('ix_tickets_image_filename', 'image_filename'),  # view_image lookup
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     ticket_number = db.Column(db.String(20), nullable=False, unique=True)  # GTN-000001 format
@@ -96,6 +108,10 @@ class Ticket(db.Model):
 
 class TicketComment(db.Model):
     __tablename__ = 'ticket_comments'
+    __table_args__ = (
+        db.Index('ix_ticket_comments_ticket_id_created_at', 'ticket_id', 'created_at'),
+        db.Index('ix_ticket_comments_user_id', 'user_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
@@ -111,12 +127,30 @@ class TicketComment(db.Model):
 
 class Attachment(db.Model):
     __tablename__ = 'attachments'
+    __table_args__ = (
+        db.Index('ix_attachments_filename', 'filename'),  # download_attachment lookup
+        db.Index('ix_attachments_ticket_id', 'ticket_id'),
+        db.Index('ix_attachments_sha256', 'sha256'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
-    filename = db.Column(db.String(255), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)  # unique handle used in URLs
+    original_name = db.Column(db.String(255), nullable=True)  # name as uploaded
+    sha256 = db.Column(db.String(64), db.ForeignKey('stored_files.sha256'), nullable=True)  # NULL: legacy file in uploads/
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+class StoredFile(db.Model):
+    """One copy of each distinct upload, stored under uploads/objects/ab/cd/<sha256>"""
+    __tablename__ = 'stored_files'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # attachments pointing at this content
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 # Master Data Models
 class MasterDataCategory(db.Model):
     """Master data for ticket categories"""
@@ -211,6 +245,11 @@ class BackupSettings(db.Model):
 class EmailNotificationLog(db.Model):
     """Log of email notifications sent/failed"""
     __tablename__ = 'email_notification_logs'
+    __table_args__ = (
+        db.Index('ix_email_notification_logs_status_type_created_at', 'status', 'message_type', 'created_at'),
+        db.Index('ix_email_notification_logs_type_created_at', 'message_type', 'created_at'),
+        db.Index('ix_email_notification_logs_created_at', 'created_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     to_email = db.Column(db.String(100), nullable=False)
@@ -226,3 +265,101 @@ class EmailNotificationLog(db.Model):
     ticket = db.relationship('Ticket', backref='notification_logs')
     user = db.relationship('User', backref='notification_logs')
 
+
+
+class TicketDailyStats(db.Model):
+    """Daily ticket counts rolled up by category, priority, status and department"""
+    __tablename__ = 'ticket_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'category', 'priority', 'status', 'department', name='uq_ticket_daily_stats_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # UTC date the tickets were created
+    category = db.Column(db.String(50), nullable=False)
+    priority = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    department = db.Column(db.String(100), nullable=False, default='')  # '' when the creator has no department
+    ticket_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class EmailNotificationDailyStats(db.Model):
+    """Daily email counts by message type and status; kept after the log rows are purged"""
+    __tablename__ = 'email_notification_daily_stats'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'message_type', 'status', name='uq_email_notification_daily_stats_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)  # UTC date the notifications were logged
+    message_type = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # 'sent', 'failed'
+    notification_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class TicketCounter(db.Model):
+    """Named counters updated under a row lock (ticket numbers, master data cache version)"""
+    __tablename__ = 'ticket_counters'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReportJob(db.Model):
+    """Background report builds, shared by identical requests until the ticket data changes"""
+    __tablename__ = 'report_jobs'
+    __table_args__ = (
+        db.UniqueConstraint('report_type', 'params_key', 'data_version', name='uq_report_jobs_params_version'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_type = db.Column(db.String(30), nullable=False, default='r05')
+    params_key = db.Column(db.String(64), nullable=False)  # sha256 of the normalised filter parameters
+    params = db.Column(db.Text, nullable=False)  # JSON filter parameters plus the record date
+    data_version = db.Column(db.String(200), nullable=False)  # fingerprint of the tickets the report covers
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)  # percent
+    row_count = db.Column(db.Integer, nullable=True)
+    output_path = db.Column(db.String(500), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    requested_by = db.Column(db.Integer, nullable=True)  # user id; not a foreign key so deleting the user keeps the job
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class EmailOutbox(db.Model):
+    """Emails waiting for the delivery worker, written in the same transaction as the change they report"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),  # worker claim query
+        db.Index('ix_email_outbox_claimed_by', 'claimed_by'),
+        db.Index('ix_email_outbox_coalesce_key', 'coalesce_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(100), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    message_type = db.Column(db.String(50), nullable=False, default='general')
+    ticket_id = db.Column(db.Integer, nullable=True)  # copied to EmailNotificationLog once delivered
+    user_id = db.Column(db.Integer, nullable=True)
+    coalesce_key = db.Column(db.String(200), nullable=True)  # messages sharing a key are sent as one email
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32), nullable=True)  # token of the worker batch sending it
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class NotificationPreference(db.Model):
+    """Per-user email delivery preference; users without a row get per-ticket coalesced emails"""
+    __tablename__ = 'notification_preferences'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    digest = db.Column(db.String(10), nullable=False, default='off')  # off, hourly, daily
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
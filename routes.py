@@ -1,21 +1,39 @@
-from flask import render_template, request, redirect, url_for, flash, session, abort, make_response, send_file, send_from_directory
+from flask import render_template, request, redirect, url_for, flash, session, abort, make_response, send_file, g, jsonify, Response, stream_with_context
 from werkzeug.security import generate_password_hash
 from flask_login import current_user
 from werkzeug.utils import secure_filename
-from sqlalchemy import extract, and_
+from sqlalchemy import and_
 from app import app, db
-from models import User, Ticket, TicketComment, Attachment, MasterDataCategory, MasterDataPriority, MasterDataStatus, EmailSettings, TimezoneSettings, BackupSettings, EmailNotificationLog
-from forms import LoginForm, TicketForm, UpdateTicketForm, CommentForm, UserRegistrationForm, AssignTicketForm, UserProfileForm, MasterDataCategoryForm, MasterDataPriorityForm, MasterDataStatusForm, EmailSettingsForm, TimezoneSettingsForm, BackupSettingsForm
+from models import User, Ticket, TicketComment, Attachment, MasterDataCategory, MasterDataPriority, MasterDataStatus, EmailSettings, TimezoneSettings, BackupSettings, EmailNotificationLog, ReportJob, NotificationPreference
+from forms import LoginForm, TicketForm, UpdateTicketForm, CommentForm, UserRegistrationForm, AssignTicketForm, UserProfileForm, MasterDataCategoryForm, MasterDataPriorityForm, MasterDataStatusForm, EmailSettingsForm, TimezoneSettingsForm, BackupSettingsForm, TicketImportForm, NotificationPreferenceForm
 from datetime import datetime
 from utils.email import send_assignment_email  # Add this import
-from utils.timezone import utc_to_ist
+from utils.report_jobs import report_params, submit_report_job, report_job_status
+from utils.ticket_export import ticket_export_statement, iter_export_batches, csv_stream, ndjson_stream
+from utils.ticket_import import import_r05_workbook
+from utils.date_windows import day_month_year_window, report_window, apply_date_window
+from utils.ticket_stats import get_ticket_stats
+from utils.pagination import paginate_from_request, KeysetPage, DEFAULT_PER_PAGE
+from utils.search import search_tickets, index_ticket, index_tickets
+from utils.ticket_numbers import assign_ticket_number
+from utils.eager_loading import ticket_list_options, ticket_detail_options, notification_list_options
+from utils.query_debug import query_budget
+from utils.master_data_cache import bump_master_data_version, get_master_data_version, get_super_admins, get_settings_snapshot
+from utils.ticket_rollup import ticket_rollup_key, record_ticket_change, record_user_department_change
+from utils.notification_digest import get_digest_preference, set_digest_preference
+from utils.notification_rollup import notification_totals
+from utils.notification_retention import NOTIFICATION_LOG_RETENTION_DAYS
+from utils.file_store import store_upload, attachment_path, guess_mimetype
+from utils.upload_stream import MAX_UPLOAD_REQUEST_SIZE
+from utils.thumbnails import get_thumbnail, cache_response
+from utils.file_delivery import deliver_file
+from utils.signed_urls import read_file_url, fallback_url
 import logging
 import os
 import socket
 import platform
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-import io
+import hashlib
+import time
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'csv', 'ppt', 'pptx'}
 UPLOAD_FOLDER = 'uploads/'  # Set a secure uploads folder
@@ -25,15 +43,69 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+# Seconds an identity snapshot in the (signed) session cookie is trusted without re-reading the user.
+# Snapshots also lapse when the master data version moves, which edit_user/delete_user bump,
+# so role changes and deletions apply on the next request.
+IDENTITY_SNAPSHOT_TTL = int(os.environ.get('IDENTITY_SNAPSHOT_TTL', 300))
+
+
 # Helper function to check if user is logged in
 def is_logged_in():
     return 'user_id' in session
 
-# Helper function to get current user
+def identity_fingerprint(user):
+    """Changes whenever the user's id, role, username or password changes"""
+    raw = f"{user.id}:{user.role}:{user.username}:{user.password_hash}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+def store_identity_snapshot(user):
+    """Record the user's identity and role in the session for DB-free authorization"""
+    session['user_id'] = user.id
+    session['role'] = user.role
+    session['identity'] = {
+        'id': user.id,
+        'role': user.role,
+        'fingerprint': identity_fingerprint(user),
+        'version': get_master_data_version(),
+        'checked_at': int(time.time())
+    }
+
+def get_identity_snapshot():
+    """The session's identity snapshot if it is still fresh and not revoked, otherwise None"""
+    snapshot = session.get('identity')
+    if not snapshot or snapshot.get('id') != session.get('user_id'):
+        return None
+    if time.time() - snapshot.get('checked_at', 0) > IDENTITY_SNAPSHOT_TTL:
+        return None
+    # Account changes bump the master data version, which each request reads once anyway
+    if snapshot.get('version') != get_master_data_version():
+        return None
+    return snapshot
+
+# Helper function to get current user (one lookup per request, cached on flask.g)
 def get_current_user():
-    if is_logged_in():
-        return User.query.get(session['user_id'])
-    return None
+    if not is_logged_in():
+        return None
+    if 'current_user' not in g:
+        user = db.session.get(User, session['user_id'])
+        if user is None:
+            # Account was deleted: drop the session and send the browser to the login page
+            session.clear()
+            flash('Your session has ended. Please log in again.', 'warning')
+            abort(redirect(url_for('common_login')))
+        snapshot = session.get('identity') or {}
+        if snapshot.get('fingerprint') != identity_fingerprint(user) or get_identity_snapshot() is None:
+            store_identity_snapshot(user)
+        g.current_user = user
+    return g.current_user
+
+def get_current_role():
+    """Role from a fresh identity snapshot, falling back to a DB lookup"""
+    snapshot = get_identity_snapshot()
+    if snapshot:
+        return snapshot['role']
+    user = get_current_user()
+    return user.role if user else None
 
 # Helper function to require login
 def login_required(f):
@@ -51,8 +123,7 @@ def super_admin_required(f):
         if not is_logged_in():
             flash('Please log in to access this page.', 'warning')
             return redirect(url_for('common_login'))
-        user = get_current_user()
-        if not user or not user.is_super_admin:
+        if get_current_role() != 'super_admin':
             flash('Super Admin access required.', 'error')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -83,8 +154,7 @@ def common_login():
         user = User.query.filter_by(username=form.username.data).first()
         if user and user.check_password(form.password.data):
             # Set session variables
-            session['user_id'] = user.id
-            session['role'] = user.role
+            store_identity_snapshot(user)
             
             # Update IP address and system info
             user.ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR'))
@@ -125,6 +195,7 @@ def logout():
 
 @app.route('/user-dashboard')
 @login_required
+@query_budget(4)
 def user_dashboard():
     """User dashboard showing their tickets"""
     user = get_current_user()
@@ -134,21 +205,23 @@ def user_dashboard():
     search_query = request.args.get('search', '')
     
     # Build query
-    query = Ticket.query.filter_by(user_id=user.id)
+    query = Ticket.query.filter_by(user_id=user.id).options(*ticket_list_options())
     
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     
     if search_query:
-        query = query.filter(Ticket.title.contains(search_query))
-    
-    tickets = query.order_by(Ticket.created_at.desc()).all()
+        # Ranked full-text results replace the newest-first pager
+        tickets = KeysetPage(items=search_tickets(query, search_query).limit(DEFAULT_PER_PAGE).all())
+    else:
+        tickets = paginate_from_request(query, Ticket)
     
     return render_template('user_dashboard.html', user=user, tickets=tickets, 
                          status_filter=status_filter, search_query=search_query)
 
 @app.route('/user-profile', methods=['GET', 'POST'])
 @login_required
+@query_budget(4)
 def user_profile():
     """User profile management - Super Admin can edit, users can only view"""
     user = get_current_user()
@@ -192,13 +265,31 @@ def user_profile():
         'recent_tickets': user_tickets[:5] if user_tickets else []
     }
     
-    return render_template('user_profile.html', form=form, user=user, user_stats=user_stats, current_user=user)
+    notification_form = NotificationPreferenceForm(digest=get_digest_preference(user.id))
+    
+    return render_template('user_profile.html', form=form, user=user, user_stats=user_stats, current_user=user,
+                           notification_form=notification_form)
+
+@app.route('/user-profile/notifications', methods=['POST'])
+@login_required
+def update_notification_preference():
+    """Let any user choose per-update emails or an hourly/daily digest"""
+    user = get_current_user()
+    form = NotificationPreferenceForm()
+    if form.validate_on_submit():
+        set_digest_preference(user.id, form.digest.data)
+        db.session.commit()
+        flash('Notification preference saved.', 'success')
+    else:
+        flash('Please choose a valid notification preference.', 'error')
+    return redirect(url_for('user_profile'))
 
 
 
 
 @app.route('/super-admin-dashboard')
 @super_admin_required
+@query_budget(10)
 def super_admin_dashboard():
     """Super Admin dashboard with full system overview and filters"""
     user = get_current_user()
@@ -207,23 +298,9 @@ def super_admin_dashboard():
         return redirect(url_for('index'))
 
     # Comprehensive statistics (unfiltered)
-    total_tickets = Ticket.query.count()
-    open_tickets = Ticket.query.filter_by(status='Open').count()
-    in_progress_tickets = Ticket.query.filter_by(status='In Progress').count()
-    resolved_tickets = Ticket.query.filter_by(status='Resolved').count()
-    total_users = User.query.filter_by(role='user').count()
-    hardware_tickets = Ticket.query.filter_by(category='Hardware').count()
-    software_tickets = Ticket.query.filter_by(category='Software').count()
-
-    stats = {
-        'total_tickets': total_tickets,
-        'open_tickets': open_tickets,
-        'in_progress_tickets': in_progress_tickets,
-        'resolved_tickets': resolved_tickets,
-        'total_users': total_users,
-        'hardware_tickets': hardware_tickets,
-        'software_tickets': software_tickets
-    }
+    ticket_stats = get_ticket_stats()
+    stats = ticket_stats.as_dict()
+    stats['total_users'] = User.query.filter_by(role='user').count()
 
     # Filter parameters for recent tickets
     status_filter = request.args.get('status', 'all')
@@ -235,27 +312,25 @@ def super_admin_dashboard():
     year_filter = request.args.get('year', '')
 
     # Build filtered query for recent tickets
-    query = Ticket.query
+    query = Ticket.query.options(*ticket_list_options())
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     if priority_filter != 'all':
         query = query.filter_by(priority=priority_filter)
     if category_filter != 'all':
         query = query.filter_by(category=category_filter)
-    if search_query:
-        query = query.filter(Ticket.title.contains(search_query))
-    if year_filter:
-        query = query.filter(extract('year', Ticket.created_at) == int(year_filter))
-    if month_filter:
-        query = query.filter(extract('month', Ticket.created_at) == int(month_filter))
-    if day_filter:
-        query = query.filter(extract('day', Ticket.created_at) == int(day_filter))
+    query = apply_date_window(query, Ticket.created_at, day_month_year_window(day_filter, month_filter, year_filter))
 
-    recent_tickets = query.order_by(Ticket.created_at.desc()).limit(10).all()
+    if search_query:
+        query = search_tickets(query, search_query)
+    else:
+        query = query.order_by(Ticket.created_at.desc())
+    recent_tickets = query.limit(10).all()
 
     return render_template(
         'super_admin_dashboard.html',
         stats=stats,
+        ticket_stats=ticket_stats,
         recent_tickets=recent_tickets,
         status_filter=status_filter,
         priority_filter=priority_filter,
@@ -271,6 +346,7 @@ def super_admin_dashboard():
 
 @app.route('/create-ticket', methods=['GET', 'POST'])
 @login_required
+@query_budget(2)
 def create_ticket():
     """Create a new ticket"""
     form = TicketForm()
@@ -315,42 +391,31 @@ def create_ticket():
         user.ip_address = current_ip
         user.system_name = current_system_name
 
-        # Handle file uploads (supporting multiple attachments)
-        attachment_filenames = []
+        # Handle file uploads (supporting multiple attachments); identical files are stored once
+        attachments = []
         files = request.files.getlist('image')  # Changed from 'attachments' to 'image'
         for file in files:
             if file and file.filename and allowed_file(file.filename):
                 filename = secure_filename(file.filename)
                 timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
                 unique_filename = timestamp + filename
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                filepath = os.path.join(UPLOAD_FOLDER, unique_filename)
                 try:
-                    file.save(filepath)
-                    attachment_filenames.append(unique_filename)
+                    attachments.append(store_upload(file, unique_filename))
                     logging.info(f'Successfully uploaded file: {unique_filename}')
                 except Exception as e:
                     flash(f'Error uploading file {filename}: {str(e)}', 'warning')
                     logging.error(f'Error uploading file {filename}: {str(e)}')
 
-        # For backward compatibility, store the first image filename in image_filename, others in attachments
+        # The first image is also the ticket's primary image (shown inline)
         image_filename = None
-        other_attachments = []
-        for fname in attachment_filenames:
-            if any(fname.lower().endswith(ext) for ext in
-                   ['.png', '.jpg', '.jpeg', '.gif', '.bmp']) and not image_filename:
-                image_filename = fname
-            else:
-                other_attachments.append(fname)
+        for attachment in attachments:
+            if any(attachment.filename.lower().endswith(ext) for ext in
+                   ['.png', '.jpg', '.jpeg', '.gif', '.bmp']):
+                image_filename = attachment.filename
+                break
 
-        # Generate ticket number
-        last_ticket = Ticket.query.order_by(Ticket.id.desc()).first()
-        next_ticket_id = (last_ticket.id + 1) if last_ticket else 1
-        ticket_number = f"GTN-{next_ticket_id:06d}"
-        
-        # Create the ticket first
+        # Create the ticket and its attachment records in a single transaction
         ticket = Ticket(
-            ticket_number=ticket_number,
             title=form.title.data,
             description=form.description.data,
             category=form.category.data,
@@ -361,30 +426,20 @@ def create_ticket():
             user_system_name=current_system_name,
             image_filename=image_filename
         )
+        ticket.attachments.extend(attachments)
+        assign_ticket_number(ticket)
         db.session.add(ticket)
-        db.session.commit()
-
-        # Create attachment records for non-image files
-        for attachment_filename in other_attachments:
-            attachment = Attachment(
-                ticket_id=ticket.id,
-                filename=attachment_filename
-            )
-            db.session.add(attachment)
-        
-        if other_attachments:
-            db.session.commit()
+        db.session.flush()  # apply column defaults (status, created_at) before rolling up
+        record_ticket_change(None, ticket_rollup_key(ticket, department=user.department))
+        index_ticket(ticket.id)
 
-        # Send email notification for ticket creation
+        # Queue the confirmation email; it is committed with the ticket and sent in the background
         from utils.email import send_ticket_creation_notification
-        try:
-            email_sent = send_ticket_creation_notification(ticket)
-            if email_sent:
-                flash(f'Ticket {ticket.ticket_number} created successfully and confirmation email sent!', 'success')
-            else:
-                flash(f'Ticket {ticket.ticket_number} created successfully but confirmation email failed.', 'warning')
-        except Exception as e:
-            logging.error(f"Error sending ticket creation notification: {e}")
+        email_queued = send_ticket_creation_notification(ticket)
+        db.session.commit()
+        if email_queued:
+            flash(f'Ticket {ticket.ticket_number} created successfully and confirmation email queued!', 'success')
+        else:
             flash(f'Ticket {ticket.ticket_number} created successfully but confirmation email failed.', 'warning')
         
         return redirect(url_for('user_dashboard'))
@@ -393,9 +448,10 @@ def create_ticket():
 
 @app.route('/ticket/<int:ticket_id>')
 @login_required
+@query_budget(7)
 def view_ticket(ticket_id):
     """View ticket details"""
-    ticket = Ticket.query.get_or_404(ticket_id)
+    ticket = Ticket.query.options(*ticket_detail_options()).filter_by(id=ticket_id).first_or_404()
     user = get_current_user()
     
     # Check if user can view this ticket
@@ -440,24 +496,23 @@ def add_comment(ticket_id):
         )
         db.session.add(comment)
         ticket.updated_at = datetime.utcnow()
-        db.session.commit()
+        db.session.flush()
+        index_ticket(ticket.id)
         
-        # Send email notification for comment addition
+        # Queue notifications in the same transaction as the comment
         from utils.email import send_ticket_comment_notification
-        try:
-            email_sent = send_ticket_comment_notification(ticket, form.comment.data, user)
-            if email_sent:
-                flash('Comment added successfully and notifications sent!', 'success')
-            else:
-                flash('Comment added successfully but some notifications failed.', 'warning')
-        except Exception as e:
-            logging.error(f"Error sending ticket comment notification: {e}")
-            flash('Comment added successfully but notifications failed.', 'warning')
+        emails_queued = send_ticket_comment_notification(ticket, form.comment.data, user)
+        db.session.commit()
+        if emails_queued:
+            flash('Comment added successfully and notifications queued!', 'success')
+        else:
+            flash('Comment added successfully but some notifications failed.', 'warning')
     
     return redirect(url_for('view_ticket', ticket_id=ticket_id))
 
 @app.route('/ticket/<int:ticket_id>/edit', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(7)
 def edit_ticket(ticket_id):
     """Edit ticket (admin only)"""
     ticket = Ticket.query.get_or_404(ticket_id)
@@ -467,6 +522,7 @@ def edit_ticket(ticket_id):
     if form.validate_on_submit():
         # Only status can be updated - no one can edit title, description, category, or priority
         old_status = ticket.status
+        old_rollup_key = ticket_rollup_key(ticket)
         ticket.status = form.status.data
         
         # Set resolved_at if status changed to Resolved
@@ -495,19 +551,18 @@ def edit_ticket(ticket_id):
             )
             db.session.add(comment)
         
-        db.session.commit()
+        record_ticket_change(old_rollup_key, ticket_rollup_key(ticket))
+        db.session.flush()
+        index_ticket(ticket.id)
         
-        # Send email notification for status update
+        # Queue notifications in the same transaction as the status change
         from utils.email import send_ticket_status_update_notification
-        try:
-            email_sent = send_ticket_status_update_notification(ticket, old_status, current_user)
-            if email_sent:
-                flash('Ticket status updated successfully and notifications sent!', 'success')
-            else:
-                flash('Ticket status updated successfully but some notifications failed.', 'warning')
-        except Exception as e:
-            logging.error(f"Error sending ticket status update notification: {e}")
-            flash('Ticket status updated successfully but notifications failed.', 'warning')
+        emails_queued = send_ticket_status_update_notification(ticket, old_status, current_user)
+        db.session.commit()
+        if emails_queued:
+            flash('Ticket status updated successfully and notifications queued!', 'success')
+        else:
+            flash('Ticket status updated successfully but some notifications failed.', 'warning')
         
         return redirect(url_for('view_ticket', ticket_id=ticket_id))
     
@@ -523,27 +578,25 @@ def assign_ticket(ticket_id):
 
     if form.validate_on_submit():
         current_user = get_current_user()
+        old_rollup_key = ticket_rollup_key(ticket)
         ticket.assigned_to = form.assigned_to.data
         ticket.assigned_by = current_user.id if current_user else None
         if ticket.status == 'Open':
             ticket.status = 'In Progress'
         ticket.updated_at = datetime.utcnow()
         ticket.assigned_at = datetime.utcnow()
-        db.session.commit()
+        record_ticket_change(old_rollup_key, ticket_rollup_key(ticket))
 
         assignee = User.query.get(form.assigned_to.data)
 
-        # Send comprehensive email notifications
+        # Queue notifications in the same transaction as the assignment
         from utils.email import send_ticket_assignment_notification
-        try:
-            email_sent = send_ticket_assignment_notification(ticket, assignee, current_user)
-            if email_sent:
-                flash(f'Ticket assigned to {assignee.full_name} and notifications sent!', 'success')
-            else:
-                flash(f'Ticket assigned to {assignee.full_name} but some notifications failed.', 'warning')
-        except Exception as e:
-            logging.error(f"Error sending assignment notifications: {e}")
-            flash(f'Ticket assigned to {assignee.full_name} but notifications failed.', 'warning')
+        emails_queued = send_ticket_assignment_notification(ticket, assignee, current_user)
+        db.session.commit()
+        if emails_queued:
+            flash(f'Ticket assigned to {assignee.full_name} and notifications queued!', 'success')
+        else:
+            flash(f'Ticket assigned to {assignee.full_name} but some notifications failed.', 'warning')
 
     return redirect(url_for('view_ticket', ticket_id=ticket_id))
 
@@ -561,6 +614,7 @@ def edit_user(user_id):
     form = UserProfileForm()
 
     if form.validate_on_submit():
+        record_user_department_change(user.id, user.department, form.department.data)
         user.username = form.username.data
         user.role = form.role.data
         user.first_name = form.first_name.data
@@ -572,7 +626,11 @@ def edit_user(user_id):
         # Only update password if a new value is provided
         if form.password.data:
             user.password = generate_password_hash(form.password.data)
+        bump_master_data_version()
         db.session.commit()
+        # Other sessions of this user see the new version on their next request
+        if user.id == current_user.id:
+            store_identity_snapshot(user)
         flash(f'User {user.username} updated successfully!', 'success')
         return redirect(url_for('view_user', user_id=user_id))
 
@@ -591,6 +649,7 @@ def edit_user(user_id):
 
 @app.route('/manage-users')
 @super_admin_required
+@query_budget(5)
 def manage_users():
     """Super Admin user management"""
     user = get_current_user()
@@ -599,7 +658,12 @@ def manage_users():
         return redirect(url_for('index'))
     
     users = User.query.all()
-    return render_template('manage_users.html', users=users)
+    
+    # Ticket counts per user in two grouped queries instead of loading every user's tickets
+    from sqlalchemy import func
+    created_counts = dict(db.session.query(Ticket.user_id, func.count(Ticket.id)).group_by(Ticket.user_id).all())
+    assigned_counts = dict(db.session.query(Ticket.assigned_to, func.count(Ticket.id)).filter(Ticket.assigned_to.isnot(None)).group_by(Ticket.assigned_to).all())
+    return render_template('manage_users.html', users=users, created_counts=created_counts, assigned_counts=assigned_counts)
 
 @app.route('/create-user', methods=['GET', 'POST'])
 @super_admin_required
@@ -623,6 +687,7 @@ def create_user():
         )
         new_user.set_password(form.password.data)
         db.session.add(new_user)
+        bump_master_data_version()
         db.session.commit()
         
         flash(f'User {new_user.username} created successfully!', 'success')
@@ -632,6 +697,7 @@ def create_user():
 
 @app.route('/view-user/<int:user_id>')
 @super_admin_required
+@query_budget(8)
 def view_user(user_id):
     """View user details (Super Admin only)"""
     current_user = get_current_user()
@@ -641,8 +707,8 @@ def view_user(user_id):
     
     user = User.query.get_or_404(user_id)
     # Get user's tickets
-    user_tickets = Ticket.query.filter_by(user_id=user_id).order_by(Ticket.created_at.desc()).all()
-    assigned_tickets = Ticket.query.filter_by(assigned_to=user_id).order_by(Ticket.created_at.desc()).all()
+    user_tickets = paginate_from_request(Ticket.query.filter_by(user_id=user_id), Ticket, prefix='created_', count='exact')
+    assigned_tickets = paginate_from_request(Ticket.query.filter_by(assigned_to=user_id), Ticket, prefix='assigned_', count='exact')
     
     return render_template('view_user.html', user=user, user_tickets=user_tickets, assigned_tickets=assigned_tickets)
 
@@ -668,6 +734,8 @@ def delete_user(user_id):
         # Get user's tickets and reassign or handle them
         user_tickets = Ticket.query.filter_by(user_id=user_id).all()
         assigned_tickets = Ticket.query.filter_by(assigned_to=user_id).all()
+        affected_tickets = {ticket.id: ticket for ticket in user_tickets + assigned_tickets}
+        old_rollup_keys = {ticket_id: ticket_rollup_key(ticket) for ticket_id, ticket in affected_tickets.items()}
         
         # Update tickets created by this user to preserve data integrity
         for ticket in user_tickets:
@@ -679,14 +747,26 @@ def delete_user(user_id):
             ticket.assigned_to = None
             ticket.status = 'Open'  # Reset status to Open for reassignment
         
+        # Keep the daily rollup in step: created tickets lose their department, assigned ones reopen
+        for ticket_id, ticket in affected_tickets.items():
+            department = '' if ticket.user_id is None else None
+            record_ticket_change(old_rollup_keys[ticket_id], ticket_rollup_key(ticket, department=department))
+        
         # Delete user's comments (cascade should handle this, but being explicit)
         comments = TicketComment.query.filter_by(user_id=user_id).all()
         for comment in comments:
             db.session.delete(comment)
+        # Their comment text is part of those tickets' search documents
+        db.session.flush()
+        index_tickets({comment.ticket_id for comment in comments})
         
+        # Their digest choice references the user row
+        NotificationPreference.query.filter_by(user_id=user_id).delete()
+
         # Delete the user
         username = user_to_delete.username
         db.session.delete(user_to_delete)
+        bump_master_data_version()
         db.session.commit()
         
         flash(f'User "{username}" has been successfully deleted. Their tickets have been preserved and reassigned tickets are now available for assignment.', 'success')
@@ -699,6 +779,7 @@ def delete_user(user_id):
 
 @app.route('/assign-work/<int:ticket_id>', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(4)
 def assign_work(ticket_id):
     """Super Admin assigns work to specific admins based on category"""
     user = get_current_user()
@@ -709,31 +790,29 @@ def assign_work(ticket_id):
     ticket = Ticket.query.get_or_404(ticket_id)
     
     # Get all super admins for assignment (simplified role structure)
-    admins = User.query.filter_by(role='super_admin').all()
+    admins = get_super_admins()
     
     form = AssignTicketForm()
     form.assigned_to.choices = [(admin.id, f"{admin.full_name} ({admin.department})") for admin in admins]
     
     if form.validate_on_submit():
+        old_rollup_key = ticket_rollup_key(ticket)
         ticket.assigned_to = form.assigned_to.data
         ticket.assigned_by = user.id
         ticket.status = 'In Progress'
         ticket.updated_at = datetime.utcnow()
-        db.session.commit()
+        record_ticket_change(old_rollup_key, ticket_rollup_key(ticket))
         
         assignee = User.query.get(form.assigned_to.data)
         
-        # Send comprehensive email notifications for assignment
+        # Queue notifications for all parties in the same transaction as the assignment
         from utils.email import send_ticket_assignment_notification
-        try:
-            email_sent = send_ticket_assignment_notification(ticket, assignee, user)
-            if email_sent:
-                flash(f'Work assigned to {assignee.full_name} and email notifications sent to all parties!', 'success')
-            else:
-                flash(f'Work assigned to {assignee.full_name} but some email notifications failed.', 'warning')
-        except Exception as e:
-            logging.error(f"Error sending assignment email: {e}")
-            flash(f'Work assigned to {assignee.full_name} but email notifications failed.', 'warning')
+        emails_queued = send_ticket_assignment_notification(ticket, assignee, user)
+        db.session.commit()
+        if emails_queued:
+            flash(f'Work assigned to {assignee.full_name} and email notifications queued for all parties!', 'success')
+        else:
+            flash(f'Work assigned to {assignee.full_name} but some email notifications failed.', 'warning')
         
         return redirect(url_for('super_admin_dashboard'))
     
@@ -777,6 +856,7 @@ def create_default_admin():
 
 @app.route('/reports-dashboard')
 @super_admin_required
+@query_budget(8)
 def reports_dashboard():
     """Reports Dashboard with visual analytics (Super Admin only)"""
     current_user = get_current_user()
@@ -784,53 +864,15 @@ def reports_dashboard():
         flash('Super Admin access required.', 'error')
         return redirect(url_for('index'))
     
-    # Get comprehensive statistics
-    total_tickets = Ticket.query.count()
-    open_tickets = Ticket.query.filter_by(status='Open').count()
-    in_progress_tickets = Ticket.query.filter_by(status='In Progress').count()
-    resolved_tickets = Ticket.query.filter_by(status='Resolved').count()
-    closed_tickets = Ticket.query.filter_by(status='Closed').count()
-    
-    # Category breakdown
-    hardware_tickets = Ticket.query.filter_by(category='Hardware').count()
-    software_tickets = Ticket.query.filter_by(category='Software').count()
-    network_tickets = Ticket.query.filter_by(category='Network').count()
-    other_tickets = Ticket.query.filter_by(category='Other').count()
-    
-    # Priority breakdown  
-    critical_tickets = Ticket.query.filter_by(priority='Critical').count()
-    high_tickets = Ticket.query.filter_by(priority='High').count()
-    medium_tickets = Ticket.query.filter_by(priority='Medium').count()
-    low_tickets = Ticket.query.filter_by(priority='Low').count()
-    
-    # Get all tickets for detailed table
-    all_tickets = Ticket.query.order_by(Ticket.created_at.desc()).all()
-    
-    stats = {
-        'total_tickets': total_tickets,
-        'open_tickets': open_tickets,
-        'in_progress_tickets': in_progress_tickets,
-        'resolved_tickets': resolved_tickets,
-        'closed_tickets': closed_tickets,
-        'hardware_tickets': hardware_tickets,
-        'software_tickets': software_tickets,
-        'network_tickets': network_tickets,
-        'other_tickets': other_tickets,
-        'critical_tickets': critical_tickets,
-        'high_tickets': high_tickets,
-        'medium_tickets': medium_tickets,
-        'low_tickets': low_tickets
-    }
+    # Get comprehensive statistics in a single grouped query
+    ticket_stats = get_ticket_stats()
+    stats = ticket_stats.as_dict()
     
     # Prepare chart data for JavaScript
-    chart_data = {
-        'category': [hardware_tickets, software_tickets, network_tickets, other_tickets],
-        'priority': [critical_tickets, high_tickets, medium_tickets, low_tickets],
-        'status': [open_tickets, in_progress_tickets, resolved_tickets, closed_tickets]
-    }
+    chart_data = ticket_stats.chart_data()
     
     # Get recent tickets for activity timeline
-    recent_tickets = Ticket.query.order_by(Ticket.created_at.desc()).limit(10).all()
+    recent_tickets = Ticket.query.options(*ticket_list_options()).order_by(Ticket.created_at.desc()).limit(10).all()
     
     # Get top users by ticket count
     from sqlalchemy import func
@@ -857,24 +899,15 @@ def reports_dashboard():
     
     return render_template('reports_dashboard.html', 
                          stats=stats, 
-                         tickets=all_tickets, 
                          chart_data=chart_data,
                          recent_tickets=recent_tickets,
                          top_users=top_users,
-                         total_tickets=total_tickets,
-                         open_tickets=open_tickets,
-                         in_progress_tickets=in_progress_tickets,
-                         resolved_tickets=resolved_tickets,
-                         closed_tickets=closed_tickets,
-                         hardware_tickets=hardware_tickets,
-                         software_tickets=software_tickets,
-                         critical_tickets=critical_tickets,
-                         high_tickets=high_tickets,
-                         medium_tickets=medium_tickets,
-                         low_tickets=low_tickets)
+                         ticket_stats=ticket_stats,
+                         **stats)
 
 @app.route('/edit-assignment/<int:ticket_id>', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(3)
 def edit_assignment(ticket_id):
     """Edit ticket assignment (Super Admin only)"""
     current_user = get_current_user()
@@ -896,22 +929,19 @@ def edit_assignment(ticket_id):
         ticket.updated_at = datetime.utcnow()
         
         try:
-            db.session.commit()
-            assignee_name = User.query.get(assigned_to).full_name if assigned_to else 'Unassigned'
-            
-            # Send comprehensive email notifications if assigned to someone
+            # Queue notifications (if assigned to someone) in the same transaction as the change
+            emails_queued = True
             if assigned_to:
                 from utils.email import send_ticket_assignment_notification
                 assignee = User.query.get(assigned_to)
-                try:
-                    email_sent = send_ticket_assignment_notification(ticket, assignee, current_user)
-                    if email_sent:
-                        flash(f'Ticket {ticket.ticket_number} assigned to {assignee_name} and email notifications sent to all parties!', 'success')
-                    else:
-                        flash(f'Ticket {ticket.ticket_number} assigned to {assignee_name} but some email notifications failed.', 'warning')
-                except Exception as e:
-                    logging.error(f"Error sending assignment email: {e}")
-                    flash(f'Ticket {ticket.ticket_number} assigned to {assignee_name} but email notifications failed.', 'warning')
+                emails_queued = send_ticket_assignment_notification(ticket, assignee, current_user)
+            db.session.commit()
+            
+            if assigned_to:
+                if emails_queued:
+                    flash(f'Ticket {ticket.ticket_number} assigned to {assignee.full_name} and email notifications queued for all parties!', 'success')
+                else:
+                    flash(f'Ticket {ticket.ticket_number} assigned to {assignee.full_name} but some email notifications failed.', 'warning')
             else:
                 flash(f'Ticket {ticket.ticket_number} has been unassigned.', 'success')
                 
@@ -922,12 +952,13 @@ def edit_assignment(ticket_id):
             logging.error(f"Error updating ticket assignment: {e}")
     
     # Get all super admin users for assignment dropdown
-    admin_users = User.query.filter_by(role="super_admin").all()
+    admin_users = get_super_admins()
     
     return render_template('edit_assignment.html', ticket=ticket, admin_users=admin_users)
 
 @app.route('/view-image/<filename>')
 @login_required
+@query_budget(4)
 def view_image(filename):
     """View uploaded ticket image - admins can view any, users can view their own"""
     current_user = get_current_user()
@@ -947,13 +978,65 @@ def view_image(filename):
     if not can_view:
         abort(403)
     
+    attachment = Attachment.query.filter_by(filename=filename).first()
     try:
-        return send_from_directory('uploads', filename)
+        if attachment and attachment.sha256:
+            # The content hash is a strong validator; stored content never changes
+            return cache_response(deliver_file(attachment_path(attachment), guess_mimetype(filename),
+                                               etag=attachment.sha256))
+        return deliver_file(attachment_path(attachment, filename), guess_mimetype(filename))
+    except FileNotFoundError:
+        abort(404)
+
+@app.route('/image-preview/<int:size>/<filename>')
+@login_required
+@query_budget(4)
+def view_image_preview(size, filename):
+    """Serve a bounded-size rendition of an image attachment, cached on disk and in the browser"""
+    current_user = get_current_user()
+    
+    attachment = Attachment.query.filter_by(filename=filename).first()
+    if not attachment:
+        # Legacy primary images without an attachment row: serve the original
+        return redirect(url_for('view_image', filename=filename))
+    
+    if not current_user.is_super_admin and attachment.ticket.user_id != current_user.id:
+        abort(403)
+    
+    thumbnail = get_thumbnail(attachment.sha256, attachment.filename, size)
+    if thumbnail is None:
+        return redirect(url_for('view_image', filename=filename))
+    path, mimetype, etag = thumbnail
+    return cache_response(deliver_file(path, mimetype, etag=etag))
+
+@app.route('/files/<token>/<path:name>')
+@query_budget(1)
+def signed_file(token, name):
+    """Serve a file from a signed URL: checks the signature, expiry and session identity, no lookups beyond its version"""
+    grant = read_file_url(token)
+    if grant is None:
+        abort(404)
+    snapshot = get_identity_snapshot()
+    if grant.expired or grant.user_id is None or snapshot is None or grant.user_id != snapshot['id']:
+        # Let the regular route re-check access against the database; a deleted or
+        # edited account bumps the version, so its snapshot no longer passes here
+        return redirect(fallback_url(grant))
+    
+    try:
+        if isinstance(grant.mode, int):
+            thumbnail = get_thumbnail(grant.sha256, grant.filename, grant.mode)
+            if thumbnail is not None:
+                path, mimetype, etag = thumbnail
+                return cache_response(deliver_file(path, mimetype, etag=etag))
+        response = deliver_file(attachment_path(grant), guess_mimetype(grant.filename),
+                                as_attachment=grant.mode == 'download', download_name=grant.name, etag=grant.sha256)
+        return cache_response(response) if grant.sha256 else response
     except FileNotFoundError:
         abort(404)
 
 @app.route('/download-attachment/<filename>')
 @login_required
+@query_budget(4)
 def download_attachment(filename):
     """Download file attachment - admins can download any, users can download their own"""
     current_user = get_current_user()
@@ -977,7 +1060,8 @@ def download_attachment(filename):
         abort(403)
     
     try:
-        return send_from_directory('uploads', filename, as_attachment=True)
+        return deliver_file(attachment_path(attachment), guess_mimetype(filename), as_attachment=True,
+                            download_name=attachment.original_name or filename, etag=attachment.sha256)
     except FileNotFoundError:
         abort(404)
 
@@ -997,118 +1081,144 @@ def download_excel_report():
         to_date = request.args.get('to_date')
         month = request.args.get('month')
         year = request.args.get('year')
-
-        # --- BUILD QUERY BASED ON FILTER ---
-        query = Ticket.query.join(User, Ticket.user_id == User.id)
-
-        if filter_mode == 'range' and from_date and to_date:
-            from_dt = datetime.strptime(from_date, '%Y-%m-%d')
-            to_dt = datetime.strptime(to_date, '%Y-%m-%d')
-            query = query.filter(Ticket.created_at >= from_dt, Ticket.created_at <= to_dt)
-        elif filter_mode == 'month' and month:
-            y, m = map(int, month.split('-'))
-            query = query.filter(
-                extract('year', Ticket.created_at) == y,
-                extract('month', Ticket.created_at) == m
-            )
-        elif filter_mode == 'year' and year:
-            query = query.filter(extract('year', Ticket.created_at) == int(year))
-
-        tickets = query.all()
+        try:
+            report_window(filter_mode, from_date=from_date, to_date=to_date, month=month, year=year, strict=True)
+        except ValueError:
+            flash('Invalid date filter. Please check the dates and try again.', 'error')
+            return redirect(url_for('reports_dashboard'))
 
         # --- EXCEL GENERATION USING GTN ENGINEERING TEMPLATE ---
-        # Load the GTN Engineering template
-        template_path = 'attached_assets/R05 - USER COMPLAINT REGISTER_1752222026172.xlsx'
-        wb = openpyxl.load_workbook(template_path)
-        ws = wb.active
-        ws.title = "R05 C"
-        
-        # Preserve the template structure - update the date field
-        current_date = datetime.now().strftime('%d.%m.%Y')
-        ws.cell(row=2, column=21, value=current_date)  # Update date in the template
-        
-        # Template headers are in row 3 - mapping to helpdesk data:
-        # SNo, Dept, Issue, Issue Type, (empty cols), Raised By, Originating Date, Mode of communication, (empty), 
-        # Issue Cleared By, Issue clearance date, Reason of the issue, (empty cols), Solution / Action taken, (empty cols), Final Remarks
-        
-        # Add ticket data starting from row 4 (template rows 4+ are for data)
-        data_start_row = 4
-        for idx, ticket in enumerate(tickets, 1):
-            row = data_start_row + idx - 1
-            
-            # Map helpdesk data to GTN template columns
-            assignee_name = ticket.assignee.full_name if hasattr(ticket, 'assignee') and ticket.assignee else 'Unassigned'
-            user_name = getattr(ticket, 'user_name', ticket.user.full_name if hasattr(ticket.user, 'full_name') else 'N/A')
-            user_dept = getattr(ticket.user, 'department', 'N/A') or 'N/A'
-            
-            # Fill the template columns with ticket data
-            ws.cell(row=row, column=1, value=idx)  # SNo
-            ws.cell(row=row, column=2, value=user_dept)  # Dept
-            ws.cell(row=row, column=3, value=ticket.title)  # Issue
-            ws.cell(row=row, column=4, value=ticket.category)  # Issue Type
-            ws.cell(row=row, column=8, value=user_name)  # Raised By
-            ws.cell(row=row, column=9, value=utc_to_ist(ticket.created_at).strftime('%d.%m.%Y') if ticket.created_at else 'N/A')  # Originating Date
-            ws.cell(row=row, column=10, value='Online Portal')  # Mode of communication
-            ws.cell(row=row, column=12, value=assignee_name)  # Issue Cleared By
-            ws.cell(row=row, column=13, value=utc_to_ist(ticket.resolved_at).strftime('%d.%m.%Y') if ticket.resolved_at else 'Pending')  # Issue clearance date
-            ws.cell(row=row, column=14, value=ticket.description)  # Reason of the issue
-            ws.cell(row=row, column=18, value=f"Status: {ticket.status}")  # Solution / Action taken
-            ws.cell(row=row, column=21, value=f"Priority: {ticket.priority}")  # Final Remarks
-        
-        # Auto-adjust column widths for better readability - handle merged cells
-        from openpyxl.utils import get_column_letter
-        for col_idx in range(1, ws.max_column + 1):
-            max_length = 0
-            column_letter = get_column_letter(col_idx)
-            for row in range(1, ws.max_row + 1):
-                try:
-                    cell = ws.cell(row=row, column=col_idx)
-                    if hasattr(cell, 'value') and cell.value and len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Save to memory
-        output = io.BytesIO()
-        wb.save(output)
-        output.seek(0)
-
-        # Generate filename with timestamp matching GTN template format
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'R05 - USER COMPLAINT REGISTER_{timestamp}.xlsx'
-
-        # Create response
-        response = make_response(output.getvalue())
-        response.headers['Content-Type'] = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        response.headers['Content-Disposition'] = f'attachment; filename={filename}'
-
-        return response
+        # The workbook is built by a background worker; identical requests share one job
+        # and a finished file is reused until the tickets it covers change
+        params = report_params(filter_mode, from_date=from_date, to_date=to_date, month=month, year=year)
+        job = submit_report_job(params, requested_by=current_user.id)
+        if job.status == 'done':
+            return redirect(url_for('download_report_job', job_id=job.id))
+        return redirect(url_for('report_job_status_page', job_id=job.id))
 
     except Exception as e:
         logging.error(f"Error generating Excel report: {e}")
         flash('Error generating report. Please try again.', 'error')
         return redirect(url_for('reports_dashboard'))
 
+def _ticket_export_response(stream, mimetype, extension):
+    """Stream a machine-readable ticket export for the report filter query args"""
+    # Validated before streaming starts: once the body is under way an error can no longer become a 400
+    try:
+        window = report_window(
+            request.args.get('filter_mode', 'range'),
+            from_date=request.args.get('from_date'),
+            to_date=request.args.get('to_date'),
+            month=request.args.get('month'),
+            year=request.args.get('year'),
+            strict=True
+        )
+    except ValueError as e:
+        abort(400, description=str(e))
+    stmt = ticket_export_statement(
+        window,
+        status=request.args.get('status') or request.args.get('status_filter'),
+        category=request.args.get('category'),
+        priority=request.args.get('priority')
+    )
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    return Response(
+        stream_with_context(stream(iter_export_batches(stmt))),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=tickets_{timestamp}.{extension}'}
+    )
+
+@app.route('/export/tickets.csv')
+@super_admin_required
+def export_tickets_csv():
+    """Stream tickets as CSV (same filters as the Excel report plus status/category/priority)"""
+    return _ticket_export_response(csv_stream, 'text/csv', 'csv')
+
+@app.route('/export/tickets.ndjson')
+@super_admin_required
+def export_tickets_ndjson():
+    """Stream tickets as newline-delimited JSON (same filters as export_tickets_csv)"""
+    return _ticket_export_response(ndjson_stream, 'application/x-ndjson', 'ndjson')
+
+@app.route('/super_admin/import-tickets', methods=['GET', 'POST'])
+@super_admin_required
+def import_tickets():
+    """Bulk import tickets from an R05 complaint register workbook"""
+    form = TicketImportForm()
+    report = None
+
+    if form.validate_on_submit():
+        current_user = get_current_user()
+        try:
+            report = import_r05_workbook(
+                form.workbook.data.stream,
+                dry_run=form.dry_run.data,
+                default_user_id=current_user.id if form.assign_unknown_to_me.data else None
+            )
+            if not report.dry_run:
+                flash(f'{report.imported} tickets imported.', 'success')
+        except Exception as e:
+            logging.error(f"Error importing tickets: {e}")
+            flash('Error importing the workbook. Please check the file and try again.', 'error')
+
+    return render_template('import_tickets.html', form=form, report=report)
+
+@app.route('/reports/jobs/<int:job_id>')
+@super_admin_required
+@query_budget(2)
+def report_job_status_page(job_id):
+    """Progress page for a background report; polls until the file is ready"""
+    job = db.get_or_404(ReportJob, job_id)
+    return render_template('report_job.html', job=job)
+
+@app.route('/reports/jobs/<int:job_id>/status')
+@super_admin_required
+@query_budget(2)
+def report_job_status_json(job_id):
+    """Polling endpoint for a background report job"""
+    job = db.get_or_404(ReportJob, job_id)
+    status = report_job_status(job)
+    if job.status == 'done':
+        status['download_url'] = url_for('download_report_job', job_id=job.id)
+    return jsonify(status)
+
+@app.route('/reports/jobs/<int:job_id>/download')
+@super_admin_required
+def download_report_job(job_id):
+    """Download a finished background report"""
+    job = db.get_or_404(ReportJob, job_id)
+    if job.status != 'done' or not job.output_path or not os.path.exists(job.output_path):
+        flash('This report is not ready yet.', 'info')
+        return redirect(url_for('report_job_status_page', job_id=job.id))
+
+    # Filename with the build timestamp, matching the GTN template format
+    timestamp = (job.finished_at or datetime.utcnow()).strftime('%Y%m%d_%H%M%S')
+    return send_file(
+        job.output_path,
+        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        as_attachment=True,
+        download_name=f'R05 - USER COMPLAINT REGISTER_{timestamp}.xlsx'
+    )
+
 # Master Data Management Routes
 @app.route('/super_admin/master_data')
 @super_admin_required
+@query_budget(11)
 def master_data_dashboard():
     """Master Data management dashboard"""
     categories = MasterDataCategory.query.all()
     priorities = MasterDataPriority.query.order_by(MasterDataPriority.level).all()
     statuses = MasterDataStatus.query.all()
-    email_settings = EmailSettings.query.first()
-    timezone_settings = TimezoneSettings.query.first()
-    backup_settings = BackupSettings.query.first()
+    email_settings = get_settings_snapshot(EmailSettings)
+    timezone_settings = get_settings_snapshot(TimezoneSettings)
+    backup_settings = get_settings_snapshot(BackupSettings)
     users = User.query.order_by(User.created_at.desc()).all()
     users_count = User.query.count()
     
-    # Email notification statistics
-    from models import EmailNotificationLog
-    email_sent_count = EmailNotificationLog.query.filter_by(status='sent').count()
-    email_failed_count = EmailNotificationLog.query.filter_by(status='failed').count()
+    # Email notification statistics from the daily rollup
+    email_totals = notification_totals()
+    email_sent_count = email_totals['sent']
+    email_failed_count = email_totals['failed']
     
     return render_template('master_data/dashboard.html',
                          categories=categories,
@@ -1125,6 +1235,7 @@ def master_data_dashboard():
 
 @app.route('/super_admin/master_data/categories', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_categories():
     """Manage ticket categories"""
     form = MasterDataCategoryForm()
@@ -1137,6 +1248,7 @@ def manage_categories():
             is_active=form.is_active.data
         )
         db.session.add(category)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Category "{category.name}" created successfully!', 'success')
         return redirect(url_for('manage_categories'))
@@ -1156,6 +1268,7 @@ def edit_category(category_id):
         category.description = form.description.data
         category.is_active = form.is_active.data
         category.updated_at = datetime.utcnow()
+        bump_master_data_version()
         db.session.commit()
         flash(f'Category "{category.name}" updated successfully!', 'success')
         return redirect(url_for('manage_categories'))
@@ -1172,6 +1285,7 @@ def delete_category(category_id):
     
     try:
         db.session.delete(category)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Category "{category_name}" deleted successfully!', 'success')
     except Exception as e:
@@ -1183,6 +1297,7 @@ def delete_category(category_id):
 
 @app.route('/super_admin/master_data/priorities', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_priorities():
     """Manage ticket priorities"""
     form = MasterDataPriorityForm()
@@ -1197,6 +1312,7 @@ def manage_priorities():
             is_active=form.is_active.data
         )
         db.session.add(priority)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Priority "{priority.name}" created successfully!', 'success')
         return redirect(url_for('manage_priorities'))
@@ -1206,6 +1322,7 @@ def manage_priorities():
 
 @app.route('/super_admin/master_data/statuses', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_statuses():
     """Manage ticket statuses"""
     form = MasterDataStatusForm()
@@ -1219,6 +1336,7 @@ def manage_statuses():
             is_active=form.is_active.data
         )
         db.session.add(status)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Status "{status.name}" created successfully!', 'success')
         return redirect(url_for('manage_statuses'))
@@ -1240,6 +1358,7 @@ def edit_priority(priority_id):
         priority.color_code = form.color_code.data
         priority.is_active = form.is_active.data
         priority.updated_at = datetime.utcnow()
+        bump_master_data_version()
         db.session.commit()
         flash(f'Priority "{priority.name}" updated successfully!', 'success')
         return redirect(url_for('manage_priorities'))
@@ -1256,6 +1375,7 @@ def delete_priority(priority_id):
     
     try:
         db.session.delete(priority)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Priority "{priority_name}" deleted successfully!', 'success')
     except Exception as e:
@@ -1278,6 +1398,7 @@ def edit_status(status_id):
         status.color_code = form.color_code.data
         status.is_active = form.is_active.data
         status.updated_at = datetime.utcnow()
+        bump_master_data_version()
         db.session.commit()
         flash(f'Status "{status.name}" updated successfully!', 'success')
         return redirect(url_for('manage_statuses'))
@@ -1294,6 +1415,7 @@ def delete_status(status_id):
     
     try:
         db.session.delete(status)
+        bump_master_data_version()
         db.session.commit()
         flash(f'Status "{status_name}" deleted successfully!', 'success')
     except Exception as e:
@@ -1310,6 +1432,7 @@ def delete_status(status_id):
 
 @app.route('/super_admin/master_data/email_settings', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_email_settings():
     """Manage SMTP email settings"""
     form = EmailSettingsForm()
@@ -1341,7 +1464,11 @@ def manage_email_settings():
             )
             db.session.add(email_settings)
         
+        bump_master_data_version()
         db.session.commit()
+        # Drop this worker's connections for the old account; other workers' idle out
+        from utils.smtp_pool import close_smtp_connections
+        close_smtp_connections()
         flash('Email settings saved successfully!', 'success')
         return redirect(url_for('manage_email_settings'))
     elif email_settings:
@@ -1386,6 +1513,7 @@ def test_email_settings():
 
 @app.route('/super_admin/master_data/timezone_settings', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_timezone_settings():
     """Manage timezone settings"""
     form = TimezoneSettingsForm()
@@ -1409,6 +1537,7 @@ def manage_timezone_settings():
             )
             db.session.add(timezone_settings)
         
+        bump_master_data_version()
         db.session.commit()
         flash('Timezone settings saved successfully!', 'success')
         return redirect(url_for('manage_timezone_settings'))
@@ -1423,6 +1552,7 @@ def manage_timezone_settings():
 
 @app.route('/super_admin/master_data/backup_settings', methods=['GET', 'POST'])
 @super_admin_required
+@query_budget(2)
 def manage_backup_settings():
     """Manage backup settings"""
     form = BackupSettingsForm()
@@ -1456,6 +1586,7 @@ def manage_backup_settings():
             )
             db.session.add(backup_settings)
         
+        bump_master_data_version()
         db.session.commit()
         flash('Backup settings saved successfully!', 'success')
         return redirect(url_for('manage_backup_settings'))
@@ -1475,34 +1606,31 @@ def manage_backup_settings():
 
 @app.route('/super_admin/master_data/email_notifications')
 @super_admin_required
+@query_budget(7)
 def email_notifications_dashboard():
     """Email notifications dashboard to track sent/failed emails"""
-    # Get statistics
-    total_notifications = EmailNotificationLog.query.count()
-    sent_notifications = EmailNotificationLog.query.filter_by(status='sent').count()
-    failed_notifications = EmailNotificationLog.query.filter_by(status='failed').count()
-    
-    # Get recent notifications (last 50)
-    recent_notifications = EmailNotificationLog.query.order_by(EmailNotificationLog.created_at.desc()).limit(50).all()
+    # Totals come from the daily rollup, which also covers purged log rows
+    totals = notification_totals()
     
     # Get filter parameters
     status_filter = request.args.get('status', 'all')
     message_type_filter = request.args.get('message_type', 'all')
     
     # Build filtered query
-    query = EmailNotificationLog.query
+    query = EmailNotificationLog.query.options(*notification_list_options())
     if status_filter != 'all':
         query = query.filter_by(status=status_filter)
     if message_type_filter != 'all':
         query = query.filter_by(message_type=message_type_filter)
     
-    filtered_notifications = query.order_by(EmailNotificationLog.created_at.desc()).limit(100).all()
+    filtered_notifications = paginate_from_request(query, EmailNotificationLog, count='estimate')
     
     stats = {
-        'total_notifications': total_notifications,
-        'sent_notifications': sent_notifications,
-        'failed_notifications': failed_notifications,
-        'success_rate': round((sent_notifications / total_notifications * 100) if total_notifications > 0 else 0, 1)
+        'total_notifications': totals['total'],
+        'sent_notifications': totals['sent'],
+        'failed_notifications': totals['failed'],
+        'success_rate': totals['success_rate'],
+        'retention_days': NOTIFICATION_LOG_RETENTION_DAYS
     }
     
     return render_template('master_data/email_notifications.html', 
@@ -1525,6 +1653,11 @@ def not_found_error(error):
 def forbidden_error(error):
     return render_template('403.html'), 403
 
+@app.errorhandler(413)
+def request_too_large_error(error):
+    flash(f'Upload too large: the limit is {MAX_UPLOAD_REQUEST_SIZE // (1024 * 1024)} MB per request.', 'danger')
+    return redirect(request.referrer or url_for('index'))
+
 @app.errorhandler(500)
 def internal_error(error):
     db.session.rollback()
@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app reads its configuration at import time: point it at a throwaway
+# SQLite database and keep the background email worker out of the tests
+_workdir = tempfile.mkdtemp(prefix='helpdesk-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'test.db')}"
+os.environ['EMAIL_DELIVERY_THREAD'] = '0'
+os.environ.setdefault('SESSION_SECRET', 'test-secret')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402,F401  (registers routes and commands)
+from app import app as flask_app, db  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+
+@event.listens_for(Engine, 'connect')
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys unless asked; PostgreSQL always enforces them
+    dbapi_connection.execute('PRAGMA foreign_keys = ON')
+
+
+# Connections opened while the app set itself up predate the listener
+with flask_app.app_context():
+    db.engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def app():
+    flask_app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    return flask_app
+
+
+@pytest.fixture
+def app_context(app):
+    with app.app_context():
+        yield
+        db.session.rollback()
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def users(app):
+    """{'admin': id, 'user': id, 'other': id} of the default accounts"""
+    from models import User
+
+    with app.app_context():
+        return {
+            'admin': User.query.filter_by(username='superadmin').one().id,
+            'user': User.query.filter_by(username='testuser_eng').one().id,
+            'other': User.query.filter_by(username='testuser_it').one().id,
+        }
+
+
+def login(client, user_id):
+    """Log the test client in as user_id through the real session snapshot"""
+    from models import User
+    import routes
+
+    with flask_app.test_request_context():
+        user = db.session.get(User, user_id)
+        routes.store_identity_snapshot(user)
+        from flask import session
+        values = dict(session)
+        db.session.remove()
+    with client.session_transaction() as session:
+        session.update(values)
+
+
+def make_ticket(user_id, **values):
+    """Insert a ticket the way create_ticket does (numbered inside the transaction)"""
+    from models import Ticket, User
+    from utils.ticket_numbers import assign_ticket_number
+
+    user = db.session.get(User, user_id)
+    fields = dict(title='Printer broken', description='It does not print at all', category='Hardware',
+                  priority='High', status='Open', user_id=user.id, user_name=user.full_name,
+                  user_system_name='PC1')
+    fields.update(values)
+    ticket = Ticket(**fields)
+    assign_ticket_number(ticket)
+    db.session.add(ticket)
+    return ticket
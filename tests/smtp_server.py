@@ -0,0 +1,92 @@
+import socketserver
+import threading
+import time
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded SMTP stand-in on 127.0.0.1 that records what the client did.
+
+    Recipients containing 'bad@' are refused, set drop_next to hang up on
+    the next MAIL FROM, and delay holds each DATA reply to keep sends in
+    flight at the same time.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.recipients = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.drop_next = False
+        self.delay = delay
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def settings(self):
+        return {
+            'smtp_server': '127.0.0.1', 'smtp_port': self.server_address[1],
+            'smtp_username': 'helpdesk', 'smtp_password': 'secret', 'use_tls': False,
+            'from_email': 'helpdesk@gtn.com', 'from_name': 'GTN IT Helpdesk',
+        }
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply('220 stand-in ready')
+        recipient = None
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'AUTH':
+                with server.lock:
+                    server.logins += 1
+                self.reply('235 authenticated')
+            elif verb in ('NOOP', 'RSET'):
+                self.reply('250 ok')
+            elif verb == 'MAIL':
+                with server.lock:
+                    drop, server.drop_next = server.drop_next, False
+                if drop:
+                    return  # hang up mid-session
+                self.reply('250 ok')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip(' <>')
+                self.reply('550 no such user' if 'bad@' in recipient else '250 ok')
+            elif verb == 'DATA':
+                self.reply('354 go ahead')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                with server.lock:
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                time.sleep(server.delay)
+                with server.lock:
+                    server.in_flight -= 1
+                    server.recipients.append(recipient)
+                self.reply('250 queued')
+            elif verb == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
@@ -0,0 +1,42 @@
+import pytest
+
+from conftest import login
+from utils.date_windows import day_month_year_window, range_window, report_window
+
+
+def test_valid_year_window_is_half_open():
+    start, end = report_window('year', year='2024')
+    assert (end - start).days == 366
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'filter_mode': 'range', 'from_date': '2024-01-01', 'to_date': '9999-12-31'},
+    {'filter_mode': 'range', 'from_date': '0001-01-01', 'to_date': '2024-01-01'},
+    {'filter_mode': 'range', 'from_date': '2024-02-30', 'to_date': '2024-03-01'},
+    {'filter_mode': 'year', 'year': '10000'},
+    {'filter_mode': 'year', 'year': '9999'},
+    {'filter_mode': 'month', 'month': '9999-12'},
+    {'filter_mode': 'month', 'month': 'May'},
+])
+def test_out_of_range_values_are_ignored_or_rejected(kwargs):
+    assert report_window(**kwargs) is None
+    with pytest.raises(ValueError):
+        report_window(**kwargs, strict=True)
+
+
+def test_missing_values_are_not_an_error():
+    assert report_window('range', from_date='2024-01-01', strict=True) is None
+    assert report_window('year', strict=True) is None
+
+
+def test_range_ending_at_calendar_end():
+    assert range_window('9999-12-30', '9999-12-31') is None
+    assert day_month_year_window(day='31', month='12', year='9999') is None
+
+
+def test_excel_report_rejects_bad_dates_without_a_server_error(client, users):
+    login(client, users['admin'])
+    for query in ('filter_mode=range&from_date=2024-01-01&to_date=9999-12-31', 'filter_mode=year&year=10000'):
+        response = client.get(f'/download-excel-report?{query}')
+        assert response.status_code == 302
+        assert response.location.endswith('/reports-dashboard')
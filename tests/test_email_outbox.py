@@ -0,0 +1,105 @@
+from datetime import datetime
+from unittest.mock import Mock
+
+import pytest
+
+import utils.email_outbox as email_outbox
+from app import db
+from conftest import login
+from models import EmailNotificationLog, EmailOutbox, User
+from utils.email_outbox import queue_email
+
+
+class FakeThread:
+    """Records the delivery thread instead of running it"""
+    started = []
+
+    def __init__(self, target, name, daemon):
+        self.target = target
+
+    def start(self):
+        FakeThread.started.append(self)
+
+    def is_alive(self):
+        return True
+
+
+def test_worker_starts_on_first_request_without_new_email(client, monkeypatch):
+    FakeThread.started = []
+    monkeypatch.setattr(email_outbox, 'EMAIL_DELIVERY_THREAD', True)
+    monkeypatch.setattr(email_outbox, '_worker', None)
+    monkeypatch.setattr(email_outbox.threading, 'Thread', FakeThread)
+    email_outbox._wake.clear()
+
+    client.get('/')
+    assert len(FakeThread.started) == 1
+    assert FakeThread.started[0].target is email_outbox._worker_loop
+    # Woken up front, so messages left pending by a restart go out without waiting a poll interval
+    assert email_outbox._wake.is_set()
+
+    client.get('/')
+    assert len(FakeThread.started) == 1
+
+
+def test_worker_not_started_when_disabled(client, monkeypatch):
+    FakeThread.started = []
+    monkeypatch.setattr(email_outbox, 'EMAIL_DELIVERY_THREAD', False)
+    monkeypatch.setattr(email_outbox, '_worker', None)
+    monkeypatch.setattr(email_outbox.threading, 'Thread', FakeThread)
+
+    client.get('/')
+    assert FakeThread.started == []
+
+
+@pytest.fixture
+def contractor(app):
+    with app.app_context():
+        user = User(username='mailee', email='mailee@gtn.com', first_name='Mail', last_name='Ee',
+                    department='IT', role='user')
+        user.set_password('mailee123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    yield user_id
+    with app.app_context():
+        EmailOutbox.query.filter_by(to_email='mailee@gtn.com').delete()
+        EmailNotificationLog.query.filter_by(to_email='mailee@gtn.com').delete()
+        User.query.filter_by(id=user_id).delete()
+        db.session.commit()
+
+
+def _queue_for(app, user_id):
+    with app.app_context():
+        queue_email('mailee@gtn.com', 'Ticket updated', 'Hello,\n\nUpdated.', user_id=user_id)
+        EmailOutbox.query.filter_by(to_email='mailee@gtn.com').update({'next_attempt_at': datetime(2000, 1, 1)})
+        db.session.commit()
+
+
+def test_mail_queued_for_a_deleted_user_is_logged_once(app, client, users, contractor, monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_outbox, '_send_batch', lambda messages: sent.extend(messages) or {})
+    _queue_for(app, contractor)
+    login(client, users['admin'])
+    client.post(f'/delete-user/{contractor}')
+
+    with app.app_context():
+        assert db.session.get(User, contractor) is None
+        email_outbox.drain_outbox()
+        log = EmailNotificationLog.query.filter_by(to_email='mailee@gtn.com').one()
+        assert (log.status, log.user_id) == ('sent', None)
+        assert EmailOutbox.query.filter_by(to_email='mailee@gtn.com').count() == 0
+    assert len(sent) == 1
+
+
+def test_batch_that_cannot_be_settled_is_dropped_not_resent(app, contractor, monkeypatch):
+    sent = []
+    monkeypatch.setattr(email_outbox, '_send_batch', lambda messages: sent.extend(messages) or {})
+    monkeypatch.setattr('utils.notification_rollup.record_notifications', Mock(side_effect=RuntimeError('db down')))
+    _queue_for(app, contractor)
+
+    with app.app_context():
+        email_outbox.deliver_outbox_batch()
+        assert EmailOutbox.query.filter_by(to_email='mailee@gtn.com').count() == 0
+        # Even once the claim would have timed out, nothing is left to send again
+        email_outbox.deliver_outbox_batch()
+    assert len(sent) == 1
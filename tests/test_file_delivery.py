@@ -0,0 +1,99 @@
+import io
+import os
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import Attachment, StoredFile, Ticket
+from utils import file_delivery, file_store
+from utils.file_delivery import ProxyEmulator
+from utils.file_store import add_reference, store_stream
+
+CONTENT = b'%PDF-1.4 quarterly report'
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    folder = tmp_path / 'uploads'
+    monkeypatch.setattr(file_store, 'OBJECT_FOLDER', str(folder / 'objects'))
+    monkeypatch.setattr(file_delivery, 'UPLOAD_FOLDER', str(folder))
+    return folder
+
+
+@pytest.fixture
+def attachment(app, users, uploads):
+    """Filename of a stored attachment on one of the test user's tickets"""
+    with app.app_context():
+        ticket = make_ticket(users['user'])
+        sha256, size = store_stream(io.BytesIO(CONTENT))
+        add_reference(sha256, size)
+        db.session.flush()
+        db.session.add(Attachment(ticket_id=ticket.id, filename='20240101_120000_report.pdf',
+                                  original_name='report.pdf', sha256=sha256))
+        db.session.commit()
+        ticket_id = ticket.id
+    yield '20240101_120000_report.pdf'
+    with app.app_context():
+        Attachment.query.filter_by(ticket_id=ticket_id).delete()
+        StoredFile.query.filter_by(sha256=sha256).delete()
+        Ticket.query.filter_by(id=ticket_id).delete()
+        db.session.commit()
+
+
+@pytest.fixture
+def emulated(app, monkeypatch):
+    monkeypatch.setattr(app, 'wsgi_app', ProxyEmulator(app.wsgi_app))
+
+
+@pytest.mark.parametrize('mode, header', [('x-accel', 'X-Accel-Redirect'), ('x-sendfile', 'X-Sendfile')])
+def test_proxy_mode_sends_only_the_header(client, users, attachment, monkeypatch, mode, header):
+    monkeypatch.setattr(file_delivery, 'FILE_DELIVERY', mode)
+    login(client, users['user'])
+
+    response = client.get(f'/download-attachment/{attachment}')
+
+    assert response.status_code == 200
+    assert response.data == b''
+    assert response.headers[header]
+    assert 'report.pdf' in response.headers['Content-Disposition']
+
+
+@pytest.mark.parametrize('mode', ['x-accel', 'x-sendfile'])
+def test_emulator_serves_the_file(client, users, attachment, emulated, monkeypatch, mode):
+    monkeypatch.setattr(file_delivery, 'FILE_DELIVERY', mode)
+    login(client, users['user'])
+
+    response = client.get(f'/download-attachment/{attachment}')
+
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert 'X-Accel-Redirect' not in response.headers and 'X-Sendfile' not in response.headers
+    assert 'report.pdf' in response.headers['Content-Disposition']
+
+    ranged = client.get(f'/download-attachment/{attachment}', headers={'Range': 'bytes=0-3'})
+    assert ranged.status_code == 206
+    assert ranged.data == CONTENT[:4]
+
+
+@pytest.mark.parametrize('header, value', [
+    ('X-Accel-Redirect', '/protected-uploads/%2e%2e/secret.txt'),
+    ('X-Accel-Redirect', '/protected-uploads/objects/../../secret.txt'),
+    ('X-Sendfile', '{outside}'),
+])
+def test_emulator_rejects_paths_outside_the_uploads_folder(uploads, header, value):
+    outside = uploads.parent / 'secret.txt'
+    outside.write_bytes(b'not for download')
+    os.makedirs(uploads, exist_ok=True)
+
+    def upstream(environ, start_response):
+        start_response('200 OK', [(header, value.format(outside=outside)), ('Content-Type', 'text/plain')])
+        return [b'']
+
+    status = {}
+    body = ProxyEmulator(upstream)({'REQUEST_METHOD': 'GET', 'wsgi.url_scheme': 'http', 'SERVER_NAME': 'localhost',
+                                    'SERVER_PORT': '80'},
+                                   lambda s, headers, exc_info=None: status.setdefault('status', s))
+
+    assert status['status'].startswith('404')
+    assert b'not for download' not in b''.join(body)
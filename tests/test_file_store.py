@@ -0,0 +1,72 @@
+import io
+import os
+import time
+
+import pytest
+
+from app import db
+from models import StoredFile
+from utils import file_store
+from utils.file_store import add_reference, collect_garbage, object_path, store_stream
+
+
+@pytest.fixture
+def store(app, tmp_path, monkeypatch):
+    """An empty object store; yields a list of hashes whose stored_files rows are removed afterwards"""
+    monkeypatch.setattr(file_store, 'OBJECT_FOLDER', str(tmp_path / 'objects'))
+    committed = []
+    with app.app_context():
+        yield committed
+        db.session.rollback()
+        StoredFile.query.filter(StoredFile.sha256.in_(committed)).delete()
+        db.session.commit()
+        db.session.remove()
+
+
+def age(path, seconds=2 * 3600):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_blob_of_a_rolled_back_upload_is_swept(store):
+    sha256, size = store_stream(io.BytesIO(b'rolled back upload'))
+    add_reference(sha256, size)
+    db.session.rollback()
+    age(object_path(sha256))
+
+    assert collect_garbage() == 1
+    assert not os.path.exists(object_path(sha256))
+
+
+def test_referenced_and_recent_blobs_are_kept(store):
+    sha256, size = store_stream(io.BytesIO(b'committed upload'))
+    store.append(sha256)
+    add_reference(sha256, size)
+    db.session.commit()
+    age(object_path(sha256))
+    recent, _ = store_stream(io.BytesIO(b'upload still in its transaction'))
+
+    assert collect_garbage() == 0
+    assert os.path.exists(object_path(sha256))
+    assert os.path.exists(object_path(recent))
+
+
+def test_reused_orphan_is_kept_until_the_grace_period_passes_again(store):
+    sha256, _ = store_stream(io.BytesIO(b'reused content'))
+    age(object_path(sha256))
+    # A second upload of the same bytes before its row commits
+    store_stream(io.BytesIO(b'reused content'))
+
+    assert collect_garbage() == 0
+    assert os.path.exists(object_path(sha256))
+
+
+def test_stale_upload_temporaries_are_swept(store):
+    os.makedirs(file_store.OBJECT_FOLDER, exist_ok=True)
+    temp_path = os.path.join(file_store.OBJECT_FOLDER, '.upload-crashed')
+    with open(temp_path, 'wb') as temp:
+        temp.write(b'partial')
+    age(temp_path)
+
+    assert collect_garbage() == 1
+    assert not os.path.exists(temp_path)
@@ -0,0 +1,73 @@
+import pytest
+
+from app import db
+from conftest import login
+from models import User
+from utils import query_debug
+
+
+@pytest.fixture
+def second_admin(app):
+    with app.app_context():
+        admin = User(username='deputy', email='deputy@gtn.com', first_name='Deputy', last_name='Admin',
+                     department='IT Administration', role='super_admin')
+        admin.set_password('deputy123')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+    yield admin_id
+    with app.app_context():
+        admin = db.session.get(User, admin_id)
+        if admin is not None:
+            db.session.delete(admin)
+            db.session.commit()
+
+
+def _edit_form(role):
+    return {'username': 'deputy', 'role': role, 'first_name': 'Deputy', 'last_name': 'Admin',
+            'email': 'deputy@gtn.com', 'department': 'IT Administration', 'specialization': '',
+            'system_name': ''}
+
+
+def test_demoted_admin_loses_access_on_next_request(app, users, second_admin):
+    deputy, superadmin = app.test_client(), app.test_client()
+    login(deputy, second_admin)
+    login(superadmin, users['admin'])
+    assert deputy.get('/super_admin/master_data').status_code == 200
+
+    response = superadmin.post(f'/edit-user/{second_admin}', data=_edit_form('user'))
+    assert response.status_code == 302
+
+    response = deputy.get('/super_admin/master_data')
+    assert response.status_code == 302
+    assert '/super_admin' not in response.location
+
+
+def test_deleted_admin_loses_access_on_next_request(app, users, second_admin):
+    deputy, superadmin = app.test_client(), app.test_client()
+    login(deputy, second_admin)
+    login(superadmin, users['admin'])
+    assert deputy.get('/super_admin/master_data').status_code == 200
+
+    assert superadmin.post(f'/delete-user/{second_admin}').status_code == 302
+    with app.app_context():
+        assert db.session.get(User, second_admin) is None
+
+    response = deputy.get('/super_admin/master_data')
+    assert response.status_code == 302
+    assert '/super_admin' not in response.location
+
+
+
+def test_authorization_reads_only_the_shared_version(app, users, monkeypatch):
+    client = app.test_client()
+    login(client, users['admin'])
+    client.get('/reports/jobs/0/status')
+
+    statements = []
+    monkeypatch.setattr(query_debug, '_normalize', lambda sql: statements.append(sql) or sql)
+    assert client.get('/reports/jobs/0/status').status_code == 404
+    # The master data version, then the job lookup itself; the user row is never loaded
+    assert len(statements) == 2
+    assert 'ticket_counters' in statements[0]
+    assert not any('FROM users' in sql for sql in statements)
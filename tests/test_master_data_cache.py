@@ -0,0 +1,58 @@
+import pytest
+
+from app import db
+from models import MasterDataCategory
+from utils import master_data_cache
+from utils.master_data_cache import bump_master_data_version, get_active_categories
+
+
+@pytest.fixture
+def category(app):
+    with app.app_context():
+        master_data_cache.clear_master_data_cache()
+        yield
+        MasterDataCategory.query.filter_by(name='Furniture').delete()
+        bump_master_data_version()
+        db.session.commit()
+        db.session.remove()
+
+
+def add_category(commit):
+    db.session.add(MasterDataCategory(name='Furniture'))
+    bump_master_data_version()
+    if commit:
+        db.session.commit()
+    else:
+        db.session.rollback()
+
+
+def test_committed_change_is_seen_by_the_next_request(app, category):
+    with app.test_request_context():
+        assert 'Furniture' not in get_active_categories()
+    with app.test_request_context():
+        add_category(commit=True)
+    with app.test_request_context():
+        assert 'Furniture' in get_active_categories()
+
+
+def test_rows_read_before_the_commit_are_not_served_after_it(app, category):
+    with app.test_request_context():
+        get_active_categories()
+        db.session.add(MasterDataCategory(name='Furniture'))
+        bump_master_data_version()
+        db.session.flush()
+        # Another request on this worker reading before the commit caches the old list under the old version
+        master_data_cache._cache['entries']['active_categories'] = ['Hardware']
+        db.session.commit()
+    with app.test_request_context():
+        assert 'Furniture' in get_active_categories()
+
+
+def test_rolled_back_change_keeps_the_cache(app, category):
+    with app.test_request_context():
+        get_active_categories()
+        version = master_data_cache._cache['version']
+        add_category(commit=False)
+    with app.test_request_context():
+        assert 'Furniture' not in get_active_categories()
+        assert master_data_cache._cache['version'] == version
@@ -0,0 +1,46 @@
+from datetime import datetime
+
+from app import db
+from conftest import login
+from models import NotificationPreference, User
+from utils.master_data_cache import get_master_data_version
+from utils.notification_digest import get_digest_preference, schedule_notification, set_digest_preference
+
+
+def test_digest_choice_applies_at_once_without_moving_the_master_data_version(app, users):
+    now = datetime(2024, 5, 1, 10, 30)
+    with app.test_request_context():
+        version = get_master_data_version()
+        set_digest_preference(users['user'], 'hourly')
+        db.session.commit()
+    try:
+        with app.test_request_context():
+            assert get_master_data_version() == version
+            assert get_digest_preference(users['user']) == 'hourly'
+            assert schedule_notification('user@example.com', ticket_id=1, user_id=users['user'], now=now) == (
+                'digest:hourly:user@example.com', datetime(2024, 5, 1, 11, 0)
+            )
+            assert get_digest_preference(users['other']) == 'off'
+    finally:
+        with app.app_context():
+            db.session.delete(db.session.get(NotificationPreference, users['user']))
+            db.session.commit()
+
+
+def test_deleting_a_user_removes_their_digest_preference(app, client, users):
+    with app.app_context():
+        user = User(username='digester', email='digester@gtn.com', first_name='Dee', last_name='Gest',
+                    department='IT', role='user')
+        user.set_password('digester123')
+        db.session.add(user)
+        db.session.flush()
+        set_digest_preference(user.id, 'daily')
+        db.session.commit()
+        user_id = user.id
+
+    login(client, users['admin'])
+    client.post(f'/delete-user/{user_id}')
+
+    with app.app_context():
+        assert db.session.get(User, user_id) is None
+        assert db.session.get(NotificationPreference, user_id) is None
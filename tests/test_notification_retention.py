@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from conftest import login
+from models import EmailNotificationDailyStats, EmailNotificationLog
+from utils import notification_retention
+from utils.notification_retention import purge_notification_logs
+from utils.notification_rollup import notification_totals, record_notifications
+
+MESSAGE_TYPE = 'retention_test'
+
+
+@pytest.fixture
+def logs(app, monkeypatch):
+    """Seven expired and three recent notification log rows, counted into the rollup; yields the pauses taken"""
+    pauses = []
+    monkeypatch.setattr(notification_retention.time, 'sleep', pauses.append)
+    now = datetime.utcnow()
+    with app.app_context():
+        rows = [
+            dict(to_email='retention@example.com', subject='Seeded', message_type=MESSAGE_TYPE,
+                 status='failed' if i % 3 == 0 else 'sent', created_at=created_at)
+            for i, created_at in enumerate([now - timedelta(days=400, minutes=i) for i in range(7)] +
+                                           [now - timedelta(minutes=i) for i in range(3)])
+        ]
+        db.session.execute(EmailNotificationLog.__table__.insert(), rows)
+        record_notifications(rows)
+        db.session.commit()
+        yield pauses
+        db.session.rollback()
+        EmailNotificationLog.query.filter_by(message_type=MESSAGE_TYPE).delete()
+        EmailNotificationDailyStats.query.filter_by(message_type=MESSAGE_TYPE).delete()
+        db.session.commit()
+        db.session.remove()
+
+
+def seeded_dates():
+    return [created_at for (created_at,) in db.session.query(EmailNotificationLog.created_at)
+            .filter_by(message_type=MESSAGE_TYPE)]
+
+
+def test_purge_deletes_expired_rows_in_batches(logs):
+    deleted = purge_notification_logs(retention_days=180, batch_size=2)
+
+    assert deleted == 7
+    # Four batches of at most two rows, pausing between the full ones
+    assert len(logs) == 3
+    cutoff = datetime.utcnow() - timedelta(days=180)
+    assert len(seeded_dates()) == 3 and all(created_at > cutoff for created_at in seeded_dates())
+    assert purge_notification_logs(retention_days=180, batch_size=2) == 0
+
+
+def test_rollup_keeps_the_counts_of_purged_rows(app, client, users, logs):
+    before = notification_totals(MESSAGE_TYPE)
+    assert (before['sent'], before['failed']) == (6, 4)
+
+    purge_notification_logs(retention_days=180)
+    assert notification_totals(MESSAGE_TYPE) == before
+
+    totals = notification_totals()
+    db.session.remove()
+    login(client, users['admin'])
+    page = client.get('/super_admin/master_data/email_notifications').get_data(as_text=True)
+    for value in (totals['total'], totals['sent'], totals['failed'], f"{totals['success_rate']}%"):
+        assert f'<h3 class="stat-number">{value}</h3>' in page
@@ -0,0 +1,135 @@
+import base64
+import io
+from datetime import date
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import Attachment, ReportJob, StoredFile, Ticket, TicketComment
+from utils import file_delivery, file_store, thumbnails
+from utils.file_store import add_reference, store_stream
+from utils.master_data_cache import clear_master_data_cache
+from utils.query_debug import QUERY_BUDGETS
+
+# 1x1 pixel
+PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg==')
+
+
+@pytest.fixture
+def workload(app, users, tmp_path, monkeypatch):
+    """seed(n) adds n tickets with comments and an image attachment; returns the first ticket's id and image"""
+    monkeypatch.setattr(file_store, 'OBJECT_FOLDER', str(tmp_path / 'uploads' / 'objects'))
+    monkeypatch.setattr(file_delivery, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(thumbnails, 'THUMBNAIL_FOLDER', str(tmp_path / 'uploads' / 'thumbnails'))
+    created = {'tickets': [], 'jobs': []}
+
+    def seed(n):
+        with app.app_context():
+            sha256, size = store_stream(io.BytesIO(PNG))
+            created['sha256'] = sha256
+            for _ in range(n):
+                ticket = make_ticket(users['user'], assigned_to=users['admin'])
+                db.session.flush()
+                filename = f'{ticket.id}_screen.png'
+                if not created['tickets']:
+                    ticket.image_filename = filename
+                add_reference(sha256, size)
+                db.session.add(Attachment(ticket_id=ticket.id, filename=filename, original_name='screen.png',
+                                          sha256=sha256))
+                for author in (users['user'], users['admin'], users['other']):
+                    db.session.add(TicketComment(ticket_id=ticket.id, user_id=author, comment='Any news?'))
+                created['tickets'].append(ticket.id)
+            first = created['tickets'][0]
+            # The detail views' ticket gains comments too
+            for _ in range(n):
+                db.session.add(TicketComment(ticket_id=first, user_id=users['admin'], comment='Looking into it'))
+            if not created['jobs']:
+                job = ReportJob(params_key='budget-test', params='{}', data_version='budget-test', status='done')
+                db.session.add(job)
+                db.session.flush()
+                created['jobs'].append(job.id)
+            db.session.commit()
+            return first, f'{first}_screen.png', created['jobs'][0]
+
+    yield seed
+    with app.app_context():
+        TicketComment.query.filter(TicketComment.ticket_id.in_(created['tickets'])).delete()
+        Attachment.query.filter(Attachment.ticket_id.in_(created['tickets'])).delete()
+        Ticket.query.filter(Ticket.id.in_(created['tickets'])).delete()
+        StoredFile.query.filter_by(sha256=created.get('sha256')).delete()
+        ReportJob.query.filter(ReportJob.id.in_(created['jobs'])).delete()
+        db.session.commit()
+
+
+def admin_pages(ticket_id, image, job_id, users):
+    return {
+        'super_admin_dashboard': '/super-admin-dashboard',
+        'reports_dashboard': f'/reports-dashboard?year={date.today().year}',
+        'manage_users': '/manage-users',
+        'view_user': f"/view-user/{users['user']}",
+        'view_ticket': f'/ticket/{ticket_id}',
+        'edit_ticket': f'/ticket/{ticket_id}/edit',
+        'assign_work': f'/assign-work/{ticket_id}',
+        'edit_assignment': f'/edit-assignment/{ticket_id}',
+        'view_image': f'/view-image/{image}',
+        'view_image_preview': f'/image-preview/160/{image}',
+        'download_attachment': f'/download-attachment/{image}',
+        'report_job_status_page': f'/reports/jobs/{job_id}',
+        'report_job_status_json': f'/reports/jobs/{job_id}/status',
+        'email_notifications_dashboard': '/super_admin/master_data/email_notifications',
+        'master_data_dashboard': '/super_admin/master_data',
+        'manage_categories': '/super_admin/master_data/categories',
+        'manage_priorities': '/super_admin/master_data/priorities',
+        'manage_statuses': '/super_admin/master_data/statuses',
+        'manage_email_settings': '/super_admin/master_data/email_settings',
+        'manage_timezone_settings': '/super_admin/master_data/timezone_settings',
+        'manage_backup_settings': '/super_admin/master_data/backup_settings',
+    }
+
+
+def user_pages(ticket_id, image):
+    return {
+        'user_dashboard': '/user-dashboard',
+        'user_profile': '/user-profile',
+        'create_ticket': '/create-ticket',
+        'view_ticket': f'/ticket/{ticket_id}',
+        'view_image': f'/view-image/{image}',
+        'download_attachment': f'/download-attachment/{image}',
+    }
+
+
+def query_counts(app, client, users, ticket_id, image, job_id):
+    counts = {}
+    for who, pages in (('admin', admin_pages(ticket_id, image, job_id, users)), ('user', user_pages(ticket_id, image))):
+        login(client, users[who])
+        for endpoint, url in pages.items():
+            response = client.get(url)
+            assert response.status_code == 200, url
+            assert response.headers['X-Query-Budget'] == str(QUERY_BUDGETS[endpoint]), url
+            counts[(who, endpoint)] = int(response.headers['X-Query-Count'])
+    return counts
+
+
+def test_list_and_detail_views_stay_within_a_constant_budget(app, client, users, workload):
+    pages = workload(3)
+    # Budgets include loading master data and settings into an empty cache
+    clear_master_data_cache()
+    cold = query_counts(app, client, users, *pages)
+    few = query_counts(app, client, users, *pages)
+    many = query_counts(app, client, users, *workload(30))
+
+    assert many == few
+    over = {key: count for counts in (cold, many) for key, count in counts.items() if count > QUERY_BUDGETS[key[1]]}
+    assert not over
+
+
+def test_query_count_header_follows_the_query_debug_setting(app, client, users, monkeypatch):
+    login(client, users['user'])
+    monkeypatch.setitem(app.config, 'TESTING', False)
+    monkeypatch.setitem(app.config, 'QUERY_DEBUG', False)
+    assert 'X-Query-Count' not in client.get('/user-dashboard').headers
+
+    monkeypatch.setitem(app.config, 'QUERY_DEBUG', True)
+    response = client.get('/user-dashboard')
+    assert int(response.headers['X-Query-Count']) <= int(response.headers['X-Query-Budget'])
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert, text
+
+from app import db
+from models import EmailNotificationLog, Ticket, TicketComment
+from utils.query_plans import explain_hot_queries
+
+SEED_TICKETS = 3000
+SEED_PREFIX = 'PLAN-'
+
+
+@pytest.fixture
+def seeded(app, users):
+    """Enough tickets, comments and notification logs that a full scan is never the cheap plan"""
+    start = datetime(2023, 1, 1)
+    owners = list(users.values())
+    with app.app_context():
+        db.session.execute(insert(Ticket), [
+            dict(ticket_number=f'{SEED_PREFIX}{i}', title='Seeded', description='Seeded ticket',
+                 category='Hardware', priority='Low', status=('Open', 'In Progress', 'Resolved', 'Closed')[i % 4],
+                 user_name='Seed', image_filename=f'seed-{i}.png' if i % 10 == 0 else None,
+                 user_id=owners[i % len(owners)], assigned_to=owners[(i + 1) % len(owners)],
+                 created_at=start + timedelta(minutes=i), updated_at=start)
+            for i in range(SEED_TICKETS)
+        ])
+        ticket_ids = db.session.execute(
+            text('SELECT id FROM tickets WHERE ticket_number LIKE :prefix'), {'prefix': f'{SEED_PREFIX}%'}
+        ).scalars().all()
+        db.session.execute(insert(TicketComment), [
+            dict(ticket_id=ticket_id, user_id=owners[ticket_id % len(owners)], comment='Seeded',
+                 created_at=start + timedelta(minutes=n))
+            for n, ticket_id in enumerate(ticket_ids)
+        ])
+        db.session.execute(insert(EmailNotificationLog), [
+            dict(to_email='seed@example.com', subject='Seeded', message_type=('ticket_created', 'ticket_updated')[i % 2],
+                 status=('sent', 'failed')[i % 3 == 0], created_at=start + timedelta(minutes=i))
+            for i in range(SEED_TICKETS)
+        ])
+        db.session.commit()
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+        yield
+        db.session.execute(delete(TicketComment).where(TicketComment.ticket_id.in_(ticket_ids)))
+        db.session.execute(delete(Ticket).where(Ticket.id.in_(ticket_ids)))
+        db.session.execute(delete(EmailNotificationLog).where(EmailNotificationLog.to_email == 'seed@example.com'))
+        db.session.commit()
+        db.session.remove()
+
+
+def test_hot_queries_use_an_index(seeded):
+    results = explain_hot_queries()
+    failures = {name: plan_lines for name, uses_index, plan_lines in results if not uses_index}
+    assert not failures
+
+
+def test_keyset_pages_are_read_in_index_order(seeded):
+    # Sorting every matching row before applying LIMIT would defeat keyset paging
+    for name, uses_index, plan_lines in explain_hot_queries():
+        if name.startswith(('tickets_by_user', 'tickets_by_assignee', 'notifications')):
+            assert not any(line == 'USE TEMP B-TREE FOR ORDER BY' for line in plan_lines), (name, plan_lines)
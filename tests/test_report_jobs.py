@@ -0,0 +1,108 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import ReportJob, Ticket
+from utils import report_jobs
+from utils.report_jobs import report_params, run_report_job, submit_report_job
+
+# Reported tickets are dated in 2017 so other tests' rows never change the report
+PARAMS = report_params('year', year='2017')
+
+
+@pytest.fixture
+def jobs(app, users, tmp_path, monkeypatch):
+    """Runs report builds in-process on demand; yields the list of queued job ids"""
+    queued = []
+    monkeypatch.setenv('REPORT_OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(report_jobs, '_enqueue', queued.append)
+    with app.app_context():
+        make_ticket(users['user'], title='Report row', created_at=datetime(2017, 5, 1, 9, 30))
+        db.session.commit()
+        yield queued
+        db.session.rollback()
+        ReportJob.query.delete()
+        Ticket.query.filter(Ticket.created_at < datetime(2018, 1, 1)).delete()
+        db.session.commit()
+        db.session.remove()
+
+
+def build(job):
+    run_report_job(job.id)
+    db.session.expire_all()
+    return db.session.get(ReportJob, job.id)
+
+
+def test_identical_requests_share_one_job(jobs, users):
+    first = submit_report_job(PARAMS, requested_by=users['admin'])
+    second = submit_report_job(dict(PARAMS), requested_by=users['admin'])
+
+    assert first.id == second.id
+    assert jobs == [first.id]
+
+    done = build(first)
+    assert (done.status, done.progress, done.row_count) == ('done', 100, 1)
+    assert os.path.exists(done.output_path)
+    # A finished file is reused without queueing another build
+    assert submit_report_job(PARAMS).id == first.id
+    assert jobs == [first.id]
+
+
+def test_data_change_queues_a_new_job_and_prunes_the_old_file(jobs, users):
+    old = build(submit_report_job(PARAMS))
+
+    make_ticket(users['other'], title='Late report row', created_at=datetime(2017, 6, 1, 9, 30))
+    db.session.commit()
+    new = submit_report_job(PARAMS)
+    assert new.id != old.id
+
+    old_id, old_path = old.id, old.output_path
+    new = build(new)
+    assert new.row_count == 2
+    assert not os.path.exists(old_path)
+    assert db.session.get(ReportJob, old_id) is None
+
+
+@pytest.mark.parametrize('breakage', ['failed', 'missing file'])
+def test_unusable_job_is_rebuilt(jobs, breakage):
+    job = build(submit_report_job(PARAMS))
+    if breakage == 'failed':
+        job.status, job.error = 'failed', 'disk full'
+        db.session.commit()
+    else:
+        os.remove(job.output_path)
+
+    again = submit_report_job(PARAMS)
+
+    assert again.id == job.id
+    assert (again.status, again.output_path, again.error) == ('queued', None, None)
+    assert jobs == [job.id, job.id]
+    assert build(again).status == 'done'
+
+
+def test_polling_and_download_routes(client, jobs, users):
+    with client:
+        login(client, users['admin'])
+        job_id = submit_report_job(PARAMS).id
+        db.session.commit()
+
+        assert client.get(f'/reports/jobs/{job_id}').status_code == 200
+        status = client.get(f'/reports/jobs/{job_id}/status').get_json()
+        assert (status['status'], 'download_url' in status) == ('queued', False)
+        pending = client.get(f'/reports/jobs/{job_id}/download')
+        assert pending.status_code == 302 and pending.location.endswith(f'/reports/jobs/{job_id}')
+
+        run_report_job(job_id)
+        status = client.get(f'/reports/jobs/{job_id}/status').get_json()
+        assert (status['status'], status['progress'], status['row_count']) == ('done', 100, 1)
+
+        download = client.get(status['download_url'])
+        assert download.status_code == 200
+        assert download.data.startswith(b'PK')
+        assert 'R05 - USER COMPLAINT REGISTER_' in download.headers['Content-Disposition']
+        download.close()
+
+        assert client.get('/reports/jobs/999999/status').status_code == 404
@@ -0,0 +1,54 @@
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import Ticket, TicketComment, User
+from utils.search import index_ticket, search_tickets
+
+
+def matches(search_text):
+    return [ticket.title for ticket in search_tickets(Ticket.query, search_text).all()]
+
+
+@pytest.fixture
+def indexed_ticket(app, users):
+    with app.app_context():
+        ticket = make_ticket(users['user'], title='Printer broken on floor three', description='Paper jams')
+        db.session.flush()
+        index_ticket(ticket.id)
+        db.session.commit()
+        ticket_id = ticket.id
+    yield ticket_id
+    with app.app_context():
+        TicketComment.query.filter_by(ticket_id=ticket_id).delete()
+        Ticket.query.filter_by(id=ticket_id).delete()
+        db.session.commit()
+
+
+def test_only_the_last_term_matches_as_a_prefix(app, indexed_ticket):
+    with app.app_context():
+        assert 'Printer broken on floor three' in matches('printer bro')
+        assert 'Printer broken on floor three' not in matches('print broken')
+
+
+def test_deleted_users_comments_leave_the_search_index(app, client, users, indexed_ticket):
+    with app.app_context():
+        contractor = User(username='contractor', email='contractor@gtn.com', first_name='Temp',
+                          last_name='Contractor', department='IT', role='user')
+        contractor.set_password('contractor123')
+        db.session.add(contractor)
+        db.session.flush()
+        db.session.add(TicketComment(ticket_id=indexed_ticket, user_id=contractor.id,
+                                     comment='Replaced the zanzibar fuser'))
+        index_ticket(indexed_ticket)
+        db.session.commit()
+        contractor_id = contractor.id
+        assert matches('zanzibar') == ['Printer broken on floor three']
+
+    login(client, users['admin'])
+    client.post(f'/delete-user/{contractor_id}')
+
+    with app.app_context():
+        assert db.session.get(User, contractor_id) is None
+        assert matches('zanzibar') == []
+        assert 'Printer broken on floor three' in matches('printer')
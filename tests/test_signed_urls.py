@@ -0,0 +1,110 @@
+import io
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import Attachment, StoredFile, Ticket, User
+from utils import file_delivery, file_store, query_debug
+from utils.file_store import add_reference, store_stream
+from utils.signed_urls import SIGNED_URL_TTL, signed_file_url
+
+CONTENT = b'%PDF-1.4 signed report'
+FILENAME = '20240101_120000_signed.pdf'
+
+
+@pytest.fixture
+def attachment(app, users, tmp_path, monkeypatch):
+    """A stored attachment on one of the test user's tickets"""
+    monkeypatch.setattr(file_store, 'OBJECT_FOLDER', str(tmp_path / 'objects'))
+    monkeypatch.setattr(file_delivery, 'UPLOAD_FOLDER', str(tmp_path))
+    with app.app_context():
+        ticket = make_ticket(users['user'])
+        sha256, size = store_stream(io.BytesIO(CONTENT))
+        add_reference(sha256, size)
+        db.session.flush()
+        db.session.add(Attachment(ticket_id=ticket.id, filename=FILENAME, original_name='signed.pdf', sha256=sha256))
+        db.session.commit()
+        ticket_id = ticket.id
+    yield SimpleNamespace(filename=FILENAME, original_name='signed.pdf', sha256=sha256)
+    with app.app_context():
+        Attachment.query.filter_by(ticket_id=ticket_id).delete()
+        StoredFile.query.filter_by(sha256=sha256).delete()
+        Ticket.query.filter_by(id=ticket_id).delete()
+        db.session.commit()
+
+
+@pytest.fixture
+def viewer(app):
+    """A throwaway account the super admin can delete"""
+    with app.app_context():
+        user = User(username='viewer', email='viewer@gtn.com', first_name='Signed', last_name='Viewer',
+                    department='Engineering', role='user')
+        user.set_password('viewer123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+    yield user_id
+    with app.app_context():
+        User.query.filter_by(id=user_id).delete()
+        db.session.commit()
+
+
+def sign(app, attachment, user_id, now=None):
+    with app.test_request_context():
+        return signed_file_url(attachment, user_id=user_id, now=now)
+
+
+def test_valid_token_serves_the_file_reading_only_the_version(app, client, users, attachment, monkeypatch):
+    url = sign(app, attachment, users['user'])
+    login(client, users['user'])
+
+    statements = []
+    monkeypatch.setattr(query_debug, '_normalize', lambda sql: statements.append(sql) or sql)
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert response.data == CONTENT
+    assert 'signed.pdf' in response.headers['Content-Disposition']
+    assert len(statements) == 1 and 'ticket_counters' in statements[0]
+
+
+def test_tampered_token_is_not_found(app, client, users, attachment):
+    url = sign(app, attachment, users['user'])
+    login(client, users['user'])
+    prefix, token, name = url.rsplit('/', 2)
+
+    tampered = token[:-2] + ('AA' if not token.endswith('AA') else 'BB')
+
+    assert client.get(f'{prefix}/{tampered}/{name}').status_code == 404
+
+
+@pytest.mark.parametrize('owner, issued', [
+    ('user', time.time() - 3 * SIGNED_URL_TTL),  # expired
+    ('other', None),  # signed for another session's user
+])
+def test_expired_or_foreign_token_falls_back_to_the_checked_route(app, client, users, attachment, owner, issued):
+    url = sign(app, attachment, users[owner], now=issued)
+    login(client, users['user'])
+
+    response = client.get(url)
+
+    assert response.status_code == 302
+    assert response.location.endswith(f'/download-attachment/{FILENAME}')
+
+
+def test_deleted_users_session_stops_downloading(app, users, attachment, viewer):
+    url = sign(app, attachment, viewer)
+    client, superadmin = app.test_client(), app.test_client()
+    login(client, viewer)
+    login(superadmin, users['admin'])
+    assert client.get(url).status_code == 200
+
+    assert superadmin.post(f'/delete-user/{viewer}').status_code == 302
+
+    response = client.get(url)
+    assert response.status_code == 302
+    assert response.location.endswith(f'/download-attachment/{FILENAME}')
+    assert '/login' in client.get(response.location).location
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+
+from smtp_server import StandInSMTPServer
+from utils import smtp_pool
+from utils.async_mail import send_messages
+
+
+@pytest.fixture
+def smtp_server():
+    server = StandInSMTPServer()
+    yield server
+    smtp_pool.close_smtp_connections()
+    server.stop()
+
+
+def _messages(*recipients):
+    return [SimpleNamespace(id=i, to_email=to, subject=f'Update {i}', body='Hello,\n\nTicket updated.')
+            for i, to in enumerate(recipients, start=1)]
+
+
+def test_pool_reuses_one_authenticated_connection(smtp_server):
+    for n in range(5):
+        with smtp_pool.smtp_session(smtp_server.settings) as session:
+            session.sendmail('helpdesk@gtn.com', [f'user{n}@gtn.com'], 'Subject: hi\r\n\r\nbody')
+    assert len(smtp_server.recipients) == 5
+    assert smtp_server.connections == 1
+    assert smtp_server.logins == 1
+
+
+def test_reconnects_after_the_server_drops_the_connection(smtp_server):
+    with smtp_pool.smtp_session(smtp_server.settings) as session:
+        session.sendmail('helpdesk@gtn.com', ['first@gtn.com'], 'Subject: 1\r\n\r\nbody')
+    smtp_server.drop_next = True
+    with smtp_pool.smtp_session(smtp_server.settings) as session:
+        session.sendmail('helpdesk@gtn.com', ['second@gtn.com'], 'Subject: 2\r\n\r\nbody')
+    assert smtp_server.recipients == ['first@gtn.com', 'second@gtn.com']
+    assert smtp_server.connections == 2
+
+
+def test_fan_out_sends_concurrently_over_pooled_connections(smtp_server):
+    smtp_server.delay = 0.2
+    messages = _messages(*(f'user{n}@gtn.com' for n in range(8)))
+    failures = send_messages(smtp_server.settings, messages, concurrency=4)
+    assert failures == {}
+    assert sorted(smtp_server.recipients) == sorted(m.to_email for m in messages)
+    assert smtp_server.peak_in_flight > 1
+    assert smtp_server.connections <= 4
+
+
+def test_per_recipient_failures_are_reported_as_permanent(smtp_server):
+    messages = _messages('one@gtn.com', 'bad@gtn.com', 'two@gtn.com')
+    failures = send_messages(smtp_server.settings, messages, concurrency=2)
+    assert set(failures) == {2}
+    error, permanent = failures[2]
+    assert permanent is True
+    assert 'rejected' in error
+    # A refused recipient does not cost the other messages (or the connection)
+    assert sorted(smtp_server.recipients) == ['one@gtn.com', 'two@gtn.com']
+
+
+def test_unreachable_server_fails_every_message_as_retryable(smtp_server):
+    settings = dict(smtp_server.settings)
+    smtp_server.stop()
+    failures = send_messages(settings, _messages('one@gtn.com', 'two@gtn.com', 'three@gtn.com'), concurrency=2)
+    assert set(failures) == {1, 2, 3}
+    assert all(permanent is False for _, permanent in failures.values())
@@ -0,0 +1,88 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app import db
+from conftest import login, make_ticket
+from models import Attachment, StoredFile, Ticket
+from utils import file_delivery, file_store, thumbnails
+from utils.file_store import add_reference, store_stream
+
+
+def jpeg(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'JPEG', quality=95)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def uploads(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_store, 'OBJECT_FOLDER', str(tmp_path / 'uploads' / 'objects'))
+    monkeypatch.setattr(file_delivery, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(thumbnails, 'THUMBNAIL_FOLDER', str(tmp_path / 'uploads' / 'thumbnails'))
+
+
+@pytest.fixture
+def attach(app, users, uploads):
+    """attach(content) stores an image on one of the test user's tickets and returns its filename"""
+    created = []
+
+    def attach(content, filename='20240101_120000_photo.jpg'):
+        with app.app_context():
+            ticket = make_ticket(users['user'])
+            sha256, size = store_stream(io.BytesIO(content))
+            add_reference(sha256, size)
+            db.session.flush()
+            db.session.add(Attachment(ticket_id=ticket.id, filename=filename, original_name='photo.jpg', sha256=sha256))
+            db.session.commit()
+            created.append((ticket.id, sha256))
+        return filename
+
+    yield attach
+    with app.app_context():
+        for ticket_id, sha256 in created:
+            Attachment.query.filter_by(ticket_id=ticket_id).delete()
+            StoredFile.query.filter_by(sha256=sha256).delete()
+            Ticket.query.filter_by(id=ticket_id).delete()
+        db.session.commit()
+
+
+def test_preview_is_rendered_once_and_cached(client, users, attach, monkeypatch):
+    original = jpeg(1600, 1200)
+    filename = attach(original)
+    login(client, users['user'])
+
+    response = client.get(f'/image-preview/160/{filename}')
+    assert response.status_code == 200
+    assert response.mimetype == thumbnails.thumbnail_format()[2]
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert max(image.size) == 160
+    assert len(response.data) < len(original)
+    assert response.cache_control.immutable and response.cache_control.max_age == thumbnails.CACHE_MAX_AGE
+
+    # Served from the on-disk rendition afterwards
+    def render_again(*args):
+        raise AssertionError('rendition was rendered twice')
+    monkeypatch.setattr(thumbnails, '_render', render_again)
+    again = client.get(f'/image-preview/160/{filename}')
+    assert again.status_code == 200 and again.data == response.data
+    assert client.get(f'/image-preview/160/{filename}', headers={'If-None-Match': again.headers['ETag']}).status_code == 304
+
+
+def test_sizes_outside_the_allowed_set_are_not_rendered(client, users, attach):
+    filename = attach(jpeg(400, 300))
+    login(client, users['user'])
+
+    response = client.get(f'/image-preview/333/{filename}')
+    assert response.status_code == 302
+    assert f'/view-image/{filename}' in response.headers['Location']
+
+
+def test_unreadable_image_falls_back_to_the_original(client, users, attach):
+    filename = attach(b'\xff\xd8\xff' + b'not really a jpeg', filename='20240101_120000_broken.jpg')
+    login(client, users['user'])
+
+    response = client.get(f'/image-preview/800/{filename}')
+    assert response.status_code == 302
+    assert f'/view-image/{filename}' in response.headers['Location']
@@ -0,0 +1,33 @@
+import json
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+
+
+@pytest.mark.parametrize('query', [
+    'filter_mode=range&from_date=2024-01-01&to_date=9999-12-31',
+    'filter_mode=year&year=10000',
+    'filter_mode=month&month=2024-13',
+])
+@pytest.mark.parametrize('path', ['/export/tickets.csv', '/export/tickets.ndjson'])
+def test_bad_date_filter_is_a_400(client, users, path, query):
+    login(client, users['admin'])
+    response = client.get(f'{path}?{query}')
+    assert response.status_code == 400
+
+
+def test_valid_filter_streams_tickets(app, client, users):
+    with app.app_context():
+        ticket_number = make_ticket(users['user'], title='Export me').ticket_number
+        db.session.commit()
+    login(client, users['admin'])
+    response = client.get('/export/tickets.ndjson?filter_mode=year&year=2099')
+    assert response.status_code == 200
+    assert response.data == b''
+
+    response = client.get('/export/tickets.ndjson')
+    assert response.status_code == 200
+    numbers = [json.loads(line)['ticket_number'] for line in response.data.splitlines()]
+    assert ticket_number in numbers
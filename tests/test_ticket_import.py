@@ -0,0 +1,147 @@
+import io
+from datetime import date, datetime
+
+import openpyxl
+import pytest
+from sqlalchemy import func
+
+from app import db
+from models import Ticket, TicketDailyStats, User
+from utils.excel_export import COLUMNS, HEADER_ROWS
+from utils.search import index_tickets, search_tickets
+from utils.ticket_import import import_r05_workbook
+
+# Imported tickets are dated in 2019 so they cannot collide with other tests' rows
+ROLLUP_START, ROLLUP_END = date(2019, 1, 1), date(2019, 12, 31)
+
+
+def register(*rows):
+    """An R05 workbook (as a file object) with one data row per dict of column values"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(HEADER_ROWS, 1, 'S.No')
+    for offset, values in enumerate(rows):
+        for name, value in values.items():
+            sheet.cell(HEADER_ROWS + 1 + offset, COLUMNS[name], value)
+    sheet.cell(HEADER_ROWS + 2 + len(rows), 1, 'Prepared by')
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def row(title, **values):
+    fields = dict(title=title, description=f'{title} (imported)', category='Hardware', priority='Priority: High',
+                  status='Status: Resolved', created='05.03.2019', resolved='07.03.2019',
+                  raised_by='Test Engineer', department='Engineering', cleared_by='Super Admin')
+    fields.update(values)
+    return fields
+
+
+@pytest.fixture
+def imported(app):
+    """Removes the 2019 tickets, their rollup rows and search documents afterwards"""
+    with app.app_context():
+        yield
+        ids = [ticket_id for (ticket_id,) in db.session.query(Ticket.id).filter(
+            Ticket.created_at < datetime(2020, 1, 2), Ticket.title.like('R05 %'))]
+        Ticket.query.filter(Ticket.id.in_(ids)).delete()
+        index_tickets(ids)
+        TicketDailyStats.query.filter(TicketDailyStats.day.between(ROLLUP_START, ROLLUP_END)).delete()
+        db.session.commit()
+        db.session.remove()
+
+
+def imported_titles():
+    return sorted(title for (title,) in db.session.query(Ticket.title).filter(Ticket.title.like('R05 %')))
+
+
+def test_dry_run_reports_without_writing(imported):
+    report = import_r05_workbook(register(row('R05 printer jam'), row('R05 monitor flicker')), dry_run=True)
+
+    assert (report.rows_read, report.accepted, report.imported) == (2, 2, 0)
+    assert report.rejected == [] and report.duplicates == 0
+    assert imported_titles() == []
+
+
+def test_commit_imports_rows_with_users_resolved(imported, users):
+    report = import_r05_workbook(register(row('R05 printer jam', cleared_by='Unassigned')), dry_run=False)
+
+    assert report.imported == 1
+    ticket = Ticket.query.filter_by(title='R05 printer jam').one()
+    assert (ticket.user_id, ticket.assigned_to) == (users['user'], None)
+    assert (ticket.category, ticket.priority, ticket.status) == ('Hardware', 'High', 'Resolved')
+    assert ticket.ticket_number.startswith('GTN-')
+    assert ticket.resolved_at > ticket.created_at
+
+
+def test_invalid_rows_are_rejected_with_reasons(imported):
+    report = import_r05_workbook(register(
+        row('R05 good row'),
+        row('R05 bad type', category='Furniture'),
+        row('R05 bad priority', priority='Priority: Whenever'),
+        row('R05 bad date', created='31.02.2019'),
+        row('R05 bad clearance', resolved='someday'),
+        row(''),
+    ), dry_run=False)
+
+    assert report.imported == 1
+    reasons = dict(report.rejected)
+    assert len(reasons) == 5
+    assert "unknown Issue Type 'Furniture'" in reasons[HEADER_ROWS + 2]
+    assert 'unknown priority' in reasons[HEADER_ROWS + 3]
+    assert 'invalid Originating Date' in reasons[HEADER_ROWS + 4]
+    assert 'invalid Issue clearance date' in reasons[HEADER_ROWS + 5]
+    assert reasons[HEADER_ROWS + 6] == 'missing Issue'
+    assert imported_titles() == ['R05 good row']
+
+
+def test_duplicates_in_the_file_and_the_database_are_skipped(imported):
+    import_r05_workbook(register(row('R05 printer jam')), dry_run=False)
+
+    report = import_r05_workbook(register(row('R05 printer jam'), row('R05 new issue'), row('R05 new issue')),
+                                 dry_run=False)
+
+    assert (report.imported, report.duplicates) == (1, 2)
+    assert imported_titles() == ['R05 new issue', 'R05 printer jam']
+
+
+def test_unknown_users(imported, users):
+    rows = (row('R05 from a stranger', raised_by='Nobody Known'),
+            row('R05 cleared by a stranger', cleared_by='Someone Else'))
+
+    report = import_r05_workbook(register(*rows), dry_run=False)
+    assert report.imported == 1
+    assert report.rejected == [(HEADER_ROWS + 1, "no user named 'Nobody Known'")]
+    assert 'left unassigned' in report.warnings[0][1]
+    db.session.rollback()
+
+    # With a default user the unknown raiser is attributed to them instead
+    report = import_r05_workbook(register(*rows), dry_run=False, default_user_id=users['admin'])
+    assert (report.imported, report.duplicates) == (1, 1)
+    assert Ticket.query.filter_by(title='R05 from a stranger').one().user_id == users['admin']
+
+
+def test_rollup_and_search_index_match_the_imported_tickets(imported):
+    import_r05_workbook(register(
+        row('R05 keyboard sticky', category='Hardware', status='Status: Open', resolved='Pending'),
+        row('R05 licence expired', category='Software', priority='Priority: Low', created='12.06.2019',
+            resolved='13.06.2019'),
+        row('R05 vpn drops', category='Software', raised_by='Test ITUser', department='IT', created='12.06.2019'),
+    ), dry_run=False)
+
+    departments = dict(db.session.query(User.id, User.department))
+    expected = {}
+    for ticket in Ticket.query.filter(Ticket.title.like('R05 %')):
+        key = (ticket.created_at.date(), ticket.category, ticket.priority, ticket.status, departments[ticket.user_id])
+        expected[key] = expected.get(key, 0) + 1
+    rollup = {
+        (r.day, r.category, r.priority, r.status, r.department): r.ticket_count
+        for r in TicketDailyStats.query.filter(TicketDailyStats.day.between(ROLLUP_START, ROLLUP_END))
+    }
+    assert rollup == expected
+    assert db.session.query(func.sum(TicketDailyStats.ticket_count)).filter(
+        TicketDailyStats.day.between(ROLLUP_START, ROLLUP_END)).scalar() == 3
+
+    assert [t.title for t in search_tickets(Ticket.query, 'sticky keyboard')] == ['R05 keyboard sticky']
+    assert [t.title for t in search_tickets(Ticket.query, 'licence')] == ['R05 licence expired']
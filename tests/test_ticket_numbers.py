@@ -0,0 +1,55 @@
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from conftest import make_ticket
+from utils.ticket_numbers import TICKET_NUMBER_PREFIX, format_ticket_number
+
+THREADS = 8
+TICKETS_PER_THREAD = 250
+
+
+def test_format_keeps_growing_past_six_digits():
+    assert format_ticket_number(42) == 'GTN-000042'
+    assert format_ticket_number(1000000) == 'GTN-1000000'
+    assert format_ticket_number(1000000) != format_ticket_number(100000)
+
+
+def test_concurrent_creates_get_unique_gapless_numbers(app, users):
+    numbers = []
+    errors = []
+    numbers_lock = threading.Lock()
+    start = threading.Barrier(THREADS)
+
+    def create_tickets():
+        with app.app_context():
+            start.wait()
+            try:
+                for _ in range(TICKETS_PER_THREAD):
+                    while True:
+                        try:
+                            ticket = make_ticket(users['user'], title='Concurrent ticket')
+                            db.session.commit()
+                            break
+                        except OperationalError:
+                            # SQLite gave up waiting for the write lock: retry the whole transaction
+                            db.session.rollback()
+                    with numbers_lock:
+                        numbers.append(ticket.ticket_number)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.session.remove()
+
+    threads = [threading.Thread(target=create_tickets) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(numbers) == THREADS * TICKETS_PER_THREAD
+    assert len(set(numbers)) == len(numbers), 'duplicate ticket numbers'
+    values = sorted(int(number[len(TICKET_NUMBER_PREFIX):]) for number in numbers)
+    assert values == list(range(values[0], values[0] + len(values))), 'gaps in ticket numbers'
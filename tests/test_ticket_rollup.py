@@ -0,0 +1,89 @@
+import pytest
+
+from app import db
+from conftest import login
+from models import EmailOutbox, Ticket, TicketComment, TicketDailyStats, User
+from utils.search import index_tickets
+from utils.ticket_rollup import rebuild_ticket_rollup
+
+
+@pytest.fixture
+def accounts(app):
+    """(reporter, assignee) ids: a user who raises tickets and an admin who is deleted while assigned one"""
+    with app.app_context():
+        rebuild_ticket_rollup()
+        created = []
+        for username, role in [('reporter', 'user'), ('assignee', 'super_admin')]:
+            user = User(username=username, email=f'{username}@gtn.com', first_name='Rollup',
+                        last_name=username.title(), department='Finance', role=role)
+            user.set_password(f'{username}123')
+            db.session.add(user)
+            created.append(user)
+        db.session.commit()
+        ids = tuple(user.id for user in created)
+    yield ids
+    with app.app_context():
+        ticket_ids = [ticket_id for (ticket_id,) in db.session.query(Ticket.id).filter(Ticket.title.like('Rollup %'))]
+        TicketComment.query.filter(TicketComment.ticket_id.in_(ticket_ids)).delete()
+        EmailOutbox.query.filter(EmailOutbox.ticket_id.in_(ticket_ids)).delete()
+        Ticket.query.filter(Ticket.id.in_(ticket_ids)).delete()
+        User.query.filter(User.id.in_(ids)).delete()
+        index_tickets(ticket_ids)
+        db.session.commit()
+        rebuild_ticket_rollup()
+        db.session.remove()
+
+
+def rollup_rows():
+    db.session.remove()
+    return {
+        (row.day, row.category, row.priority, row.status, row.department): row.ticket_count
+        for row in TicketDailyStats.query if row.ticket_count
+    }
+
+
+def assert_matches_rebuild():
+    incremental = rollup_rows()
+    rebuild_ticket_rollup()
+    assert rollup_rows() == incremental
+
+
+def _user_form(department):
+    return {'username': 'reporter', 'role': 'user', 'first_name': 'Rollup', 'last_name': 'Reporter',
+            'email': 'reporter@gtn.com', 'department': department, 'specialization': '', 'system_name': ''}
+
+
+def test_rebuild_matches_the_incrementally_maintained_rollup(app, users, accounts):
+    reporter, assignee = accounts
+    client, admin = app.test_client(), app.test_client()
+    login(client, reporter)
+    login(admin, users['admin'])
+    for title, category, priority in [('Rollup printer jam', 'Hardware', 'High'),
+                                      ('Rollup licence expired', 'Software', 'Low')]:
+        response = client.post('/create-ticket', data={'title': title, 'description': f'{title} since this morning',
+                                                       'category': category, 'priority': priority,
+                                                       'system_name': 'PC9'})
+        assert response.status_code == 302
+    with app.app_context():
+        first, second = [ticket_id for (ticket_id,) in db.session.query(Ticket.id)
+                         .filter(Ticket.title.like('Rollup %')).order_by(Ticket.id)]
+        assert_matches_rebuild()
+
+    assert admin.post(f'/ticket/{first}/edit', data={'status': 'Resolved'}).status_code == 302
+    assert admin.post(f'/assign-work/{second}', data={'assigned_to': assignee}).status_code == 302
+    with app.app_context():
+        assert db.session.get(Ticket, first).status == 'Resolved'
+        assert db.session.get(Ticket, second).status == 'In Progress'
+        assert_matches_rebuild()
+
+    assert admin.post(f'/edit-user/{reporter}', data=_user_form('Accounts')).status_code == 302
+    with app.app_context():
+        assert db.session.get(User, reporter).department == 'Accounts'
+        assert_matches_rebuild()
+
+    # Deleting the assignee reopens the ticket they were working on
+    assert admin.post(f'/delete-user/{assignee}').status_code == 302
+    with app.app_context():
+        assert db.session.get(User, assignee) is None
+        assert db.session.get(Ticket, second).status == 'Open'
+        assert_matches_rebuild()
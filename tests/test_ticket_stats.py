@@ -0,0 +1,52 @@
+import re
+
+import pytest
+
+from app import db
+from conftest import login, make_ticket
+from models import MasterDataCategory, Ticket
+from utils.master_data_cache import bump_master_data_version
+from utils.ticket_rollup import record_ticket_change, rebuild_ticket_rollup, ticket_rollup_key
+from utils.ticket_stats import get_ticket_stats
+
+
+@pytest.fixture
+def furniture(app, users):
+    """A master data category with one ticket, at a priority master data does not list"""
+    with app.app_context():
+        db.session.add(MasterDataCategory(name='Furniture'))
+        bump_master_data_version()
+        ticket = make_ticket(users['user'], category='Furniture', priority='Urgent')
+        db.session.flush()
+        record_ticket_change(None, ticket_rollup_key(ticket))
+        db.session.commit()
+        ticket_id = ticket.id
+        yield
+        Ticket.query.filter_by(id=ticket_id).delete()
+        MasterDataCategory.query.filter_by(name='Furniture').delete()
+        bump_master_data_version()
+        db.session.commit()
+        rebuild_ticket_rollup()
+        db.session.remove()
+
+
+def counter(page, item, name):
+    match = re.search(rf'<span>{name}</span>\s*</div>\s*<div class="{item}-count">\s*(\d+)', page)
+    return int(match.group(1)) if match else None
+
+
+def test_dashboards_count_every_master_data_bucket(app, client, users, furniture):
+    with app.test_request_context():
+        stats = get_ticket_stats()
+    assert 'Furniture' in stats.categories and 'Urgent' in stats.priorities
+    assert not {'hardware_tickets', 'critical_tickets'} & set(stats.as_dict())
+    login(client, users['admin'])
+
+    reports = client.get('/reports-dashboard').get_data(as_text=True)
+    assert counter(reports, 'category', 'Furniture') == stats.by_category['Furniture'] == 1
+    assert counter(reports, 'priority', 'Urgent') == 1
+    assert counter(reports, 'priority', 'High') == stats.by_priority.get('High', 0)
+
+    dashboard = client.get('/super-admin-dashboard').get_data(as_text=True)
+    assert '<option value="Furniture" >Furniture</option>' in dashboard
+    assert '<option value="Urgent" >Urgent</option>' in dashboard
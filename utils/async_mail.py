@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import os
+import smtplib
+
+# Messages in flight at once; each lane keeps its own pooled SMTP connection
+EMAIL_SEND_CONCURRENCY = int(os.environ.get('EMAIL_SEND_CONCURRENCY', '4'))
+
+# Rejections that will not succeed on a retry
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused)
+
+
+def _send_one(email_settings, message):
+    """Blocking send of one outbox message over a pooled connection"""
+    from utils.email import build_message
+    from utils.smtp_pool import smtp_session
+
+    msg = build_message(email_settings, message.to_email, message.subject, message.body)
+    with smtp_session(email_settings) as session:
+        session.sendmail(email_settings['from_email'], [message.to_email], msg.as_string())
+
+
+async def _lane(email_settings, queue, failures, broken):
+    while not queue.empty():
+        message = queue.get_nowait()
+        if broken:
+            failures[message.id] = (broken[0], False)
+            continue
+        try:
+            await asyncio.to_thread(_send_one, email_settings, message)
+        except PERMANENT_ERRORS as e:
+            failures[message.id] = (f"Recipient or sender rejected: {e}", True)
+        except smtplib.SMTPDataError as e:
+            failures[message.id] = (f"Message rejected: {e}", e.smtp_code >= 500)
+        except Exception as e:
+            # The server is unreachable or refusing us: stop every lane rather than time out per message
+            error = f"Failed to send notification email: {e} (Type: {type(e).__name__})"
+            logging.error(error)
+            broken.append(error)
+            failures[message.id] = (error, False)
+
+
+async def _send_all(email_settings, messages, concurrency):
+    queue = asyncio.Queue()
+    for message in messages:
+        queue.put_nowait(message)
+    failures, broken = {}, []
+    lanes = min(concurrency, len(messages))
+    await asyncio.gather(*(_lane(email_settings, queue, failures, broken) for _ in range(lanes)))
+    return failures
+
+
+def send_messages(email_settings, messages, concurrency=EMAIL_SEND_CONCURRENCY):
+    """Send messages (with id, to_email, subject, body) concurrently from sync code.
+
+    Returns {id: (error, permanent)} for the messages that were not sent.
+    """
+    if not messages:
+        return {}
+    return asyncio.run(_send_all(email_settings, messages, max(1, concurrency)))
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+import logging
+from utils.timezone import local_range_to_utc, utc_to_ist
+
+
+def _local_window(start, end):
+    """Turn local [start, end) boundaries into naive UTC boundaries for created_at"""
+    return local_range_to_utc(start, end)
+
+
+def _to_int(value):
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        logging.warning(f"Ignoring invalid date filter value: {value!r}")
+        return None
+
+
+def range_window(from_date, to_date):
+    """Window covering from_date through to_date inclusive ('YYYY-MM-DD' strings)"""
+    try:
+        start = datetime.strptime(from_date, '%Y-%m-%d')
+        end = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1)
+        return _local_window(start, end)
+    except (TypeError, ValueError, OverflowError):
+        # OverflowError: dates at the very ends of the calendar (e.g. 9999-12-31)
+        logging.warning(f"Ignoring invalid date range: {from_date!r} - {to_date!r}")
+        return None
+
+
+def month_window(year, month):
+    """Window covering one calendar month"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return _local_window(start, end)
+
+
+def year_window(year):
+    """Window covering one calendar year"""
+    return _local_window(datetime(year, 1, 1), datetime(year + 1, 1, 1))
+
+
+def day_month_year_window(day=None, month=None, year=None):
+    """Window for the dashboard's separate day/month/year filters.
+
+    A month or day without a year falls in the current year, and a day
+    without a month falls in the current month, so the result is always one
+    contiguous window.
+    """
+    day, month, year = _to_int(day), _to_int(month), _to_int(year)
+    if not (day or month or year):
+        return None
+
+    # Only look up "today" when a part of the date was left out
+    today = utc_to_ist(datetime.utcnow()) if not (year and (month or not day)) else None
+    try:
+        if day:
+            start = datetime(year or today.year, month or today.month, day)
+            return _local_window(start, start + timedelta(days=1))
+        if month:
+            return month_window(year or today.year, month)
+        return year_window(year)
+    except (ValueError, OverflowError):
+        logging.warning(f"Ignoring impossible date filter: day={day} month={month} year={year}")
+        return None
+
+
+def report_window(filter_mode, from_date=None, to_date=None, month=None, year=None, strict=False):
+    """Window for the report filter modes: 'range', 'month' ('YYYY-MM') or 'year'.
+
+    Invalid values are logged and ignored (None); with strict=True they raise
+    ValueError instead, so request handlers can reject them up front.
+    """
+    if filter_mode == 'range' and from_date and to_date:
+        window = range_window(from_date, to_date)
+    elif filter_mode == 'month' and month:
+        try:
+            y, m = map(int, month.split('-'))
+            window = month_window(y, m)
+        except (ValueError, OverflowError):
+            logging.warning(f"Ignoring invalid month filter: {month!r}")
+            window = None
+    elif filter_mode == 'year' and year:
+        y = _to_int(year)
+        try:
+            window = year_window(y) if y else None
+        except (ValueError, OverflowError):
+            logging.warning(f"Ignoring invalid year filter: {year!r}")
+            window = None
+    else:
+        return None
+    if window is None and strict:
+        raise ValueError(f"Invalid {filter_mode} date filter")
+    return window
+
+
+def apply_date_window(query, column, window):
+    """Filter query to column >= start AND column < end, which keeps the column indexable"""
+    if not window:
+        return query
+    start, end = window
+    return query.filter(column >= start, column < end)
@@ -0,0 +1,30 @@
+from sqlalchemy.orm import joinedload, selectinload
+
+
+def ticket_list_options():
+    """Loader options for ticket tables and timelines (assignee name, attachment icon)"""
+    from models import Ticket
+    return (
+        joinedload(Ticket.assignee),
+        selectinload(Ticket.attachments),
+    )
+
+
+def ticket_detail_options():
+    """Loader options for view_ticket: people, attachments and comment authors"""
+    from models import Ticket, TicketComment
+    return (
+        joinedload(Ticket.user),
+        joinedload(Ticket.assignee),
+        joinedload(Ticket.assigner),
+        selectinload(Ticket.attachments),
+        selectinload(Ticket.comments).joinedload(TicketComment.user),
+    )
+
+
+def notification_list_options():
+    """Loader options for the email notification history table"""
+    from models import EmailNotificationLog
+    return (
+        joinedload(EmailNotificationLog.ticket),
+    )
@@ -2,13 +2,15 @@ import smtplib
 from email.mime.text import MIMEText
 from flask import current_app
 import logging
+from utils.smtp_pool import smtp_session
 
 
 def get_email_settings():
     """Get email settings from Master Data"""
     try:
         from models import EmailSettings
-        settings = EmailSettings.query.filter_by(is_active=True).first()
+        from utils.master_data_cache import get_settings_snapshot
+        settings = get_settings_snapshot(EmailSettings, active_only=True)
         
         if settings:
             return {
@@ -28,6 +30,15 @@ def get_email_settings():
         return None
 
 
+def build_message(email_settings, to_email, subject, body):
+    """Plain-text UTF-8 message from the configured sender"""
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['Subject'] = subject
+    msg['From'] = f"{email_settings['from_name']} <{email_settings['from_email']}>"
+    msg['To'] = to_email
+    return msg
+
+
 def log_email_notification(to_email, subject, message_type, status, error_message=None, ticket_id=None, user_id=None):
     """Log email notification to database"""
     try:
@@ -46,6 +57,8 @@ def log_email_notification(to_email, subject, message_type, status, error_messag
                 user_id=user_id
             )
             db.session.add(log_entry)
+            from utils.notification_rollup import record_notifications
+            record_notifications([log_entry])
             db.session.commit()
             logging.info(f"Email notification logged: {status} to {to_email}")
     except Exception as e:
@@ -66,23 +79,11 @@ def send_assignment_email(to_email, ticket_id, assignee_name):
         body = f"Hello {assignee_name},\n\nYou have been assigned to Ticket #{ticket_id}. Please check the portal for details.\n\nBest regards,\n{email_settings['from_name']}"
 
         # Create message with UTF-8 encoding
-        msg = MIMEText(body, 'plain', 'utf-8')
-        msg['Subject'] = subject
-        msg['From'] = f"{email_settings['from_name']} <{email_settings['from_email']}>"
-        msg['To'] = to_email
-
-        # Send email with detailed logging
-        with smtplib.SMTP(email_settings['smtp_server'], email_settings['smtp_port']) as server:
-            logging.info("SMTP connection established")
-            
-            if email_settings['use_tls']:
-                server.starttls()
-                logging.info("TLS enabled")
-                
-            server.login(email_settings['smtp_username'], email_settings['smtp_password'])
-            logging.info("SMTP authentication successful")
-            
-            server.sendmail(email_settings['from_email'], [to_email], msg.as_string())
+        msg = build_message(email_settings, to_email, subject, body)
+
+        # Send email over a pooled, already authenticated connection
+        with smtp_session(email_settings) as session:
+            session.sendmail(email_settings['from_email'], [to_email], msg.as_string())
             logging.info("Email sent successfully")
             
         # Log successful email (handle test case and extract numeric ID from ticket numbers)
@@ -169,17 +170,11 @@ def send_notification_email(to_email, subject, body, ticket_id=None, message_typ
         email_settings = get_email_settings()
         
         # Create message with UTF-8 encoding
-        msg = MIMEText(body, 'plain', 'utf-8')
-        msg['Subject'] = subject
-        msg['From'] = f"{email_settings['from_name']} <{email_settings['from_email']}>"
-        msg['To'] = to_email
-
-        # Send email
-        with smtplib.SMTP(email_settings['smtp_server'], email_settings['smtp_port']) as server:
-            if email_settings['use_tls']:
-                server.starttls()
-            server.login(email_settings['smtp_username'], email_settings['smtp_password'])
-            server.sendmail(email_settings['from_email'], [to_email], msg.as_string())
+        msg = build_message(email_settings, to_email, subject, body)
+
+        # Send email over a pooled, already authenticated connection
+        with smtp_session(email_settings) as session:
+            session.sendmail(email_settings['from_email'], [to_email], msg.as_string())
             
         # Log successful notification
         log_ticket_id = extract_ticket_id(ticket_id) if ticket_id else None
@@ -208,8 +203,19 @@ def extract_ticket_id(ticket_id):
         return ticket_id
 
 
+def queue_notification_email(to_email, subject, body, ticket_id=None, message_type='general', user_id=None):
+    """Queue a notification in the email outbox; it is committed with the caller's transaction"""
+    try:
+        from utils.email_outbox import queue_email
+        queue_email(to_email, subject, body, ticket_id=ticket_id, message_type=message_type, user_id=user_id)
+        return True
+    except Exception as e:
+        logging.error(f"Failed to queue notification email to {to_email}: {e}")
+        return False
+
+
 def send_ticket_creation_notification(ticket):
-    """Send notification when a ticket is created"""
+    """Queue the notification for a newly created ticket"""
     try:
         # Email to user who created the ticket
         subject = f"Ticket Created: {ticket.ticket_number}"
@@ -230,7 +236,7 @@ You will receive email notifications for all updates to your ticket.
 Best regards,
 GTN IT Helpdesk Team"""
         
-        result = send_notification_email(ticket.user.email, subject, body, ticket.ticket_number, 'ticket_created')
+        result = queue_notification_email(ticket.user.email, subject, body, ticket.id, 'ticket_created', user_id=ticket.user_id)
         return result
         
     except Exception as e:
@@ -239,7 +245,7 @@ GTN IT Helpdesk Team"""
 
 
 def send_ticket_assignment_notification(ticket, assignee, assigner):
-    """Send notifications when a ticket is assigned"""
+    """Queue notifications for a ticket assignment"""
     try:
         results = []
         
@@ -264,7 +270,7 @@ Please review the ticket details and update the status as you work on it.
 Best regards,
 GTN IT Helpdesk Team"""
         
-        result1 = send_notification_email(assignee.email, subject, body, ticket.ticket_number, 'ticket_assigned')
+        result1 = queue_notification_email(assignee.email, subject, body, ticket.id, 'ticket_assigned', user_id=assignee.id)
         results.append(result1)
         
         # 2. Email to the ticket creator
@@ -284,7 +290,7 @@ Our team is now working on your request. You will receive updates as progress is
 Best regards,
 GTN IT Helpdesk Team"""
         
-        result2 = send_notification_email(ticket.user.email, subject, body, ticket.ticket_number, 'ticket_updated')
+        result2 = queue_notification_email(ticket.user.email, subject, body, ticket.id, 'ticket_updated', user_id=ticket.user_id)
         results.append(result2)
         
         return all(results)
@@ -295,7 +301,7 @@ GTN IT Helpdesk Team"""
 
 
 def send_ticket_status_update_notification(ticket, old_status, updated_by):
-    """Send notification when ticket status changes"""
+    """Queue notifications for a ticket status change"""
     try:
         results = []
         
@@ -316,7 +322,7 @@ Updated By: {updated_by.full_name}
 Best regards,
 GTN IT Helpdesk Team"""
         
-        result1 = send_notification_email(ticket.user.email, subject, body, ticket.ticket_number, 'ticket_updated')
+        result1 = queue_notification_email(ticket.user.email, subject, body, ticket.id, 'ticket_updated', user_id=ticket.user_id)
         results.append(result1)
         
         # 2. Email to assignee if different from updater
@@ -337,7 +343,7 @@ Please review the ticket for any additional actions needed.
 Best regards,
 GTN IT Helpdesk Team"""
             
-            result2 = send_notification_email(ticket.assignee.email, subject, body, ticket.ticket_number, 'ticket_updated')
+            result2 = queue_notification_email(ticket.assignee.email, subject, body, ticket.id, 'ticket_updated', user_id=ticket.assigned_to)
             results.append(result2)
         
         return all(results)
@@ -348,7 +354,7 @@ GTN IT Helpdesk Team"""
 
 
 def send_ticket_comment_notification(ticket, comment, commenter):
-    """Send notification when a comment is added to a ticket"""
+    """Queue notifications for a new ticket comment"""
     try:
         results = []
         
@@ -369,7 +375,7 @@ You can view the full ticket details in the portal.
 Best regards,
 GTN IT Helpdesk Team"""
             
-            result1 = send_notification_email(ticket.user.email, subject, body, ticket.ticket_number, 'ticket_comment')
+            result1 = queue_notification_email(ticket.user.email, subject, body, ticket.id, 'ticket_comment', user_id=ticket.user_id)
             results.append(result1)
         
         # 2. Email to assignee (if different from commenter and ticket creator)
@@ -389,7 +395,7 @@ Please review the comment and respond if necessary.
 Best regards,
 GTN IT Helpdesk Team"""
             
-            result2 = send_notification_email(ticket.assignee.email, subject, body, ticket.ticket_number, 'ticket_comment')
+            result2 = queue_notification_email(ticket.assignee.email, subject, body, ticket.id, 'ticket_comment', user_id=ticket.assigned_to)
             results.append(result2)
         
         return all(results)
@@ -0,0 +1,313 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy import and_, bindparam, delete, func, insert, or_, select, update
+
+OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '50'))
+# Attempts before a message is given up on and logged as failed
+OUTBOX_MAX_ATTEMPTS = 6
+# Retry delays double from the base up to the cap: 30s, 1m, 2m, 4m, 8m
+OUTBOX_RETRY_BASE = timedelta(seconds=30)
+OUTBOX_RETRY_MAX = timedelta(hours=1)
+# Messages claimed longer ago than this belong to a worker that died mid-batch
+OUTBOX_CLAIM_TIMEOUT = timedelta(minutes=10)
+# Seconds the in-process worker sleeps between polls when nobody wakes it
+OUTBOX_POLL_INTERVAL = 30
+# Set EMAIL_DELIVERY_THREAD=0 when a separate `flask deliver-emails` process drains the outbox
+EMAIL_DELIVERY_THREAD = os.environ.get('EMAIL_DELIVERY_THREAD', '1') != '0'
+
+_worker = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def queue_email(to_email, subject, body, ticket_id=None, message_type='general', user_id=None):
+    """Add an email to the outbox in the current transaction; it is sent after the commit.
+
+    Ticket notifications wait for the coalescing window (or the recipient's
+    digest time) so that later updates can be folded into the same email.
+    """
+    from app import db
+    from models import EmailOutbox
+    from utils.email import extract_ticket_id
+    from utils.notification_digest import schedule_notification
+
+    ticket_id = extract_ticket_id(ticket_id) if ticket_id else None
+    coalesce_key, send_at = schedule_notification(to_email, ticket_id, user_id)
+    db.session.add(EmailOutbox(
+        to_email=to_email,
+        subject=subject[:200],
+        body=body,
+        message_type=message_type,
+        ticket_id=ticket_id,
+        user_id=user_id,
+        coalesce_key=coalesce_key,
+        next_attempt_at=send_at,
+    ))
+    db.session.info['email_outbox_queued'] = True
+
+
+def retry_delay(attempts):
+    """Backoff before the next attempt of a message that has failed `attempts` times"""
+    return min(OUTBOX_RETRY_BASE * 2 ** (attempts - 1), OUTBOX_RETRY_MAX)
+
+
+def claim_outbox_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Mark up to batch_size due messages as sending and return them"""
+    from app import db
+    from models import EmailOutbox
+
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    due = select(EmailOutbox.id).where(or_(
+        and_(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now),
+        and_(EmailOutbox.status == 'sending', EmailOutbox.claimed_at < now - OUTBOX_CLAIM_TIMEOUT),
+    )).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(batch_size)
+    if db.engine.dialect.name == 'postgresql':
+        # Concurrent workers skip each other's rows instead of queueing on the locks
+        due = due.with_for_update(skip_locked=True)
+
+    claim = dict(status='sending', claimed_by=token, claimed_at=now, attempts=EmailOutbox.attempts + 1)
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.id.in_(due.scalar_subquery()))
+        .values(**claim)
+        .execution_options(synchronize_session=False)
+    )
+    # Pull in pending messages that will be combined with the claimed ones, even if not yet due
+    claimed_keys = select(EmailOutbox.coalesce_key).where(
+        EmailOutbox.claimed_by == token, EmailOutbox.coalesce_key.isnot(None)
+    ).distinct()
+    db.session.execute(
+        update(EmailOutbox)
+        .where(EmailOutbox.status == 'pending', EmailOutbox.coalesce_key.in_(claimed_keys.scalar_subquery()))
+        .values(**claim)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return db.session.query(
+        EmailOutbox.id, EmailOutbox.to_email, EmailOutbox.subject, EmailOutbox.body,
+        EmailOutbox.message_type, EmailOutbox.ticket_id, EmailOutbox.user_id, EmailOutbox.attempts,
+        EmailOutbox.coalesce_key
+    ).filter(EmailOutbox.claimed_by == token).order_by(EmailOutbox.id).all()
+
+
+def group_messages(rows):
+    """One outgoing email per coalesce key (or per row without one)"""
+    from utils.notification_digest import combine_messages
+
+    groups = {}
+    for row in rows:
+        groups.setdefault(row.coalesce_key or f"id:{row.id}", []).append(row)
+    messages = []
+    for key, members in groups.items():
+        subject, body, message_type = combine_messages(key, members)
+        first = members[0]
+        messages.append(SimpleNamespace(
+            id=first.id,
+            ids=[m.id for m in members],
+            to_email=first.to_email,
+            subject=subject,
+            body=body,
+            message_type=message_type,
+            # A digest spans tickets, so it is not logged against one
+            ticket_id=first.ticket_id if all(m.ticket_id == first.ticket_id for m in members) else None,
+            user_id=first.user_id,
+            attempts=max(m.attempts for m in members),
+        ))
+    return messages
+
+
+def _send_batch(messages):
+    """Send messages concurrently; returns {id: (error, permanent)} for failures"""
+    from utils.async_mail import send_messages
+    from utils.email import get_email_settings
+
+    email_settings = get_email_settings()
+    if not email_settings:
+        return {m.id: ('No active email settings', False) for m in messages}
+    return send_messages(email_settings, messages)
+
+
+def deliver_outbox_batch(batch_size=OUTBOX_BATCH_SIZE):
+    """Claim, send and settle one batch; returns the number of messages claimed"""
+    from app import db
+    from models import EmailNotificationLog, EmailOutbox
+    from utils.notification_rollup import record_notifications
+
+    rows = claim_outbox_batch(batch_size)
+    if not rows:
+        return 0
+    messages = group_messages(rows)
+    failures = _send_batch(messages)
+
+    now = datetime.utcnow()
+    logs, finished, retries = [], [], []
+    for message in messages:
+        error, permanent = failures.get(message.id, (None, False))
+        if error and not permanent and message.attempts < OUTBOX_MAX_ATTEMPTS:
+            retries.extend({
+                'b_id': row_id,
+                'b_next_attempt_at': now + retry_delay(message.attempts),
+                'b_last_error': error,
+            } for row_id in message.ids)
+            continue
+        finished.extend(message.ids)
+        logs.append({
+            'to_email': message.to_email,
+            'subject': message.subject,
+            'message_type': message.message_type,
+            'status': 'failed' if error else 'sent',
+            'error_message': error,
+            'ticket_id': message.ticket_id,
+            'user_id': message.user_id,
+            'created_at': now,
+        })
+
+    try:
+        if logs:
+            _drop_missing_references(logs)
+            db.session.execute(insert(EmailNotificationLog.__table__), logs)
+            record_notifications(logs)
+        if finished:
+            db.session.execute(delete(EmailOutbox.__table__).where(EmailOutbox.__table__.c.id.in_(finished)))
+        if retries:
+            outbox = EmailOutbox.__table__
+            db.session.execute(
+                update(outbox).where(outbox.c.id == bindparam('b_id')).values(
+                    status='pending', claimed_by=None, claimed_at=None,
+                    next_attempt_at=bindparam('b_next_attempt_at'), last_error=bindparam('b_last_error'),
+                ),
+                retries,
+            )
+        db.session.commit()
+    except Exception as e:
+        # The emails have already gone out: left 'sending', the batch would be re-claimed
+        # after OUTBOX_CLAIM_TIMEOUT and sent again on every claim, so it is dropped instead
+        db.session.rollback()
+        logging.error(f"Failed to settle email outbox batch, dropping {len(rows)} messages "
+                      f"to {sorted({m.to_email for m in messages})}: {e}")
+        _drop_rows([row.id for row in rows])
+        return len(rows)
+
+    sent = len(messages) - len(failures)
+    logging.info(f"Email outbox: {len(rows)} queued messages as {len(messages)} emails: "
+                 f"{sent} sent, {len(logs) - sent} failed, {len(messages) - len(logs)} to retry")
+    return len(rows)
+
+
+def _drop_missing_references(logs):
+    """Clear log ticket/user ids whose rows were deleted while the message was queued"""
+    from app import db
+    from models import Ticket, User
+
+    for column, model in (('ticket_id', Ticket), ('user_id', User)):
+        ids = {log[column] for log in logs if log[column] is not None}
+        if not ids:
+            continue
+        existing = set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+        for log in logs:
+            if log[column] not in existing:
+                log[column] = None
+
+
+def _drop_rows(row_ids):
+    from app import db
+    from models import EmailOutbox
+
+    try:
+        db.session.execute(delete(EmailOutbox.__table__).where(EmailOutbox.__table__.c.id.in_(row_ids)))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Could not drop unsettled email outbox messages {row_ids}: {e}")
+
+
+def seconds_until_next_due():
+    """Seconds until the earliest pending message is due (None if the outbox is empty)"""
+    from app import db
+    from models import EmailOutbox
+
+    next_at = db.session.query(func.min(EmailOutbox.next_attempt_at)).filter(EmailOutbox.status == 'pending').scalar()
+    if next_at is None:
+        return None
+    return max(0.0, (next_at - datetime.utcnow()).total_seconds())
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE):
+    """Deliver batches until nothing is due; returns the number of messages processed"""
+    total = 0
+    while True:
+        count = deliver_outbox_batch(batch_size)
+        total += count
+        if count < batch_size:
+            return total
+
+
+def _worker_loop():
+    from app import app, db
+
+    timeout = OUTBOX_POLL_INTERVAL
+    while True:
+        _wake.wait(timeout)
+        _wake.clear()
+        timeout = OUTBOX_POLL_INTERVAL
+        with app.app_context():
+            try:
+                drain_outbox()
+                # Sleep until held (coalesced) messages fall due rather than a full poll interval
+                due_in = seconds_until_next_due()
+                if due_in is not None:
+                    timeout = min(OUTBOX_POLL_INTERVAL, due_in + 0.5)
+            except Exception as e:
+                logging.error(f"Email outbox worker error: {e}")
+            finally:
+                db.session.remove()
+
+
+def ensure_outbox_worker():
+    """Start this process's delivery thread if it is not running; it drains the outbox at once"""
+    global _worker
+    if not EMAIL_DELIVERY_THREAD:
+        return
+    # Checked without the lock first: this runs on every request
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        # A thread started before a fork does not exist in the child
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_worker_loop, name='email-outbox', daemon=True)
+            _wake.set()
+            _worker.start()
+
+
+def wake_outbox_worker():
+    """Start this process's delivery thread if needed and have it check the outbox now"""
+    if not EMAIL_DELIVERY_THREAD:
+        return
+    ensure_outbox_worker()
+    _wake.set()
+
+
+def init_email_outbox(app, db):
+    """Run the delivery worker in every web process and wake it after each commit that queued an email.
+
+    The worker is started on a process's first request (after any fork), so
+    messages left pending by a restart are delivered even when nothing new
+    is queued.
+    """
+    from sqlalchemy import event
+
+    app.before_request(ensure_outbox_worker)
+
+    @event.listens_for(db.session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('email_outbox_queued', False):
+            wake_outbox_worker()
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('email_outbox_queued', None)
@@ -0,0 +1,242 @@
+import logging
+import os
+import pickle
+import tempfile
+from copy import copy
+from dataclasses import dataclass, field
+from datetime import datetime
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter, range_boundaries
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+R05_TEMPLATE_PATH = 'attached_assets/R05 - USER COMPLAINT REGISTER_1752222026172.xlsx'
+R05_SHEET_TITLE = 'R05 C'
+
+HEADER_ROWS = 3           # Title block and column headings
+DATA_STYLE_ROW = 4        # Template row whose cell styles every data row reuses
+FOOTER_ROWS = (38, 41)    # Prepared/Reviewed/Approved signature block, moved below the data
+DATE_CELL = (2, 21)       # Record date in the title block
+
+EXPORT_BATCH_SIZE = 1000
+MAX_COLUMN_WIDTH = 50
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+
+# Template column for each exported field
+COLUMNS = {
+    'sno': 1,
+    'department': 2,
+    'title': 3,
+    'category': 4,
+    'raised_by': 8,
+    'created': 9,
+    'mode': 10,
+    'cleared_by': 12,
+    'resolved': 13,
+    'description': 14,
+    'status': 18,
+    'priority': 21,
+}
+
+_STYLE_ATTRS = ('font', 'fill', 'border', 'alignment', 'number_format', 'protection')
+
+
+@dataclass
+class R05Template:
+    """Parsed layout of the R05 register template, reused by every export"""
+    max_column: int
+    header: list = field(default_factory=list)        # rows of (value, style) pairs
+    footer: list = field(default_factory=list)
+    data_styles: list = field(default_factory=list)   # one style per column
+    header_merges: list = field(default_factory=list)
+    footer_merges: list = field(default_factory=list)  # (min_col, row offset, max_col, row offset)
+    row_heights: dict = field(default_factory=dict)    # template row -> height
+    orientation: str = None
+
+
+_template_cache = {'mtime': None, 'template': None}
+
+
+def _cell_style(cell):
+    return {attr: copy(getattr(cell, attr)) for attr in _STYLE_ATTRS}
+
+
+def _styled_cell(ws, style, value=None):
+    cell = WriteOnlyCell(ws, value=value)
+    for attr, style_value in style.items():
+        setattr(cell, attr, style_value)
+    return cell
+
+
+def _parse_template(path):
+    """Read the header, data row styles and signature block out of the template"""
+    wb = openpyxl.load_workbook(path)
+    ws = wb.active
+    max_column = ws.max_column
+    footer_start, footer_end = FOOTER_ROWS
+
+    def read_row(row_idx):
+        return [(ws.cell(row=row_idx, column=col).value, _cell_style(ws.cell(row=row_idx, column=col)))
+                for col in range(1, max_column + 1)]
+
+    template = R05Template(max_column=max_column, orientation=ws.page_setup.orientation)
+    template.header = [read_row(row_idx) for row_idx in range(1, HEADER_ROWS + 1)]
+    template.footer = [read_row(row_idx) for row_idx in range(footer_start, footer_end + 1)]
+    template.data_styles = [style for _, style in read_row(DATA_STYLE_ROW)]
+
+    for merged in ws.merged_cells.ranges:
+        min_col, min_row, max_col, max_row = range_boundaries(str(merged))
+        if max_row <= HEADER_ROWS:
+            template.header_merges.append(str(merged))
+        elif min_row >= footer_start:
+            template.footer_merges.append((min_col, min_row - footer_start, max_col, max_row - footer_start))
+
+    for row_idx in list(range(1, HEADER_ROWS + 1)) + list(range(footer_start, footer_end + 1)):
+        height = ws.row_dimensions[row_idx].height
+        if height:
+            template.row_heights[row_idx] = height
+    return template
+
+
+def get_r05_template(path=R05_TEMPLATE_PATH):
+    """Parsed template, re-read only when the file on disk changes"""
+    mtime = os.path.getmtime(path)
+    if _template_cache['mtime'] != mtime:
+        _template_cache['template'] = _parse_template(path)
+        _template_cache['mtime'] = mtime
+        logging.info(f"Parsed R05 template {path}")
+    return _template_cache['template']
+
+
+def _ticket_rows(window=None):
+    """Stream export rows from a server-side cursor, one batch at a time"""
+    from app import db
+    from models import Ticket, User
+    from utils.date_windows import apply_date_window
+    from utils.timezone import utc_to_local_many
+
+    raiser = aliased(User)
+    assignee = aliased(User)
+    stmt = select(
+        Ticket.title, Ticket.category, Ticket.description, Ticket.status, Ticket.priority,
+        Ticket.user_name, Ticket.created_at, Ticket.resolved_at,
+        raiser.department, assignee.first_name, assignee.last_name, Ticket.assigned_to
+    ).join(raiser, Ticket.user_id == raiser.id).outerjoin(assignee, Ticket.assigned_to == assignee.id)
+    stmt = apply_date_window(stmt, Ticket.created_at, window).order_by(Ticket.created_at, Ticket.id)
+
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for batch in result.partitions():
+        created_dates = utc_to_local_many(row.created_at for row in batch)
+        resolved_dates = utc_to_local_many(row.resolved_at for row in batch)
+        for row, created, resolved in zip(batch, created_dates, resolved_dates):
+            yield {
+                'department': row.department or 'N/A',
+                'title': row.title,
+                'category': row.category,
+                'raised_by': row.user_name,
+                'created': created.strftime('%d.%m.%Y') if created else 'N/A',
+                'mode': 'Online Portal',
+                'cleared_by': f"{row.first_name} {row.last_name}" if row.assigned_to else 'Unassigned',
+                'resolved': resolved.strftime('%d.%m.%Y') if resolved else 'Pending',
+                'description': row.description,
+                'status': f"Status: {row.status}",
+                'priority': f"Priority: {row.priority}",
+            }
+
+
+def _track_widths(widths, values):
+    for col_idx, value in enumerate(values, 1):
+        if value:
+            length = len(str(value))
+            if length > widths.get(col_idx, 0):
+                widths[col_idx] = length
+
+
+def write_r05_report(window=None, record_date=None, output=None, progress=None):
+    """Write the R05 complaint register for tickets created in window.
+
+    output may be a path or file object; by default a spooled temporary file
+    is returned positioned at the start of the .xlsx. progress, if given, is
+    called as progress(stage, rows) after every batch, with stage 'read' while
+    rows are fetched and 'write' while they go into the sheet, and once more
+    at the end of each stage.
+    Rows stream from the database into a write-only sheet, so memory stays flat
+    regardless of the number of tickets.
+    """
+    template = get_r05_template()
+    max_column = template.max_column
+    record_date = record_date or datetime.now().strftime('%d.%m.%Y')
+
+    header_values = [[value for value, _ in row] for row in template.header]
+    date_row, date_col = DATE_CELL
+    header_values[date_row - 1][date_col - 1] = record_date
+    footer_values = [[value for value, _ in row] for row in template.footer]
+
+    widths = {}
+    for values in header_values + footer_values:
+        _track_widths(widths, values)
+
+    # Write-only sheets emit column widths before the first row, so the formatted
+    # rows are staged on disk while their widths are measured
+    row_count = 0
+    with tempfile.TemporaryFile() as staged:
+        for row_count, row in enumerate(_ticket_rows(window), 1):
+            values = [None] * max_column
+            values[COLUMNS['sno'] - 1] = row_count
+            for name, value in row.items():
+                values[COLUMNS[name] - 1] = value
+            _track_widths(widths, values)
+            pickle.dump(values, staged, pickle.HIGHEST_PROTOCOL)
+            if progress and row_count % EXPORT_BATCH_SIZE == 0:
+                progress('read', row_count)
+        if progress:
+            progress('read', row_count)
+        staged.seek(0)
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(R05_SHEET_TITLE)
+        for col_idx in range(1, max_column + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(widths.get(col_idx, 0) + 2, MAX_COLUMN_WIDTH)
+        if template.orientation:
+            ws.page_setup.orientation = template.orientation
+
+        for row_idx, (row, values) in enumerate(zip(template.header, header_values), 1):
+            if row_idx in template.row_heights:
+                ws.row_dimensions[row_idx].height = template.row_heights[row_idx]
+            ws.append([_styled_cell(ws, style, value) for (_, style), value in zip(row, values)])
+        for merged in template.header_merges:
+            ws.merged_cells.add(merged)
+
+        # One styled cell per column, re-used for every row (each row is serialised as it is appended)
+        data_cells = [_styled_cell(ws, style) for style in template.data_styles]
+        for written in range(1, row_count + 1):
+            values = pickle.load(staged)
+            for cell, value in zip(data_cells, values):
+                cell.value = value
+            ws.append(data_cells)
+            if progress and written % EXPORT_BATCH_SIZE == 0:
+                progress('write', written)
+        if progress:
+            progress('write', row_count)
+
+    footer_start = HEADER_ROWS + row_count + 1
+    template_footer_start = FOOTER_ROWS[0]
+    for offset, (row, values) in enumerate(zip(template.footer, footer_values)):
+        height = template.row_heights.get(template_footer_start + offset)
+        if height:
+            ws.row_dimensions[footer_start + offset].height = height
+        ws.append([_styled_cell(ws, style, value) for (_, style), value in zip(row, values)])
+    for min_col, min_offset, max_col, max_offset in template.footer_merges:
+        ws.merged_cells.add(
+            f"{get_column_letter(min_col)}{footer_start + min_offset}:{get_column_letter(max_col)}{footer_start + max_offset}"
+        )
+    ws.print_area = f"A1:{get_column_letter(max_column)}{footer_start + len(template.footer) - 1}"
+
+    if output is None:
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    wb.save(output)
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    logging.info(f"R05 report written: {row_count} tickets")
+    return output
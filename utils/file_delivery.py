@@ -0,0 +1,125 @@
+import logging
+import os
+import unicodedata
+import urllib.parse
+from flask import make_response, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.utils import send_file as send_file_from_environ
+
+from utils.file_store import UPLOAD_FOLDER
+
+# How files are sent once a view has checked permissions:
+#   'direct'     - by the worker (sendfile via the WSGI server's file wrapper, Range/conditional GET)
+#   'x-accel'    - empty response with X-Accel-Redirect; nginx needs an internal location such as
+#                  location /protected-uploads/ { internal; alias /srv/helpdesk/uploads/; }
+#   'x-sendfile' - empty response with X-Sendfile (Apache mod_xsendfile, lighttpd)
+FILE_DELIVERY = os.environ.get('FILE_DELIVERY', 'direct').lower()
+# Internal nginx location that maps onto the uploads folder
+X_ACCEL_PREFIX = os.environ.get('X_ACCEL_PREFIX', '/protected-uploads/')
+# Serve offloaded responses in-process (ProxyEmulator) to try the proxy modes without nginx
+FILE_DELIVERY_EMULATE = os.environ.get('FILE_DELIVERY_EMULATE') == '1'
+
+if FILE_DELIVERY not in ('direct', 'x-accel', 'x-sendfile'):
+    logging.warning(f"Unknown FILE_DELIVERY {FILE_DELIVERY!r}; sending files directly")
+    FILE_DELIVERY = 'direct'
+
+
+def deliver_file(path, mimetype, as_attachment=False, download_name=None, etag=None):
+    """Response sending path (absolute, inside uploads/) the configured way.
+
+    Raises FileNotFoundError if the file is missing, like send_file().
+    """
+    if FILE_DELIVERY == 'direct':
+        return send_file(path, mimetype=mimetype, as_attachment=as_attachment,
+                         download_name=download_name, etag=etag if etag else True)
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    response = make_response('')
+    if FILE_DELIVERY == 'x-accel':
+        relative = os.path.relpath(path, os.path.abspath(UPLOAD_FOLDER))
+        response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + urllib.parse.quote(relative.replace(os.sep, '/'))
+    else:
+        response.headers['X-Sendfile'] = path
+    response.mimetype = mimetype
+    if as_attachment:
+        _set_download_name(response, download_name or os.path.basename(path))
+    if etag:
+        response.set_etag(etag)
+    # Revalidations are answered here; the proxy serves the file and any ranges of it
+    return response.make_conditional(request)
+
+
+def _set_download_name(response, name):
+    """Content-Disposition for a download, with an RFC 5987 name when it is not ASCII (as send_file() does)"""
+    try:
+        name.encode('ascii')
+        names = {'filename': name}
+    except UnicodeEncodeError:
+        ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+        names = {'filename': ascii_name, 'filename*': f"UTF-8''{urllib.parse.quote(name, safe='')}"}
+    response.headers.set('Content-Disposition', 'attachment', **names)
+
+
+def configure_file_delivery(app):
+    """Install the local proxy emulation if FILE_DELIVERY_EMULATE asks for it"""
+    if FILE_DELIVERY_EMULATE and FILE_DELIVERY != 'direct':
+        app.wsgi_app = ProxyEmulator(app.wsgi_app)
+        logging.info(f"Emulating the front proxy for FILE_DELIVERY={FILE_DELIVERY}")
+
+
+class ProxyEmulator:
+    """WSGI middleware that serves X-Accel-Redirect / X-Sendfile responses like the proxy would.
+
+    For local development and checks only: the file is sent by this process
+    (with Range and conditional GET support), and the upstream response's
+    Content-Disposition, Cache-Control and ETag are kept.
+    """
+
+    KEPT_HEADERS = ('Content-Disposition', 'Cache-Control', 'Set-Cookie', 'Vary')
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'] = status, headers
+            return lambda data: None
+
+        body = self.wsgi_app(environ, capture)
+        headers = dict(captured.get('headers') or [])
+        path = self._resolve(headers)
+        if path is None or not captured['status'].startswith('200'):
+            start_response(captured['status'], captured['headers'])
+            return body
+        if hasattr(body, 'close'):
+            body.close()
+        if not self._inside_uploads(path):
+            # The proxy only maps its internal location onto the uploads folder
+            logging.warning(f"Refusing to serve {path!r} outside the uploads folder")
+            return NotFound()(environ, start_response)
+
+        etag = headers.get('ETag', '').strip('"') or True
+        response = send_file_from_environ(path, environ, mimetype=headers.get('Content-Type'), etag=etag,
+                                          conditional=True)
+        for name in self.KEPT_HEADERS:
+            if name in headers:
+                response.headers[name] = headers[name]
+        return response(environ, start_response)
+
+    @staticmethod
+    def _resolve(headers):
+        if 'X-Sendfile' in headers:
+            return headers['X-Sendfile']
+        redirect = headers.get('X-Accel-Redirect')
+        if redirect and redirect.startswith(X_ACCEL_PREFIX):
+            relative = urllib.parse.unquote(redirect[len(X_ACCEL_PREFIX):])
+            return os.path.join(os.path.abspath(UPLOAD_FOLDER), relative)
+        return None
+
+    @staticmethod
+    def _inside_uploads(path):
+        root = os.path.realpath(UPLOAD_FOLDER)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
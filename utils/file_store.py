@@ -0,0 +1,231 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import inspect, select, text
+
+UPLOAD_FOLDER = 'uploads'
+OBJECT_FOLDER = os.path.join(UPLOAD_FOLDER, 'objects')
+CHUNK_SIZE = 64 * 1024
+LEGACY_PREFIX = re.compile(r'^\d{8}_\d{6}_')
+# Files with no stored_files row are kept this long before they are deleted, so an
+# upload that reuses one concurrently with the collector does not lose its file
+GARBAGE_GRACE = timedelta(hours=1)
+
+
+def ensure_attachment_columns():
+    """Add the file store columns to an attachments table created before them"""
+    from app import db
+
+    columns = {column['name'] for column in inspect(db.engine).get_columns('attachments')}
+    with db.engine.begin() as conn:
+        if 'original_name' not in columns:
+            conn.execute(text('ALTER TABLE attachments ADD COLUMN original_name VARCHAR(255)'))
+        if 'sha256' not in columns:
+            conn.execute(text('ALTER TABLE attachments ADD COLUMN sha256 VARCHAR(64) REFERENCES stored_files (sha256)'))
+
+
+def object_path(sha256):
+    """Sharded location of a stored file: uploads/objects/ab/cd/<sha256>"""
+    return os.path.join(OBJECT_FOLDER, sha256[:2], sha256[2:4], sha256)
+
+
+def store_stream(stream, chunk_size=CHUNK_SIZE):
+    """Copy a file object into the store, hashing it as it is written. Returns (sha256, size).
+
+    Content that is already stored is not written a second time.
+    """
+    os.makedirs(OBJECT_FOLDER, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=OBJECT_FOLDER, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as temp:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                temp.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        place_object(temp_path, sha256)
+        return sha256, size
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def place_object(temp_path, sha256):
+    """Rename a fully written temporary file (inside OBJECT_FOLDER) to its content address"""
+    path = object_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+        # Reused content counts as new for the orphan sweep until the upload's row is committed
+        os.utime(path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+
+def add_reference(sha256, size):
+    """Count one more attachment pointing at stored content (inside the caller's transaction)"""
+    from app import db
+    from models import StoredFile
+
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        now = datetime.utcnow()
+        stmt = insert(StoredFile).values(sha256=sha256, size=size, ref_count=1, created_at=now, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['sha256'],
+            set_={'ref_count': StoredFile.ref_count + 1, 'updated_at': now}
+        )
+        db.session.execute(stmt)
+        return
+
+    # Other databases: read-modify-write within the caller's transaction
+    stored = db.session.get(StoredFile, sha256, with_for_update=True)
+    if stored is None:
+        db.session.add(StoredFile(sha256=sha256, size=size, ref_count=1))
+    else:
+        stored.ref_count += 1
+
+
+def store_upload(file_storage, filename):
+    """Store an uploaded file; returns an Attachment (not yet added to a ticket) with URL handle filename"""
+    from models import Attachment
+    from utils.upload_stream import UploadStream
+
+    if isinstance(file_storage.stream, UploadStream):
+        # Already hashed and written while the request was parsed
+        sha256, size = file_storage.stream.store()
+    else:
+        file_storage.stream.seek(0)
+        sha256, size = store_stream(file_storage.stream)
+    add_reference(sha256, size)
+    return Attachment(filename=filename, original_name=(file_storage.filename or filename)[:255], sha256=sha256)
+
+
+def attachment_path(attachment, filename=None):
+    """Path on disk for an attachment (or for a legacy file that has no attachment row)"""
+    # Absolute, since send_file() would resolve a relative path against the app root
+    if attachment is not None and attachment.sha256:
+        return os.path.abspath(object_path(attachment.sha256))
+    return os.path.abspath(os.path.join(UPLOAD_FOLDER, os.path.basename(filename or attachment.filename)))
+
+
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def collect_garbage(grace=GARBAGE_GRACE):
+    """Delete stored files that no stored_files row records, as failed uploads leave. Returns files removed.
+
+    Attachments are never deleted, so every recorded file stays referenced.
+    """
+    removed = _sweep_orphans(time.time() - grace.total_seconds())
+    logging.info(f"File store garbage collection removed {removed} files")
+    return removed
+
+
+def _sweep_orphans(cutoff):
+    """Delete files in the store with no stored_files row, last written before cutoff (a timestamp).
+
+    Uploads write their file before the row commits, so a rolled-back or
+    crashed request leaves an object (or an .upload- temporary) behind.
+    """
+    from app import db
+    from models import StoredFile
+    from utils.thumbnails import remove_thumbnails
+
+    candidates = {}
+    for folder, _, names in os.walk(OBJECT_FOLDER):
+        for name in names:
+            path = os.path.join(folder, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    candidates[path] = name
+            except FileNotFoundError:
+                pass
+
+    removed = 0
+    paths = list(candidates)
+    for start in range(0, len(paths), 500):
+        batch = paths[start:start + 500]
+        hashes = [candidates[path] for path in batch if not candidates[path].startswith('.')]
+        known = set(db.session.execute(select(StoredFile.sha256).where(StoredFile.sha256.in_(hashes))).scalars())
+        for path in batch:
+            name = candidates[path]
+            if name in known:
+                continue
+            try:
+                # Skip files an upload has reused since the walk
+                if os.path.getmtime(path) >= cutoff:
+                    continue
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+            if not name.startswith('.'):
+                remove_thumbnails(name)
+    db.session.commit()
+    return removed
+
+
+def migrate_legacy_uploads(keep_originals=False):
+    """Move files referenced by legacy attachments and ticket images into the store.
+
+    Ticket images get an Attachment row so every file is reached the same
+    way. Returns (files migrated, duplicate files, bytes freed).
+    """
+    from app import db
+    from models import Attachment, StoredFile, Ticket
+
+    migrated = duplicates = freed = 0
+    legacy = Attachment.query.filter(Attachment.sha256.is_(None)).all()
+    attached = {a.filename for a in Attachment.query.with_entities(Attachment.filename)}
+    images = Ticket.query.filter(Ticket.image_filename.isnot(None)).all()
+    for ticket in images:
+        if ticket.image_filename not in attached:
+            attachment = Attachment(ticket_id=ticket.id, filename=ticket.image_filename, uploaded_at=ticket.created_at)
+            db.session.add(attachment)
+            legacy.append(attachment)
+            attached.add(ticket.image_filename)
+
+    moved = []
+    for attachment in legacy:
+        path = os.path.join(UPLOAD_FOLDER, os.path.basename(attachment.filename))
+        if not os.path.exists(path):
+            logging.warning(f"Legacy upload missing on disk: {path}")
+            continue
+        with open(path, 'rb') as source:
+            sha256, size = store_stream(source)
+        db.session.flush()
+        already_stored = db.session.get(StoredFile, sha256) is not None
+        add_reference(sha256, size)
+        attachment.sha256 = sha256
+        # Legacy names carry a YYYYmmdd_HHMMSS_ upload prefix
+        attachment.original_name = attachment.original_name or LEGACY_PREFIX.sub('', attachment.filename)
+        migrated += 1
+        if already_stored:
+            duplicates += 1
+            freed += size
+        moved.append(path)
+    db.session.commit()
+
+    # Originals are only removed once the store rows are committed
+    if not keep_originals:
+        for path in set(moved):
+            os.remove(path)
+    logging.info(f"Migrated {migrated} legacy uploads ({duplicates} duplicates, {freed} bytes freed)")
+    return migrated, duplicates, freed
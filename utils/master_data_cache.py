@@ -0,0 +1,142 @@
+import logging
+import threading
+from types import SimpleNamespace
+from flask import g
+
+# Counter row in ticket_counters whose value changes whenever master data or settings change.
+# Each request reads it once, so a committed change is seen by every worker's next request;
+# a request already running when the change commits finishes with what it started with.
+MASTER_DATA_VERSION_COUNTER = 'master_data_version'
+
+_lock = threading.Lock()
+_cache = {'version': None, 'entries': {}}
+
+
+def _current_version():
+    """Shared cache version, read once per request"""
+    if 'master_data_version' not in g:
+        from app import db
+        from models import TicketCounter
+        counters = TicketCounter.__table__
+        g.master_data_version = db.session.execute(
+            counters.select().with_only_columns(counters.c.value).where(counters.c.name == MASTER_DATA_VERSION_COUNTER)
+        ).scalar() or 0
+    return g.master_data_version
+
+
+def get_master_data_version():
+    """Current shared version; changes whenever master data, settings or users change"""
+    return _current_version()
+
+
+def bump_master_data_version():
+    """Invalidate every worker's cache; call before committing a master data/settings change.
+
+    The new version only becomes visible when the change commits; this
+    worker's entries are dropped after that commit (see init_master_data_cache).
+    """
+    from app import db
+    from models import TicketCounter
+
+    counters = TicketCounter.__table__
+    result = db.session.execute(
+        counters.update().where(counters.c.name == MASTER_DATA_VERSION_COUNTER).values(value=counters.c.value + 1)
+    )
+    if result.rowcount == 0:
+        db.session.add(TicketCounter(name=MASTER_DATA_VERSION_COUNTER, value=1))
+    db.session.info['master_data_changed'] = True
+    g.pop('master_data_version', None)
+
+
+def clear_master_data_cache():
+    with _lock:
+        _cache['version'] = None
+        _cache['entries'] = {}
+
+
+def init_master_data_cache(db):
+    """Drop this worker's entries once a transaction that bumped the version commits.
+
+    Clearing earlier would let a concurrent request re-cache the old rows
+    under the old version before the change is visible.
+    """
+    from sqlalchemy import event
+
+    @event.listens_for(db.session, 'after_commit')
+    def _after_commit(session):
+        if session.info.pop('master_data_changed', False):
+            clear_master_data_cache()
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _after_rollback(session):
+        session.info.pop('master_data_changed', None)
+
+
+def cached(key, loader):
+    """Return the cached value for key, loading it if missing or the shared version moved"""
+    version = _current_version()
+    with _lock:
+        if _cache['version'] != version:
+            _cache['version'] = version
+            _cache['entries'] = {}
+        if key in _cache['entries']:
+            return _cache['entries'][key]
+
+    value = loader()
+    with _lock:
+        if _cache['version'] == version:
+            _cache['entries'][key] = value
+    return value
+
+
+def _snapshot(row):
+    """Plain, session-independent copy of a settings row"""
+    if row is None:
+        return None
+    return SimpleNamespace(**{column.name: getattr(row, column.name) for column in row.__table__.columns})
+
+
+def get_active_categories():
+    """Names of active categories"""
+    def load():
+        from models import MasterDataCategory
+        return [c.name for c in MasterDataCategory.query.filter_by(is_active=True).order_by(MasterDataCategory.id).all()]
+    return cached('active_categories', load)
+
+
+def get_active_priorities():
+    """Names of active priorities, lowest level first"""
+    def load():
+        from models import MasterDataPriority
+        return [p.name for p in MasterDataPriority.query.filter_by(is_active=True).order_by(MasterDataPriority.level, MasterDataPriority.id).all()]
+    return cached('active_priorities', load)
+
+
+def get_active_statuses():
+    """Names of active statuses"""
+    def load():
+        from models import MasterDataStatus
+        return [s.name for s in MasterDataStatus.query.filter_by(is_active=True).order_by(MasterDataStatus.id).all()]
+    return cached('active_statuses', load)
+
+
+def get_super_admins():
+    """Super admins (id, full_name, department, email) for assignment forms and lists"""
+    def load():
+        from models import User
+        admins = User.query.filter_by(role='super_admin').order_by(User.id).all()
+        return [
+            SimpleNamespace(id=admin.id, full_name=admin.full_name, department=admin.department, email=admin.email)
+            for admin in admins
+        ]
+    return cached('super_admins', load)
+
+
+def get_settings_snapshot(model, active_only=False):
+    """Cached snapshot of the first settings row of model (optionally only an active one)"""
+    def load():
+        query = model.query
+        if active_only:
+            query = query.filter_by(is_active=True)
+        return _snapshot(query.first())
+    return cached(f'settings:{model.__tablename__}:{active_only}', load)
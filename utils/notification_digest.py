@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta
+
+# Updates to one ticket for one recipient within this many seconds are sent as a single email
+EMAIL_COALESCE_WINDOW = int(os.environ.get('EMAIL_COALESCE_WINDOW', '60'))
+# Local hour at which daily digests go out
+EMAIL_DIGEST_HOUR = int(os.environ.get('EMAIL_DIGEST_HOUR', '8'))
+
+DIGEST_CHOICES = [
+    ('off', 'Email me about each ticket update'),
+    ('hourly', 'Hourly digest'),
+    ('daily', 'Daily digest'),
+]
+
+SIGN_OFF = "Best regards,\nGTN IT Helpdesk Team"
+
+
+def get_digest_preference(user_id):
+    """A user's digest choice ('off' without a row), read by primary key rather than from the master data cache"""
+    from app import db
+    from models import NotificationPreference
+
+    preference = db.session.get(NotificationPreference, user_id)
+    return preference.digest if preference else 'off'
+
+
+def set_digest_preference(user_id, digest):
+    """Store a user's digest choice (committed by the caller)"""
+    from app import db
+    from models import NotificationPreference
+
+    preference = db.session.get(NotificationPreference, user_id)
+    if preference is None:
+        preference = NotificationPreference(user_id=user_id)
+        db.session.add(preference)
+    preference.digest = digest
+
+
+def next_digest_time(digest, now):
+    """UTC time at which the next hourly/daily digest is due"""
+    if digest == 'hourly':
+        return now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    from utils.timezone import local_to_utc, utc_to_ist
+    local_now = utc_to_ist(now)
+    send_at = local_now.replace(hour=EMAIL_DIGEST_HOUR, minute=0, second=0, microsecond=0)
+    if send_at <= local_now:
+        send_at += timedelta(days=1)
+    return local_to_utc(send_at)
+
+
+def schedule_notification(to_email, ticket_id=None, user_id=None, now=None):
+    """(coalesce_key, send_at) for a queued notification"""
+    now = now or datetime.utcnow()
+    digest = get_digest_preference(user_id) if user_id else 'off'
+    if digest != 'off':
+        return f"digest:{digest}:{to_email.lower()}", next_digest_time(digest, now)
+    if ticket_id and EMAIL_COALESCE_WINDOW > 0:
+        return f"ticket:{ticket_id}:{to_email.lower()}", now + timedelta(seconds=EMAIL_COALESCE_WINDOW)
+    return None, now
+
+
+def _strip_envelope(body):
+    """Message body without its 'Hello ...,' greeting and sign-off"""
+    lines = body.strip().splitlines()
+    if lines and lines[0].startswith('Hello'):
+        lines = lines[1:]
+    text = '\n'.join(lines)
+    if 'Best regards,' in text:
+        text = text[:text.rindex('Best regards,')]
+    return text.strip()
+
+
+def combine_messages(coalesce_key, messages):
+    """(subject, body, message_type) of one email covering several queued messages, oldest first"""
+    first = messages[0]
+    if len(messages) == 1:
+        return first.subject, first.body, first.message_type
+
+    greeting = first.body.strip().splitlines()[0]
+    if not greeting.startswith('Hello'):
+        greeting = 'Hello,'
+    sections = '\n\n'.join(f"== {m.subject} ==\n{_strip_envelope(m.body)}" for m in messages)
+
+    if coalesce_key.startswith('digest:'):
+        period = coalesce_key.split(':')[1]
+        subject = f"Your {period} ticket digest: {len(messages)} updates"
+        intro = f"Here is your {period} summary of ticket updates:"
+        message_type = 'ticket_digest'
+    else:
+        subject = f"{first.subject} (+{len(messages) - 1} more updates)"
+        intro = "There have been several updates to this ticket:"
+        types = {m.message_type for m in messages}
+        message_type = types.pop() if len(types) == 1 else 'ticket_updated'
+
+    return subject[:200], f"{greeting}\n\n{intro}\n\n{sections}\n\n{SIGN_OFF}", message_type
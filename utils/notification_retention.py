@@ -0,0 +1,214 @@
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, select, text
+
+# Notification log rows older than this are purged by the purge-notification-logs command
+# (run it daily from cron or Task Scheduler); the daily rollup keeps their counts
+NOTIFICATION_LOG_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_LOG_RETENTION_DAYS', '180'))
+# Rows deleted per transaction, so no purge holds row locks for long
+PURGE_BATCH_SIZE = 5000
+# Pause between purge batches to let request traffic through
+PURGE_PAUSE = 0.05
+# Monthly partitions created ahead of time on PostgreSQL
+PARTITION_MONTHS_AHEAD = 2
+
+LOG_TABLE = 'email_notification_logs'
+LEGACY_PARTITION = f'{LOG_TABLE}_legacy'
+DEFAULT_PARTITION = f'{LOG_TABLE}_default'
+
+
+def _month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def _partition_name(month):
+    return f'{LOG_TABLE}_p{month:%Y%m}'
+
+
+def is_partitioned():
+    """True if the notification log is a partitioned table (PostgreSQL only)"""
+    from app import db
+
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    return db.session.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :name"
+    ), {'name': LOG_TABLE}).first() is not None
+
+
+def _monthly_partitions():
+    """{month start: partition name} of the existing monthly partitions"""
+    from app import db
+
+    names = db.session.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :name"
+    ), {'name': LOG_TABLE}).scalars()
+    prefix = f'{LOG_TABLE}_p'
+    partitions = {}
+    for name in names:
+        if name.startswith(prefix):
+            try:
+                partitions[datetime.strptime(name[len(prefix):], '%Y%m').date()] = name
+            except ValueError:
+                continue
+    return partitions
+
+
+def ensure_notification_log_partitions(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create this month's and the next months' partitions; returns the names created"""
+    from app import db
+
+    if not is_partitioned():
+        return []
+    existing = _monthly_partitions()
+    created = []
+    month = _month_start(datetime.utcnow().date())
+    for _ in range(months_ahead + 1):
+        if month not in existing and not _covered_by_legacy(month):
+            name = _partition_name(month)
+            db.session.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {LOG_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+            ))
+            created.append(name)
+        month = _add_months(month, 1)
+    db.session.commit()
+    return created
+
+
+def _covered_by_legacy(month):
+    """True if the legacy partition (the table as it was before partitioning) covers this month"""
+    from app import db
+
+    bound = db.session.execute(text(
+        "SELECT pg_get_expr(c.relpartbound, c.oid) FROM pg_class c WHERE c.relname = :name"
+    ), {'name': LEGACY_PARTITION}).scalar()
+    if not bound or "TO ('" not in bound:
+        return False
+    upper = datetime.strptime(bound.split("TO ('")[1][:10], '%Y-%m-%d').date()
+    return month < upper
+
+
+def partition_notification_logs(months_ahead=PARTITION_MONTHS_AHEAD):
+    """Convert the notification log into a table partitioned by month (PostgreSQL, run once).
+
+    The existing table becomes the legacy partition holding everything up to
+    the start of next month; new rows land in monthly partitions from then on.
+    Runs in one transaction under an exclusive lock on the log table.
+    """
+    from app import db
+
+    if db.engine.dialect.name != 'postgresql':
+        raise RuntimeError('Notification log partitioning requires PostgreSQL')
+    if is_partitioned():
+        return ensure_notification_log_partitions(months_ahead)
+
+    boundary = _add_months(_month_start(datetime.utcnow().date()), 1).isoformat()
+    index_names = db.session.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :name"
+    ), {'name': LOG_TABLE}).scalars().all()
+    try:
+        db.session.execute(text(f"LOCK TABLE {LOG_TABLE} IN ACCESS EXCLUSIVE MODE"))
+        # The partition key has to be NOT NULL
+        db.session.execute(text(f"UPDATE {LOG_TABLE} SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL"))
+        db.session.execute(text(f"ALTER TABLE {LOG_TABLE} RENAME TO {LEGACY_PARTITION}"))
+        for index_name in index_names:
+            db.session.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name}_legacy"))
+
+        db.session.execute(text(
+            f"CREATE TABLE {LOG_TABLE} (LIKE {LEGACY_PARTITION} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+        ))
+        db.session.execute(text(f"ALTER TABLE {LOG_TABLE} ALTER COLUMN created_at SET NOT NULL"))
+        db.session.execute(text(f"ALTER TABLE {LOG_TABLE} ADD CONSTRAINT {LOG_TABLE}_pkey PRIMARY KEY (id, created_at)"))
+        db.session.execute(text(f"ALTER TABLE {LOG_TABLE} ADD FOREIGN KEY (ticket_id) REFERENCES tickets (id)"))
+        db.session.execute(text(f"ALTER TABLE {LOG_TABLE} ADD FOREIGN KEY (user_id) REFERENCES users (id)"))
+        # Keep the id sequence alive when the legacy partition is eventually dropped
+        db.session.execute(text(f"ALTER SEQUENCE {LOG_TABLE}_id_seq OWNED BY {LOG_TABLE}.id"))
+
+        db.session.execute(text(f"ALTER TABLE {LEGACY_PARTITION} ALTER COLUMN created_at SET NOT NULL"))
+        db.session.execute(text(
+            f"ALTER TABLE {LOG_TABLE} ATTACH PARTITION {LEGACY_PARTITION} FOR VALUES FROM (MINVALUE) TO ('{boundary}')"
+        ))
+        db.session.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {LOG_TABLE} DEFAULT"))
+
+        # Recreate the model's indexes on the parent (they cascade to every partition)
+        # and drop the legacy copies they replace
+        from models import EmailNotificationLog
+        for index in EmailNotificationLog.__table__.indexes:
+            index.create(bind=db.session.connection())
+        for index_name in index_names:
+            if not index_name.endswith('_pkey'):
+                db.session.execute(text(f"DROP INDEX IF EXISTS {index_name}_legacy"))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error partitioning {LOG_TABLE}: {e}")
+        raise
+
+    logging.info(f"{LOG_TABLE} partitioned by month; rows before {boundary} kept in {LEGACY_PARTITION}")
+    return ensure_notification_log_partitions(months_ahead)
+
+
+def drop_expired_partitions(cutoff):
+    """Drop monthly partitions that end before cutoff; returns the names dropped"""
+    from app import db
+
+    if not is_partitioned():
+        return []
+    dropped = []
+    for month, name in sorted(_monthly_partitions().items()):
+        if _add_months(month, 1) <= cutoff.date():
+            # Dropping a whole month is a catalog change, not a row-by-row delete
+            db.session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+def purge_notification_logs(retention_days=NOTIFICATION_LOG_RETENTION_DAYS, batch_size=PURGE_BATCH_SIZE):
+    """Delete notification log rows older than the retention window. Returns the rows deleted.
+
+    Expired monthly partitions are dropped outright; remaining old rows (the
+    legacy partition, the month straddling the cutoff, or an unpartitioned
+    table) are deleted in short batches that each commit on their own.
+    """
+    from app import db
+    from models import EmailNotificationLog
+
+    # Purge whole UTC days so the oldest remaining day is complete for rebuild_notification_rollup()
+    cutoff = datetime.combine(datetime.utcnow().date() - timedelta(days=retention_days), datetime.min.time())
+    dropped = drop_expired_partitions(cutoff)
+    if dropped:
+        logging.info(f"Dropped expired notification log partitions: {', '.join(dropped)}")
+
+    deleted = 0
+    while True:
+        batch = select(EmailNotificationLog.id).where(
+            EmailNotificationLog.created_at < cutoff
+        ).order_by(EmailNotificationLog.id).limit(batch_size)
+        ids = db.session.execute(batch).scalars().all()
+        if not ids:
+            break
+        try:
+            db.session.execute(delete(EmailNotificationLog).where(EmailNotificationLog.id.in_(ids)))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Error purging notification logs: {e}")
+            raise
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+        time.sleep(PURGE_PAUSE)
+
+    ensure_notification_log_partitions()
+    logging.info(f"Purged {deleted} notification log rows older than {cutoff:%Y-%m-%d}")
+    return deleted
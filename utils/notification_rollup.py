@@ -0,0 +1,142 @@
+from datetime import datetime, date
+from sqlalchemy import func
+import logging
+
+
+def notification_rollup_key(created_at, message_type, status):
+    """Return the email_notification_daily_stats key a log row counts towards"""
+    return ((created_at or datetime.utcnow()).date(), message_type, status)
+
+
+def _upsert_rollup(key, delta):
+    """Add delta to one rollup row inside the current transaction"""
+    from app import db
+    from models import EmailNotificationDailyStats
+
+    day, message_type, status = key
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(EmailNotificationDailyStats).values(
+            day=day, message_type=message_type, status=status,
+            notification_count=delta, updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'message_type', 'status'],
+            set_={
+                'notification_count': EmailNotificationDailyStats.notification_count + delta,
+                'updated_at': datetime.utcnow()
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Other databases: read-modify-write within the caller's transaction
+    row = EmailNotificationDailyStats.query.filter_by(
+        day=day, message_type=message_type, status=status
+    ).with_for_update().first()
+    if row:
+        row.notification_count += delta
+    else:
+        db.session.add(EmailNotificationDailyStats(
+            day=day, message_type=message_type, status=status, notification_count=delta
+        ))
+
+
+def record_notifications(log_rows):
+    """Count EmailNotificationLog rows (dicts or objects) into the rollup.
+
+    Call before committing so the counters land in the same transaction as
+    the log rows themselves.
+    """
+    counts = {}
+    for row in log_rows:
+        if isinstance(row, dict):
+            key = notification_rollup_key(row.get('created_at'), row['message_type'], row['status'])
+        else:
+            key = notification_rollup_key(row.created_at, row.message_type, row.status)
+        counts[key] = counts.get(key, 0) + 1
+    for key, count in counts.items():
+        _upsert_rollup(key, count)
+
+
+def notification_totals(message_type=None):
+    """{'sent': n, 'failed': n, 'total': n, 'success_rate': pct} from the rollup"""
+    from app import db
+    from models import EmailNotificationDailyStats
+
+    query = db.session.query(
+        EmailNotificationDailyStats.status, func.sum(EmailNotificationDailyStats.notification_count)
+    ).group_by(EmailNotificationDailyStats.status)
+    if message_type:
+        query = query.filter(EmailNotificationDailyStats.message_type == message_type)
+    by_status = {status: int(count or 0) for status, count in query.all()}
+
+    sent = by_status.get('sent', 0)
+    failed = by_status.get('failed', 0)
+    total = sum(by_status.values())
+    return {
+        'sent': sent,
+        'failed': failed,
+        'total': total,
+        'success_rate': round((sent / total * 100) if total > 0 else 0, 1),
+    }
+
+
+def _as_date(value):
+    """Normalize func.date() results, which SQLite returns as strings"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def rebuild_notification_rollup():
+    """Recompute the rollup for the days still covered by log rows. Returns the row count.
+
+    Days before the oldest remaining log row have been purged, so their
+    rollup rows are the only record left and are kept as they are.
+    """
+    from app import db
+    from models import EmailNotificationLog, EmailNotificationDailyStats
+
+    oldest = db.session.query(func.min(EmailNotificationLog.created_at)).scalar()
+    if oldest is None:
+        return 0
+
+    day_expr = func.date(EmailNotificationLog.created_at)
+    rows = db.session.query(
+        day_expr, EmailNotificationLog.message_type, EmailNotificationLog.status, func.count(EmailNotificationLog.id)
+    ).group_by(day_expr, EmailNotificationLog.message_type, EmailNotificationLog.status).all()
+
+    try:
+        EmailNotificationDailyStats.query.filter(EmailNotificationDailyStats.day >= oldest.date()).delete()
+        now = datetime.utcnow()
+        if rows:
+            db.session.execute(EmailNotificationDailyStats.__table__.insert(), [
+                {
+                    'day': _as_date(day), 'message_type': message_type, 'status': status,
+                    'notification_count': count, 'updated_at': now
+                }
+                for day, message_type, status, count in rows
+            ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error rebuilding notification rollup: {e}")
+        raise
+
+    logging.info(f"Notification rollup rebuilt with {len(rows)} rows")
+    return len(rows)
+
+
+def ensure_notification_rollup():
+    """Build the rollup once if it is empty but notifications were already logged"""
+    from models import EmailNotificationLog, EmailNotificationDailyStats
+
+    if EmailNotificationDailyStats.query.first() is None and EmailNotificationLog.query.first() is not None:
+        rebuild_notification_rollup()
@@ -0,0 +1,146 @@
+import base64
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from sqlalchemy import and_, or_, text
+
+DEFAULT_PER_PAGE = 25
+MAX_PER_PAGE = 100
+
+
+@dataclass
+class KeysetPage:
+    """One page of rows ordered newest first by (created_at, id)"""
+    items: list = field(default_factory=list)
+    per_page: int = DEFAULT_PER_PAGE
+    next_cursor: str = None
+    prev_cursor: str = None
+    total: int = None
+    total_is_estimate: bool = False
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe string"""
+    payload = json.dumps([created_at.isoformat() if created_at else None, row_id])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor back into (created_at, id); returns None if it is malformed"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return (datetime.fromisoformat(created_at) if created_at else None, int(row_id))
+    except (ValueError, TypeError, json.JSONDecodeError):
+        logging.warning(f"Ignoring malformed pagination cursor: {cursor!r}")
+        return None
+
+
+def _estimate_count(query):
+    """Planner row estimate on PostgreSQL, exact COUNT elsewhere"""
+    from app import db
+
+    if db.engine.dialect.name == 'postgresql':
+        try:
+            sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+            plan = db.session.execute(text('EXPLAIN (FORMAT JSON) ' + sql)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows']), True
+        except Exception as e:
+            logging.warning(f"Row estimate failed, falling back to COUNT: {e}")
+    return query.order_by(None).count(), False
+
+
+def keyset_query(query, model, after_key=None, before_key=None):
+    """query ordered and filtered for one keyset page after/before a decoded (created_at, id) position.
+
+    A before_key page comes back oldest first; keyset_paginate flips it around.
+    """
+    created_col, id_col = model.created_at, model.id
+    if before_key:
+        # Walk backwards (oldest first) from the cursor
+        created_at, row_id = before_key
+        return query.filter(or_(
+            created_col > created_at,
+            and_(created_col == created_at, id_col > row_id)
+        )).order_by(created_col.asc(), id_col.asc())
+
+    page_query = query.order_by(created_col.desc(), id_col.desc())
+    if after_key:
+        created_at, row_id = after_key
+        page_query = page_query.filter(or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < row_id)
+        ))
+    return page_query
+
+
+def keyset_paginate(query, model, after=None, before=None, per_page=DEFAULT_PER_PAGE, count=None):
+    """Page through query newest first using (created_at, id) as the key.
+
+    after/before are cursors from a previous page's next_cursor/prev_cursor.
+    count may be None (no total), 'exact' or 'estimate'.
+    """
+    per_page = max(1, min(int(per_page or DEFAULT_PER_PAGE), MAX_PER_PAGE))
+    total, total_is_estimate = None, False
+    if count == 'estimate':
+        total, total_is_estimate = _estimate_count(query)
+    elif count == 'exact':
+        total = query.order_by(None).count()
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if not after_key else None
+    page_query = keyset_query(query, model, after_key, before_key)
+
+    # Fetch one extra row to learn whether another page exists without a COUNT
+    rows = page_query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before_key:
+        rows.reverse()
+        has_newer, has_older = has_more, True
+    else:
+        has_newer, has_older = after_key is not None, has_more
+
+    page = KeysetPage(items=rows, per_page=per_page, total=total, total_is_estimate=total_is_estimate)
+    if rows and has_older:
+        page.next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    if rows and has_newer:
+        page.prev_cursor = encode_cursor(rows[0].created_at, rows[0].id)
+    return page
+
+
+def paginate_from_request(query, model, prefix='', count=None):
+    """keyset_paginate driven by ?after=/?before=/?per_page= request args (optionally prefixed)"""
+    from flask import request
+
+    return keyset_paginate(
+        query,
+        model,
+        after=request.args.get(f'{prefix}after'),
+        before=request.args.get(f'{prefix}before'),
+        per_page=request.args.get(f'{prefix}per_page', DEFAULT_PER_PAGE, type=int),
+        count=count
+    )
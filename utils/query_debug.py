@@ -0,0 +1,70 @@
+import logging
+import re
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Route (endpoint) name -> maximum statements a GET of the view may issue
+QUERY_BUDGETS = {}
+
+# Identical statements repeated this many times in one request are reported as N+1 loads
+REPEAT_THRESHOLD = 3
+
+
+def query_budget(max_queries):
+    """Declare the statement budget for a view; checked when query debugging is on"""
+    def decorator(f):
+        QUERY_BUDGETS[f.__name__] = max_queries
+        return f
+    return decorator
+
+
+def _normalize(statement):
+    return re.sub(r'\s+', ' ', statement).strip()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    stats = g.get('query_stats')
+    if stats is None:
+        return
+    stats['count'] += 1
+    key = _normalize(statement)
+    stats['statements'][key] = stats['statements'].get(key, 0) + 1
+
+
+def init_query_debug(app):
+    """Count statements per request and flag N+1 patterns in debug/testing mode or with QUERY_DEBUG=1"""
+
+    @app.before_request
+    def start_query_stats():
+        if app.debug or app.testing or app.config.get('QUERY_DEBUG'):
+            g.query_stats = {'count': 0, 'statements': {}, 'started': time.perf_counter()}
+
+    @app.after_request
+    def report_query_stats(response):
+        stats = g.get('query_stats')
+        if stats is None:
+            return response
+
+        endpoint = request.endpoint or ''
+        # Budgets cover rendering a view; form submissions do their writes on top
+        budget = QUERY_BUDGETS.get(endpoint) if request.method in ('GET', 'HEAD') else None
+        repeated = {sql: n for sql, n in stats['statements'].items() if n >= REPEAT_THRESHOLD}
+        stats['repeated'] = repeated
+        stats['budget'] = budget
+        stats['over_budget'] = budget is not None and stats['count'] > budget
+
+        response.headers['X-Query-Count'] = str(stats['count'])
+        if budget is not None:
+            response.headers['X-Query-Budget'] = str(budget)
+
+        for sql, n in repeated.items():
+            logging.warning(f"Possible N+1 in {endpoint}: statement ran {n} times: {sql[:200]}")
+        if stats['over_budget']:
+            logging.warning(f"{endpoint} issued {stats['count']} queries, budget is {budget}")
+        logging.debug(f"{endpoint}: {stats['count']} queries in {(time.perf_counter() - stats['started']) * 1000:.1f} ms")
+        return response
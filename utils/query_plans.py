@@ -0,0 +1,75 @@
+import logging
+from datetime import datetime
+from sqlalchemy import text
+
+
+def get_hot_queries(cursor=(datetime(2024, 1, 1), 1)):
+    """The statements routes.py runs on every page load, keyed by a short name.
+
+    Paged listings are built with keyset_query() exactly as keyset_paginate()
+    runs them: the first page and a page after cursor, a (created_at, id) position.
+    """
+    from models import User, Ticket, TicketComment, Attachment, EmailNotificationLog
+    from utils.pagination import DEFAULT_PER_PAGE, keyset_query
+
+    def pages(name, query, model):
+        return {
+            name: keyset_query(query, model).limit(DEFAULT_PER_PAGE + 1),
+            f'{name}_after_cursor': keyset_query(query, model, after_key=cursor).limit(DEFAULT_PER_PAGE + 1),
+        }
+
+    return {
+        **pages('tickets_by_user', Ticket.query.filter_by(user_id=1), Ticket),
+        **pages('tickets_by_assignee', Ticket.query.filter_by(assigned_to=1), Ticket),
+        **pages('tickets_by_user_and_status', Ticket.query.filter_by(user_id=1, status='Open'), Ticket),
+        **pages('notifications', EmailNotificationLog.query, EmailNotificationLog),
+        **pages('notifications_by_status_type', EmailNotificationLog.query.filter_by(
+            status='sent', message_type='ticket_created'
+        ), EmailNotificationLog),
+        'tickets_by_status': Ticket.query.filter_by(status='Open').order_by(Ticket.created_at.desc()).limit(10),
+        'recent_tickets': Ticket.query.order_by(Ticket.created_at.desc()).limit(10),
+        'ticket_by_image': Ticket.query.filter_by(image_filename='image.png'),
+        'attachment_by_filename': Attachment.query.filter_by(filename='file.pdf'),
+        'comments_by_ticket': TicketComment.query.filter_by(ticket_id=1).order_by(TicketComment.created_at),
+        'comments_by_user': TicketComment.query.filter_by(user_id=1),
+        'user_by_username': User.query.filter_by(username='superadmin'),
+    }
+
+
+def _plan_uses_index(dialect, plan_lines):
+    """Whether an EXPLAIN output shows index access for the base table"""
+    plan = '\n'.join(plan_lines)
+    if dialect == 'sqlite':
+        # Every SCAN/SEARCH line must name an index (or the rowid primary key)
+        steps = [line for line in plan_lines if line.startswith(('SCAN', 'SEARCH'))]
+        return bool(steps) and all('INDEX' in line or 'PRIMARY KEY' in line for line in steps)
+    if dialect == 'postgresql':
+        return 'Index' in plan and 'Seq Scan' not in plan
+    return 'index' in plan.lower()
+
+
+def explain_hot_queries():
+    """Run EXPLAIN for each hot query. Returns a list of (name, uses_index, plan_lines)."""
+    from app import db
+
+    dialect = db.engine.dialect.name
+    results = []
+    with db.engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            if dialect == 'postgresql':
+                # Small tables always favour a sequential scan; ask whether an index is usable at all
+                conn.execute(text('SET LOCAL enable_seqscan = off'))
+            for name, query in get_hot_queries().items():
+                sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
+                prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+                rows = conn.execute(text(prefix + sql)).fetchall()
+                # SQLite returns (id, parent, notused, detail); other databases return a single text column
+                plan_lines = [str(row[-1]) for row in rows]
+                uses_index = _plan_uses_index(dialect, plan_lines)
+                if not uses_index:
+                    logging.warning(f"Query {name} does not use an index: {plan_lines}")
+                results.append((name, uses_index, plan_lines))
+        finally:
+            trans.rollback()
+    return results
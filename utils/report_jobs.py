@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+REPORT_TYPE_R05 = 'r05'
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '1'))
+
+# Queued/running jobs older than this are assumed lost (e.g. the server restarted) and rebuilt
+REPORT_JOB_STALE_AFTER = timedelta(minutes=30)
+# Finished report files are kept this long after they were last built
+REPORT_RETENTION = timedelta(days=7)
+
+_FILTER_KEYS = {
+    'range': ('from_date', 'to_date'),
+    'month': ('month',),
+    'year': ('year',),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def report_output_dir():
+    from app import app
+    return os.environ.get('REPORT_OUTPUT_DIR') or os.path.join(app.instance_path, 'reports')
+
+
+def report_params(filter_mode='range', from_date=None, to_date=None, month=None, year=None):
+    """Normalise report filter arguments, keeping only the ones filter_mode uses"""
+    filter_mode = filter_mode or 'range'
+    values = {'from_date': from_date, 'to_date': to_date, 'month': month, 'year': year}
+    params = {'filter_mode': filter_mode}
+    for key in _FILTER_KEYS.get(filter_mode, ()):
+        if values[key]:
+            params[key] = values[key]
+    return params
+
+
+def _params_key(report_type, params):
+    payload = json.dumps([report_type, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def report_data_version(window, record_date):
+    """Fingerprint of everything the report shows; it changes whenever a covered ticket does"""
+    from app import db
+    from models import Ticket
+    from utils.date_windows import apply_date_window
+    from utils.master_data_cache import get_master_data_version
+
+    query = db.session.query(func.count(Ticket.id), func.max(Ticket.updated_at), func.max(Ticket.id))
+    count, last_updated, last_id = apply_date_window(query, Ticket.created_at, window).one()
+    # User names/departments are covered by the master data version, which user edits bump
+    return f"{record_date}|{count}|{last_updated.isoformat() if last_updated else ''}|{last_id or 0}|{get_master_data_version()}"
+
+
+def _is_stale(job):
+    return job.created_at is not None and datetime.utcnow() - job.created_at > REPORT_JOB_STALE_AFTER
+
+
+def submit_report_job(params, requested_by=None, report_type=REPORT_TYPE_R05):
+    """Return the job for these parameters, queueing a build only when no usable one exists.
+
+    Identical requests share one job while it is in flight, and a finished file is
+    reused until the tickets it covers change.
+    """
+    from app import db
+    from models import ReportJob
+    from utils.date_windows import report_window
+
+    record_date = datetime.now().strftime('%d.%m.%Y')
+    params_key = _params_key(report_type, params)
+    data_version = report_data_version(report_window(**params), record_date)
+
+    job = ReportJob.query.filter_by(report_type=report_type, params_key=params_key, data_version=data_version).first()
+    if job:
+        if job.status == 'done' and job.output_path and os.path.exists(job.output_path):
+            return job
+        if job.status in ('queued', 'running') and not _is_stale(job):
+            return job
+        # Failed, lost or missing its file: build it again
+        job.status, job.progress, job.error = 'queued', 0, None
+        job.output_path, job.row_count, job.started_at, job.finished_at = None, None, None, None
+        job.created_at = datetime.utcnow()
+        job.requested_by = requested_by
+    else:
+        job = ReportJob(
+            report_type=report_type,
+            params_key=params_key,
+            params=json.dumps(dict(params, record_date=record_date)),
+            data_version=data_version,
+            requested_by=requested_by
+        )
+        db.session.add(job)
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another request queued the same report first; share its job
+        db.session.rollback()
+        return ReportJob.query.filter_by(report_type=report_type, params_key=params_key, data_version=data_version).one()
+
+    _enqueue(job.id)
+    logging.info(f"Queued report job {job.id} ({report_type} {params})")
+    return job
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: workers start clean instead of inheriting this process's DB connections and threads
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _enqueue(job_id):
+    future = _get_executor().submit(run_report_job, job_id)
+    future.add_done_callback(partial(_job_finished, job_id))
+
+
+def _job_finished(job_id, future):
+    """Mark a job failed if its worker process died before it could report back"""
+    global _executor
+    error = future.exception()
+    if error is None:
+        return
+    logging.error(f"Report job {job_id} worker failed: {error}")
+    with _executor_lock:
+        if getattr(_executor, '_broken', False):
+            _executor = None
+    from app import app
+    with app.app_context():
+        _set_job(job_id, status='failed', error=str(error), finished_at=datetime.utcnow())
+
+
+def _set_job(job_id, **values):
+    """Update a job row on its own connection, independent of the session's transaction"""
+    from app import db
+    from models import ReportJob
+    with db.engine.begin() as conn:
+        return conn.execute(update(ReportJob.__table__).where(ReportJob.__table__.c.id == job_id).values(**values))
+
+
+def run_report_job(job_id):
+    """Build one report; runs in a worker process"""
+    from app import app, db
+    from models import ReportJob, Ticket
+    from utils.date_windows import report_window, apply_date_window
+    from utils.excel_export import write_r05_report
+
+    with app.app_context():
+        # Claim the job so a duplicate submission cannot build it twice
+        jobs = ReportJob.__table__
+        with db.engine.begin() as conn:
+            claimed = conn.execute(
+                update(jobs).where(jobs.c.id == job_id, jobs.c.status == 'queued')
+                .values(status='running', started_at=datetime.utcnow(), progress=0)
+            ).rowcount
+        if not claimed:
+            return
+
+        job = db.session.get(ReportJob, job_id)
+        report_type, params_key = job.report_type, job.params_key
+        params = json.loads(job.params)
+        record_date = params.pop('record_date', None)
+        window = report_window(**params)
+        total = apply_date_window(db.session.query(func.count(Ticket.id)), Ticket.created_at, window).scalar()
+
+        output_dir = report_output_dir()
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, f'{report_type}_{job_id}.xlsx')
+        partial_path = output_path + '.part'
+        rows_read = [0]
+
+        def on_progress(stage, rows):
+            # First half: fetching rows; second half: writing them into the workbook
+            if stage == 'read':
+                rows_read[0] = rows
+                percent = rows * 50 // total if total else 50
+            else:
+                percent = 50 + (rows * 49 // rows_read[0] if rows_read[0] else 49)
+            try:
+                _set_job(job_id, progress=min(percent, 99))
+            except OperationalError as e:
+                # Progress is advisory; SQLite refuses writes while the export's read cursor is open
+                logging.debug(f"Skipped progress update for report job {job_id}: {e}")
+
+        try:
+            with open(partial_path, 'wb') as output:
+                write_r05_report(window, record_date=record_date, output=output, progress=on_progress)
+            os.replace(partial_path, output_path)
+        except Exception as e:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            logging.error(f"Report job {job_id} failed: {e}")
+            db.session.remove()
+            _set_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            return
+
+        # End the export's read transaction before recording the result
+        db.session.remove()
+        _set_job(job_id, status='done', progress=100, row_count=rows_read[0],
+                 output_path=output_path, finished_at=datetime.utcnow())
+        logging.info(f"Report job {job_id} finished: {rows_read[0]} rows")
+
+        _prune_report_jobs(report_type, params_key, job_id)
+
+
+def _prune_report_jobs(report_type, params_key, keep_id):
+    """Delete superseded builds of the same report and any build past REPORT_RETENTION"""
+    from app import db
+    from models import ReportJob
+
+    cutoff = datetime.utcnow() - REPORT_RETENTION
+    old_jobs = ReportJob.query.filter(
+        ReportJob.id != keep_id,
+        ReportJob.status.in_(('done', 'failed')),
+        db.or_(
+            db.and_(ReportJob.report_type == report_type, ReportJob.params_key == params_key),
+            ReportJob.finished_at < cutoff
+        )
+    ).all()
+    for old_job in old_jobs:
+        if old_job.output_path and os.path.exists(old_job.output_path):
+            os.remove(old_job.output_path)
+        db.session.delete(old_job)
+    if old_jobs:
+        db.session.commit()
+        logging.info(f"Pruned {len(old_jobs)} old report jobs")
+
+
+def report_job_status(job):
+    """JSON-friendly progress summary for the polling endpoint"""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'row_count': job.row_count,
+        'error': job.error,
+    }
@@ -0,0 +1,158 @@
+import logging
+import re
+from sqlalchemy import text, bindparam, Integer, Float, or_
+
+# PostgreSQL: weighted tsvector per ticket, GIN indexed
+PG_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS ticket_search (
+        ticket_id INTEGER PRIMARY KEY REFERENCES tickets(id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS ix_ticket_search_document ON ticket_search USING GIN (document)",
+]
+
+# Ticket number and title weigh most, then description, then comment text
+PG_DOCUMENT = """
+    setweight(to_tsvector('english', coalesce(t.ticket_number, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(t.title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(t.description, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(
+        (SELECT string_agg(c.comment, ' ') FROM ticket_comments c WHERE c.ticket_id = t.id), ''
+    )), 'C')
+"""
+
+# SQLite fallback: FTS5 table whose rowid is the ticket id
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS ticket_search_fts USING fts5(
+        ticket_number, title, description, comments, tokenize = 'porter unicode61'
+    )""",
+]
+
+SQLITE_DOCUMENT = """
+    SELECT t.id, t.ticket_number, t.title, t.description,
+           coalesce((SELECT group_concat(c.comment, ' ') FROM ticket_comments c WHERE c.ticket_id = t.id), '')
+    FROM tickets t
+"""
+
+# bm25 column weights, in FTS5 column order
+SQLITE_WEIGHTS = '10.0, 10.0, 4.0, 1.0'
+
+
+def _dialect():
+    from app import db
+    return db.engine.dialect.name
+
+
+def _terms(search_text):
+    """Split user input into plain word tokens; all query syntax is discarded"""
+    return re.findall(r'\w+', search_text or '')
+
+
+def ensure_search_index():
+    """Create the search table for this database and backfill it if it is empty"""
+    from app import db
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        statements, table = PG_SCHEMA, 'ticket_search'
+    elif dialect == 'sqlite':
+        statements, table = SQLITE_SCHEMA, 'ticket_search_fts'
+    else:
+        return
+
+    with db.engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+        empty = conn.execute(text(f'SELECT 1 FROM {table} LIMIT 1')).first() is None
+        has_tickets = conn.execute(text('SELECT 1 FROM tickets LIMIT 1')).first() is not None
+    if empty and has_tickets:
+        rebuild_search_index()
+
+
+def rebuild_search_index():
+    """Re-index every ticket in one statement. Returns the number of tickets indexed."""
+    from app import db
+
+    dialect = _dialect()
+    with db.engine.begin() as conn:
+        if dialect == 'postgresql':
+            conn.execute(text('TRUNCATE ticket_search'))
+            result = conn.execute(text(f'INSERT INTO ticket_search (ticket_id, document) SELECT t.id, {PG_DOCUMENT} FROM tickets t'))
+        elif dialect == 'sqlite':
+            conn.execute(text('DELETE FROM ticket_search_fts'))
+            result = conn.execute(text(
+                f'INSERT INTO ticket_search_fts (rowid, ticket_number, title, description, comments) {SQLITE_DOCUMENT}'
+            ))
+        else:
+            return 0
+    logging.info(f"Search index rebuilt for {result.rowcount} tickets")
+    return result.rowcount
+
+
+def index_ticket(ticket_id):
+    """Refresh one ticket's search document inside the current transaction"""
+    index_tickets([ticket_id])
+
+
+def index_tickets(ticket_ids, batch_size=1000):
+    """Refresh the search documents of many tickets inside the current transaction"""
+    from app import db
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        statements = [text(f"""
+            INSERT INTO ticket_search (ticket_id, document)
+            SELECT t.id, {PG_DOCUMENT} FROM tickets t WHERE t.id IN :ticket_ids
+            ON CONFLICT (ticket_id) DO UPDATE SET document = EXCLUDED.document
+        """)]
+    elif dialect == 'sqlite':
+        statements = [
+            text('DELETE FROM ticket_search_fts WHERE rowid IN :ticket_ids'),
+            text(f'INSERT INTO ticket_search_fts (rowid, ticket_number, title, description, comments) {SQLITE_DOCUMENT} WHERE t.id IN :ticket_ids'),
+        ]
+    else:
+        return
+
+    ticket_ids = list(ticket_ids)
+    for start in range(0, len(ticket_ids), batch_size):
+        chunk = ticket_ids[start:start + batch_size]
+        for statement in statements:
+            db.session.execute(statement.bindparams(bindparam('ticket_ids', expanding=True)), {'ticket_ids': chunk})
+
+
+def search_tickets(query, search_text):
+    """Restrict a Ticket query to matches for search_text, best matches first"""
+    from models import Ticket
+
+    terms = _terms(search_text)
+    if not terms:
+        return query.order_by(Ticket.created_at.desc())
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        # Every term must match; the last one may be a prefix of a longer word
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        matches = text("""
+            SELECT s.ticket_id, ts_rank_cd(s.document, q) AS rank
+            FROM ticket_search s, to_tsquery('english', :tsquery) q
+            WHERE s.document @@ q
+        """).bindparams(tsquery=tsquery).columns(ticket_id=Integer, rank=Float).subquery('matches')
+    elif dialect == 'sqlite':
+        # Same rule as PostgreSQL: whole words, then a prefix
+        fts_query = ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        matches = text(f"""
+            SELECT rowid AS ticket_id, -bm25(ticket_search_fts, {SQLITE_WEIGHTS}) AS rank
+            FROM ticket_search_fts
+            WHERE ticket_search_fts MATCH :fts_query
+        """).bindparams(fts_query=fts_query).columns(ticket_id=Integer, rank=Float).subquery('matches')
+    else:
+        pattern = f'%{search_text}%'
+        return query.filter(or_(
+            Ticket.ticket_number.ilike(pattern),
+            Ticket.title.ilike(pattern),
+            Ticket.description.ilike(pattern)
+        )).order_by(Ticket.created_at.desc())
+
+    return query.join(matches, Ticket.id == matches.c.ticket_id).order_by(
+        matches.c.rank.desc(), Ticket.created_at.desc()
+    )
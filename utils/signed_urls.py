@@ -0,0 +1,49 @@
+import os
+import time
+from types import SimpleNamespace
+from flask import current_app, session, url_for
+from itsdangerous import BadSignature, URLSafeSerializer
+
+# Signed file links stay valid for at least this many seconds after a page is rendered (at most twice as long),
+# but only while the session's identity snapshot is current, so account changes revoke them at once
+SIGNED_URL_TTL = int(os.environ.get('SIGNED_URL_TTL', '3600'))
+SIGNED_URL_SALT = 'signed-file-url'
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.secret_key, salt=SIGNED_URL_SALT)
+
+
+def signed_file_url(attachment, mode='download', user_id=None, now=None):
+    """Signed URL letting user_id (default: the session user) fetch an attachment without loading any rows.
+
+    mode is 'download', 'inline' or a preview size in pixels. Only call this
+    for attachments the user has already been authorized to see.
+    """
+    if user_id is None:
+        user_id = session.get('user_id')
+    # Expiry rounded up to a TTL boundary, so pages rendered within one window
+    # share URLs and the browser cache keeps working across page loads
+    expires = (int(now or time.time()) // SIGNED_URL_TTL + 2) * SIGNED_URL_TTL
+    name = attachment.original_name or attachment.filename
+    token = _serializer().dumps([user_id, expires, attachment.sha256, attachment.filename, name, mode])
+    return url_for('signed_file', token=token, name=name)
+
+
+def read_file_url(token):
+    """The grant carried by a signed URL token, or None if it was not signed by us"""
+    try:
+        user_id, expires, sha256, filename, name, mode = _serializer().loads(token)
+    except (BadSignature, TypeError, ValueError):
+        return None
+    return SimpleNamespace(user_id=user_id, expires=expires, expired=expires < time.time(),
+                           sha256=sha256, filename=filename, name=name, mode=mode)
+
+
+def fallback_url(grant):
+    """The regular (database-checked) route serving the same file"""
+    if grant.mode == 'download':
+        return url_for('download_attachment', filename=grant.filename)
+    if isinstance(grant.mode, int):
+        return url_for('view_image_preview', size=grant.mode, filename=grant.filename)
+    return url_for('view_image', filename=grant.filename)
@@ -0,0 +1,155 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+# Idle authenticated connections kept per SMTP account in each worker process
+# (at least EMAIL_SEND_CONCURRENCY, so every concurrent sending lane can reuse one)
+SMTP_POOL_SIZE = int(os.environ.get('SMTP_POOL_SIZE', '4'))
+# Idle connections older than this are closed rather than reused (servers drop idle clients)
+SMTP_MAX_IDLE = int(os.environ.get('SMTP_MAX_IDLE', '60'))
+# Connections idle for longer than this are checked with NOOP before reuse
+SMTP_NOOP_AFTER = 5
+# Reconnect after this many messages so one connection never hits a server's per-session limit
+SMTP_MAX_MESSAGES = int(os.environ.get('SMTP_MAX_MESSAGES', '100'))
+SMTP_TIMEOUT = 30
+
+
+def _settings_key(settings):
+    return (settings['smtp_server'], settings['smtp_port'], settings['smtp_username'],
+            settings['smtp_password'], bool(settings['use_tls']))
+
+
+class SMTPConnection:
+    """An authenticated smtplib connection with the bookkeeping the pool needs"""
+
+    def __init__(self, settings):
+        self.server = smtplib.SMTP(settings['smtp_server'], settings['smtp_port'], timeout=SMTP_TIMEOUT)
+        try:
+            if settings['use_tls']:
+                self.server.starttls()
+            if settings['smtp_username']:
+                self.server.login(settings['smtp_username'], settings['smtp_password'])
+        except Exception:
+            self.close()
+            raise
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+        logging.info(f"SMTP connection opened to {settings['smtp_server']}:{settings['smtp_port']}")
+
+    def is_usable(self):
+        """True if the connection can be reused, probing it with NOOP when it has been idle"""
+        idle = time.monotonic() - self.last_used
+        if idle > SMTP_MAX_IDLE or self.messages_sent >= SMTP_MAX_MESSAGES:
+            return False
+        if idle < SMTP_NOOP_AFTER:
+            return True
+        try:
+            return self.server.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def close(self):
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+
+
+class SMTPSession:
+    """Sends any number of messages over one pooled connection, reconnecting if the server hangs up"""
+
+    def __init__(self, pool, settings):
+        self.pool = pool
+        self.settings = settings
+        self.connection = pool.acquire(settings)
+
+    def sendmail(self, from_addr, to_addrs, message):
+        try:
+            result = self.connection.server.sendmail(from_addr, to_addrs, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped us (idle timeout, restart): one retry on a fresh connection
+            logging.warning("SMTP server disconnected, reconnecting")
+            self.connection.close()
+            self.connection = SMTPConnection(self.settings)
+            result = self.connection.server.sendmail(from_addr, to_addrs, message)
+        self.connection.messages_sent += 1
+        self.connection.last_used = time.monotonic()
+        return result
+
+
+class SMTPPool:
+    """Per-process pool of authenticated SMTP connections, keyed by account settings"""
+
+    def __init__(self, size=SMTP_POOL_SIZE):
+        self.size = size
+        self.lock = threading.Lock()
+        self.idle = {}
+        self.pid = os.getpid()
+
+    def _check_pid(self):
+        # Sockets inherited across a fork are shared with the parent; never reuse them
+        if self.pid != os.getpid():
+            self.idle = {}
+            self.pid = os.getpid()
+
+    def acquire(self, settings):
+        key = _settings_key(settings)
+        while True:
+            with self.lock:
+                self._check_pid()
+                connections = self.idle.get(key)
+                connection = connections.pop() if connections else None
+            if connection is None:
+                return SMTPConnection(settings)
+            if connection.is_usable():
+                return connection
+            connection.close()
+
+    def release(self, settings, connection):
+        key = _settings_key(settings)
+        with self.lock:
+            self._check_pid()
+            connections = self.idle.setdefault(key, [])
+            if len(connections) < self.size:
+                connections.append(connection)
+                return
+        connection.close()
+
+    def clear(self):
+        """Close every idle connection (e.g. after the email settings change)"""
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    @contextmanager
+    def session(self, settings):
+        session = SMTPSession(self, settings)
+        try:
+            yield session
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # Per-message rejections leave the connection in a clean state
+            self.release(settings, session.connection)
+            raise
+        except Exception:
+            session.connection.close()
+            raise
+        else:
+            self.release(settings, session.connection)
+
+
+_pool = SMTPPool()
+
+
+def smtp_session(settings):
+    """Context manager yielding a session that sends over a pooled, authenticated connection"""
+    return _pool.session(settings)
+
+
+def close_smtp_connections():
+    """Close this worker's idle SMTP connections"""
+    _pool.clear()
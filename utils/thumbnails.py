@@ -0,0 +1,86 @@
+import logging
+import os
+import tempfile
+from PIL import Image, ImageOps, features
+
+from utils.file_store import UPLOAD_FOLDER, object_path
+
+THUMBNAIL_FOLDER = os.path.join(UPLOAD_FOLDER, 'thumbnails')
+# Longest edge, in pixels, of the renditions templates may ask for
+THUMBNAIL_SIZES = {160, 800}
+THUMBNAIL_QUALITY = 80
+# Renditions are immutable (keyed by content hash), so browsers may keep them for a year
+CACHE_MAX_AGE = 365 * 24 * 3600
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+
+def thumbnail_format():
+    """(Pillow format, extension, mimetype) of the renditions: WebP where Pillow supports it"""
+    if features.check('webp'):
+        return 'WEBP', 'webp', 'image/webp'
+    return 'JPEG', 'jpg', 'image/jpeg'
+
+
+def thumbnail_path(sha256, size, extension):
+    return os.path.join(THUMBNAIL_FOLDER, sha256[:2], f'{sha256}-{size}.{extension}')
+
+
+def _render(source_path, target_path, size, image_format):
+    with Image.open(source_path) as image:
+        # Let the JPEG decoder downscale while decoding instead of loading every pixel
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size))
+        if image_format == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGB' if image_format == 'JPEG' else 'RGBA')
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), prefix='.thumb-')
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                image.save(temp, image_format, quality=THUMBNAIL_QUALITY)
+            os.replace(temp_path, target_path)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+
+def get_thumbnail(sha256, filename, size):
+    """(path, mimetype, etag) of a cached rendition, rendering it on first use.
+
+    Returns None when no rendition can be made (a legacy file outside the
+    store, or an unreadable image); callers serve the original instead.
+    """
+    if not sha256 or size not in THUMBNAIL_SIZES:
+        return None
+    if not filename.lower().endswith(IMAGE_EXTENSIONS):
+        return None
+
+    image_format, extension, mimetype = thumbnail_format()
+    path = thumbnail_path(sha256, size, extension)
+    if not os.path.exists(path):
+        try:
+            _render(object_path(sha256), path, size, image_format)
+        except Exception as e:
+            logging.warning(f"Could not render {size}px thumbnail of {filename}: {e}")
+            return None
+    return os.path.abspath(path), mimetype, f'{sha256}-{size}.{extension}'
+
+
+def remove_thumbnails(sha256):
+    """Delete every cached rendition of some stored content"""
+    folder = os.path.join(THUMBNAIL_FOLDER, sha256[:2])
+    if not os.path.isdir(folder):
+        return
+    for name in os.listdir(folder):
+        if name.startswith(f'{sha256}-'):
+            os.remove(os.path.join(folder, name))
+
+
+def cache_response(response):
+    """Mark a response for content-addressed (immutable), per-user data as cacheable for a long time"""
+    response.cache_control.no_cache = None  # set by send_file() when no max age is configured
+    response.cache_control.private = True
+    response.cache_control.max_age = CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
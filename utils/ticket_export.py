@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+EXPORT_BATCH_SIZE = 1000
+
+# Exported fields in output order; timestamps are naive UTC written as ISO 8601
+EXPORT_FIELDS = [
+    'id', 'ticket_number', 'title', 'description', 'category', 'priority', 'status',
+    'user_id', 'user_name', 'department', 'assigned_to', 'assignee_name',
+    'created_at', 'updated_at', 'resolved_at',
+]
+
+
+def _filter_value(value):
+    """Treat blank and 'all' filter values as no filter"""
+    return value if value and value.lower() != 'all' else None
+
+
+def ticket_export_statement(window=None, status=None, category=None, priority=None):
+    """Column-only select for the machine-readable ticket exports, oldest first"""
+    from models import Ticket, User
+    from utils.date_windows import apply_date_window
+
+    raiser = aliased(User)
+    assignee = aliased(User)
+    stmt = select(
+        Ticket.id, Ticket.ticket_number, Ticket.title, Ticket.description,
+        Ticket.category, Ticket.priority, Ticket.status,
+        Ticket.user_id, Ticket.user_name, raiser.department.label('department'),
+        Ticket.assigned_to, assignee.first_name, assignee.last_name,
+        Ticket.created_at, Ticket.updated_at, Ticket.resolved_at
+    ).join(raiser, Ticket.user_id == raiser.id).outerjoin(assignee, Ticket.assigned_to == assignee.id)
+
+    stmt = apply_date_window(stmt, Ticket.created_at, window)
+    for column, value in ((Ticket.status, status), (Ticket.category, category), (Ticket.priority, priority)):
+        value = _filter_value(value)
+        if value:
+            stmt = stmt.filter(column == value)
+    return stmt.order_by(Ticket.created_at, Ticket.id)
+
+
+def _export_record(row):
+    record = {}
+    for name in EXPORT_FIELDS:
+        if name == 'assignee_name':
+            value = f"{row.first_name} {row.last_name}" if row.assigned_to else None
+        else:
+            value = getattr(row, name)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        record[name] = value
+    return record
+
+
+def iter_export_batches(stmt, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of export records read from a server-side cursor"""
+    from app import db
+
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    try:
+        for batch in result.partitions():
+            yield [_export_record(row) for row in batch]
+    finally:
+        result.close()
+
+
+def csv_stream(batches):
+    """CSV text chunks: the header, then one chunk per batch"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator='\n')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def ndjson_stream(batches):
+    """Newline-delimited JSON chunks, one chunk per batch"""
+    for batch in batches:
+        yield ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in batch)
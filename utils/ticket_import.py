@@ -0,0 +1,285 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+import openpyxl
+from utils.excel_export import COLUMNS, HEADER_ROWS
+
+IMPORT_BATCH_SIZE = 1000
+
+# Accepted date formats for the Originating/Issue clearance date columns
+DATE_FORMATS = ('%d.%m.%Y', '%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%y')
+
+UNASSIGNED_NAMES = {'', 'unassigned', 'n/a', '-'}
+PENDING_VALUES = {'', 'pending', 'n/a', '-'}
+FOOTER_MARKERS = {'prepared by', 'name', 'designation', 'signature'}
+
+
+@dataclass
+class ImportReport:
+    """Outcome of an R05 import (or of a dry run)"""
+    dry_run: bool = True
+    rows_read: int = 0
+    imported: int = 0
+    duplicates: int = 0
+    rejected: list = field(default_factory=list)   # (row number, reason)
+    warnings: list = field(default_factory=list)   # (row number, message)
+
+    @property
+    def accepted(self):
+        return self.rows_read - len(self.rejected) - self.duplicates
+
+
+def _normalise_name(name):
+    return re.sub(r'\s+', ' ', str(name or '')).strip().lower()
+
+
+def _strip_prefix(value, prefix):
+    """'Status: Open' -> 'Open' (the export adds these prefixes)"""
+    value = str(value or '').strip()
+    if value.lower().startswith(prefix.lower()):
+        value = value[len(prefix):].strip()
+    return value
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if hasattr(value, 'year') and hasattr(value, 'month'):
+        return datetime(value.year, value.month, value.day)
+    text = str(value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+class UserIndex:
+    """In-memory lookup of users by full name (and department, to break ties)"""
+
+    def __init__(self):
+        from app import db
+        from models import User
+
+        self.by_name = {}
+        rows = db.session.query(User.id, User.first_name, User.last_name, User.department).all()
+        for user_id, first_name, last_name, department in rows:
+            self.by_name.setdefault(_normalise_name(f"{first_name} {last_name}"), []).append((user_id, department))
+
+    def resolve(self, name, department=None):
+        """Return (user_id, department, error)"""
+        matches = self.by_name.get(_normalise_name(name), [])
+        if len(matches) > 1 and department:
+            matches = [m for m in matches if _normalise_name(m[1]) == _normalise_name(department)] or matches
+        if len(matches) == 1:
+            return matches[0][0], matches[0][1], None
+        if matches:
+            return None, None, f"'{name}' matches {len(matches)} users"
+        return None, None, f"no user named '{name}'"
+
+
+def _choice_index(names):
+    return {name.lower(): name for name in names}
+
+
+def _master_data_indexes():
+    from models import MasterDataCategory, MasterDataPriority, MasterDataStatus
+    return (
+        _choice_index(c.name for c in MasterDataCategory.query.all()),
+        _choice_index(p.name for p in MasterDataPriority.query.all()),
+        _choice_index(s.name for s in MasterDataStatus.query.all()),
+    )
+
+
+def _cell(values, name):
+    index = COLUMNS[name] - 1
+    return values[index] if index < len(values) else None
+
+
+def read_r05_rows(source):
+    """Yield (row number, cell values) for the data rows of an R05 workbook, streaming"""
+    wb = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        # An explicit max_col stops openpyxl scanning the whole sheet to size it first
+        rows = ws.iter_rows(min_row=HEADER_ROWS + 1, max_col=max(COLUMNS.values()), values_only=True)
+        for row_number, values in enumerate(rows, HEADER_ROWS + 1):
+            first = _normalise_name(values[0] if values else '')
+            if first in FOOTER_MARKERS:
+                break
+            if not any(v not in (None, '') for v in values):
+                continue
+            yield row_number, values
+    finally:
+        wb.close()
+
+
+def _parse_row(row_number, values, users, categories, priorities, statuses, default_user, report):
+    """Map one register row back to Ticket column values, or record why it is rejected"""
+    title = str(_cell(values, 'title') or '').strip()
+    if not title:
+        return None, 'missing Issue'
+    description = str(_cell(values, 'description') or '').strip() or title
+
+    category = categories.get(str(_cell(values, 'category') or '').strip().lower())
+    if not category:
+        return None, f"unknown Issue Type '{_cell(values, 'category')}'"
+    priority = priorities.get(_strip_prefix(_cell(values, 'priority'), 'Priority:').lower())
+    if not priority:
+        return None, f"unknown priority '{_cell(values, 'priority')}'"
+    status = statuses.get(_strip_prefix(_cell(values, 'status'), 'Status:').lower())
+    if not status:
+        return None, f"unknown status '{_cell(values, 'status')}'"
+
+    created = _parse_date(_cell(values, 'created'))
+    if not created:
+        return None, f"invalid Originating Date '{_cell(values, 'created')}'"
+    resolved_value = _cell(values, 'resolved')
+    resolved = None
+    if str(resolved_value or '').strip().lower() not in PENDING_VALUES:
+        resolved = _parse_date(resolved_value)
+        if not resolved:
+            return None, f"invalid Issue clearance date '{resolved_value}'"
+
+    raised_by = str(_cell(values, 'raised_by') or '').strip()
+    if not raised_by:
+        return None, 'missing Raised By'
+    sheet_department = str(_cell(values, 'department') or '').strip()
+    user_id, department, error = users.resolve(raised_by, sheet_department)
+    if user_id is None:
+        if default_user is None:
+            return None, error
+        user_id, department = default_user
+        report.warnings.append((row_number, f"{error}; attributed to the importing user"))
+
+    cleared_by = str(_cell(values, 'cleared_by') or '').strip()
+    assigned_to = None
+    if cleared_by.lower() not in UNASSIGNED_NAMES:
+        assigned_to, _, error = users.resolve(cleared_by)
+        if assigned_to is None:
+            report.warnings.append((row_number, f"Issue Cleared By: {error}; left unassigned"))
+
+    return {
+        'title': title[:200],
+        'description': description,
+        'category': category,
+        'priority': priority,
+        'status': status,
+        'user_id': user_id,
+        'user_name': raised_by[:100],
+        'assigned_to': assigned_to,
+        'created_local': created,
+        'resolved_local': resolved,
+        'department': department,
+    }, None
+
+
+def import_r05_workbook(source, dry_run=True, default_user_id=None):
+    """Import tickets from an R05 complaint register (path or file object).
+
+    Rows are validated against master data and resolved to users by name;
+    rows whose raiser is unknown are rejected unless default_user_id is
+    given. Rows already present (same raiser, title and creation time) are
+    skipped. With dry_run nothing is written and the report lists what
+    would happen.
+    """
+    from app import db
+    from models import Ticket, User
+    from utils.search import index_tickets
+    from utils.ticket_numbers import allocate_ticket_numbers
+    from utils.ticket_rollup import record_ticket_change
+    from utils.timezone import local_to_utc_many
+
+    report = ImportReport(dry_run=dry_run)
+    users = UserIndex()
+    categories, priorities, statuses = _master_data_indexes()
+    default_user = None
+    if default_user_id:
+        default_user = (default_user_id, db.session.get(User, default_user_id).department)
+
+    parsed = []
+    for row_number, values in read_r05_rows(source):
+        report.rows_read += 1
+        record, error = _parse_row(row_number, values, users, categories, priorities, statuses, default_user, report)
+        if error:
+            report.rejected.append((row_number, error))
+        else:
+            parsed.append(record)
+
+    # Register dates are whole days, so convert each distinct date once
+    local_dates = sorted({r['created_local'] for r in parsed} | {r['resolved_local'] for r in parsed if r['resolved_local']})
+    to_utc = dict(zip(local_dates, local_to_utc_many(local_dates)))
+    created_utc = [to_utc[r['created_local']] for r in parsed]
+    resolved_utc = [to_utc.get(r['resolved_local']) for r in parsed]
+
+    # Skip rows that are already in the database or repeated within the file
+    seen = set()
+    if created_utc:
+        existing = db.session.query(Ticket.user_name, Ticket.title, Ticket.created_at).filter(
+            Ticket.created_at >= min(created_utc), Ticket.created_at <= max(created_utc)
+        )
+        seen = {(_normalise_name(name), title, created_at) for name, title, created_at in existing}
+
+    now = datetime.utcnow()
+    rows, rollup = [], {}
+    for record, created_at, resolved_at in zip(parsed, created_utc, resolved_utc):
+        key = (_normalise_name(record['user_name']), record['title'], created_at)
+        if key in seen:
+            report.duplicates += 1
+            continue
+        seen.add(key)
+        rows.append({
+            'title': record['title'],
+            'description': record['description'],
+            'category': record['category'],
+            'priority': record['priority'],
+            'status': record['status'],
+            'user_id': record['user_id'],
+            'user_name': record['user_name'],
+            'assigned_to': record['assigned_to'],
+            'created_at': created_at,
+            'updated_at': resolved_at or created_at or now,
+            'resolved_at': resolved_at,
+        })
+        rollup_key = (created_at.date(), record['category'], record['priority'], record['status'], record['department'] or '')
+        rollup[rollup_key] = rollup.get(rollup_key, 0) + 1
+
+    if dry_run or not rows:
+        report.imported = 0 if dry_run else len(rows)
+        logging.info(f"R05 import {'dry run' if dry_run else 'run'}: {report.rows_read} rows read, "
+                     f"{len(rows)} importable, {len(report.rejected)} rejected, {report.duplicates} duplicates")
+        return report
+
+    try:
+        for row, ticket_number in zip(rows, allocate_ticket_numbers(len(rows))):
+            row['ticket_number'] = ticket_number
+        tickets = Ticket.__table__
+        for start in range(0, len(rows), IMPORT_BATCH_SIZE):
+            db.session.execute(tickets.insert(), rows[start:start + IMPORT_BATCH_SIZE])
+        for rollup_key, count in rollup.items():
+            record_ticket_change(None, rollup_key, count=count)
+        index_tickets(_ids_for_numbers([row['ticket_number'] for row in rows]))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"R05 import failed: {e}")
+        raise
+
+    report.imported = len(rows)
+    logging.info(f"R05 import: {report.imported} tickets imported, {len(report.rejected)} rejected, "
+                 f"{report.duplicates} duplicates")
+    return report
+
+
+def _ids_for_numbers(ticket_numbers):
+    """Ticket ids for a list of ticket numbers, looked up in chunks"""
+    from app import db
+    from models import Ticket
+
+    ids = []
+    for start in range(0, len(ticket_numbers), IMPORT_BATCH_SIZE):
+        chunk = ticket_numbers[start:start + IMPORT_BATCH_SIZE]
+        ids.extend(ticket_id for (ticket_id,) in db.session.query(Ticket.id).filter(Ticket.ticket_number.in_(chunk)))
+    return ids
@@ -0,0 +1,113 @@
+import logging
+from sqlalchemy import text, func, cast, Integer
+
+TICKET_NUMBER_PREFIX = 'GTN-'
+TICKET_NUMBER_SEQUENCE = 'ticket_number_seq'
+TICKET_NUMBER_COUNTER = 'ticket_number'
+
+
+def format_ticket_number(value):
+    return f"{TICKET_NUMBER_PREFIX}{value:06d}"
+
+
+def _highest_existing_number(conn):
+    """Largest numeric suffix among existing GTN-nnnnnn ticket numbers"""
+    from models import Ticket
+
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(text(
+            "SELECT coalesce(max(substring(ticket_number from 5)::bigint), 0) FROM tickets "
+            "WHERE ticket_number ~ '^GTN-[0-9]+$'"
+        )).scalar() or 0
+    suffix = func.substr(Ticket.ticket_number, len(TICKET_NUMBER_PREFIX) + 1)
+    return conn.execute(
+        Ticket.__table__.select().with_only_columns(func.max(cast(suffix, Integer)))
+        .where(Ticket.ticket_number.like(f'{TICKET_NUMBER_PREFIX}%'))
+    ).scalar() or 0
+
+
+def ensure_ticket_number_allocator():
+    """Create the sequence/counter row and move it past any ticket numbers already issued"""
+    from app import db
+    from models import TicketCounter
+
+    with db.engine.begin() as conn:
+        highest = _highest_existing_number(conn)
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f'CREATE SEQUENCE IF NOT EXISTS {TICKET_NUMBER_SEQUENCE}'))
+            # Only ever move the sequence forward, so restarts never reissue numbers
+            conn.execute(text(f"""
+                SELECT setval('{TICKET_NUMBER_SEQUENCE}', :highest)
+                WHERE :highest > (
+                    SELECT CASE WHEN is_called THEN last_value ELSE last_value - 1 END FROM {TICKET_NUMBER_SEQUENCE}
+                )
+            """), {'highest': highest})
+        else:
+            counters = TicketCounter.__table__
+            row = conn.execute(counters.select().where(counters.c.name == TICKET_NUMBER_COUNTER)).first()
+            if row is None:
+                conn.execute(counters.insert().values(name=TICKET_NUMBER_COUNTER, value=highest))
+            elif row.value < highest:
+                conn.execute(counters.update().where(counters.c.name == TICKET_NUMBER_COUNTER).values(value=highest))
+
+
+def assign_ticket_number(ticket):
+    """Give a new ticket its GTN number inside the current transaction.
+
+    On PostgreSQL the number is drawn from a sequence (never reissued, even
+    if the transaction rolls back). Elsewhere a counter row is incremented; the
+    UPDATE holds the row (SQLite: database) write lock until commit, so
+    concurrent workers cannot draw the same value.
+    """
+    from app import db
+    from models import TicketCounter
+
+    if db.engine.dialect.name == 'postgresql':
+        # Formatted here rather than with lpad(), which would truncate numbers past six digits
+        value = db.session.execute(text(f"SELECT nextval('{TICKET_NUMBER_SEQUENCE}')")).scalar()
+        ticket.ticket_number = format_ticket_number(value)
+        return
+
+    counters = TicketCounter.__table__
+    result = db.session.execute(
+        counters.update().where(counters.c.name == TICKET_NUMBER_COUNTER).values(value=counters.c.value + 1)
+    )
+    if result.rowcount == 0:
+        logging.warning("Ticket number counter missing, initialising it")
+        ensure_ticket_number_allocator()
+        db.session.execute(
+            counters.update().where(counters.c.name == TICKET_NUMBER_COUNTER).values(value=counters.c.value + 1)
+        )
+    value = db.session.execute(
+        counters.select().with_only_columns(counters.c.value).where(counters.c.name == TICKET_NUMBER_COUNTER)
+    ).scalar()
+    ticket.ticket_number = format_ticket_number(value)
+
+
+def allocate_ticket_numbers(count):
+    """Reserve count GTN numbers, in ascending order, inside the current transaction (bulk imports)"""
+    from app import db
+    from models import TicketCounter
+
+    if count <= 0:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        values = db.session.execute(
+            text(f"SELECT nextval('{TICKET_NUMBER_SEQUENCE}') FROM generate_series(1, :count)"), {'count': count}
+        ).scalars().all()
+        return [format_ticket_number(value) for value in sorted(values)]
+
+    counters = TicketCounter.__table__
+    result = db.session.execute(
+        counters.update().where(counters.c.name == TICKET_NUMBER_COUNTER).values(value=counters.c.value + count)
+    )
+    if result.rowcount == 0:
+        logging.warning("Ticket number counter missing, initialising it")
+        ensure_ticket_number_allocator()
+        db.session.execute(
+            counters.update().where(counters.c.name == TICKET_NUMBER_COUNTER).values(value=counters.c.value + count)
+        )
+    last = db.session.execute(
+        counters.select().with_only_columns(counters.c.value).where(counters.c.name == TICKET_NUMBER_COUNTER)
+    ).scalar()
+    return [format_ticket_number(value) for value in range(last - count + 1, last + 1)]
@@ -0,0 +1,154 @@
+from datetime import datetime, date
+from sqlalchemy import func
+import logging
+
+
+def ticket_rollup_key(ticket, department=None):
+    """Return the ticket_daily_stats key a ticket currently counts towards"""
+    created_at = ticket.created_at or datetime.utcnow()
+    if department is None:
+        department = ticket.user.department if ticket.user else None
+    return (created_at.date(), ticket.category, ticket.priority, ticket.status, department or '')
+
+
+def _upsert_rollup(key, delta):
+    """Add delta to one rollup row inside the current transaction"""
+    from app import db
+    from models import TicketDailyStats
+
+    day, category, priority, status, department = key
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(TicketDailyStats).values(
+            day=day, category=category, priority=priority, status=status,
+            department=department, ticket_count=delta, updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'category', 'priority', 'status', 'department'],
+            set_={
+                'ticket_count': TicketDailyStats.ticket_count + delta,
+                'updated_at': datetime.utcnow()
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    # Other databases: read-modify-write within the caller's transaction
+    row = TicketDailyStats.query.filter_by(
+        day=day, category=category, priority=priority, status=status, department=department
+    ).with_for_update().first()
+    if row:
+        row.ticket_count += delta
+    else:
+        db.session.add(TicketDailyStats(
+            day=day, category=category, priority=priority, status=status,
+            department=department, ticket_count=delta
+        ))
+
+
+def record_ticket_change(old_key, new_key, count=1):
+    """Move count tickets from old_key to new_key; either key may be None.
+
+    Call before committing so the rollup changes land in the same transaction
+    as the ticket change itself.
+    """
+    if old_key == new_key:
+        return
+    if old_key is not None:
+        _upsert_rollup(old_key, -count)
+    if new_key is not None:
+        _upsert_rollup(new_key, count)
+
+
+def record_user_department_change(user_id, old_department, new_department):
+    """Move all tickets created by a user to a different department bucket"""
+    from app import db
+    from models import Ticket
+
+    old_department = old_department or ''
+    new_department = new_department or ''
+    if old_department == new_department:
+        return
+
+    rows = db.session.query(
+        func.date(Ticket.created_at),
+        Ticket.category,
+        Ticket.priority,
+        Ticket.status,
+        func.count(Ticket.id)
+    ).filter(Ticket.user_id == user_id).group_by(
+        func.date(Ticket.created_at), Ticket.category, Ticket.priority, Ticket.status
+    ).all()
+
+    for day, category, priority, status, count in rows:
+        day = _as_date(day)
+        record_ticket_change(
+            (day, category, priority, status, old_department),
+            (day, category, priority, status, new_department),
+            count
+        )
+
+
+def _as_date(value):
+    """Normalize func.date() results, which SQLite returns as strings"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def rebuild_ticket_rollup():
+    """Recompute ticket_daily_stats from the tickets table. Returns the row count."""
+    from app import db
+    from models import Ticket, User, TicketDailyStats
+
+    day_expr = func.date(Ticket.created_at)
+    rows = db.session.query(
+        day_expr,
+        Ticket.category,
+        Ticket.priority,
+        Ticket.status,
+        User.department,
+        func.count(Ticket.id)
+    ).outerjoin(User, Ticket.user_id == User.id).group_by(
+        day_expr, Ticket.category, Ticket.priority, Ticket.status, User.department
+    ).all()
+
+    # Departments '' and NULL share a bucket, so merge before inserting
+    totals = {}
+    for day, category, priority, status, department, count in rows:
+        key = (_as_date(day), category, priority, status, department or '')
+        totals[key] = totals.get(key, 0) + count
+
+    try:
+        TicketDailyStats.query.delete()
+        now = datetime.utcnow()
+        if totals:
+            db.session.execute(TicketDailyStats.__table__.insert(), [
+                {
+                    'day': day, 'category': category, 'priority': priority, 'status': status,
+                    'department': department, 'ticket_count': count, 'updated_at': now
+                }
+                for (day, category, priority, status, department), count in totals.items()
+            ])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error rebuilding ticket rollup: {e}")
+        raise
+
+    logging.info(f"Ticket rollup rebuilt with {len(totals)} rows")
+    return len(totals)
+
+
+def ensure_ticket_rollup():
+    """Build the rollup once if it is empty but tickets already exist"""
+    from models import Ticket, TicketDailyStats
+
+    if TicketDailyStats.query.first() is None and Ticket.query.first() is not None:
+        rebuild_ticket_rollup()
@@ -0,0 +1,81 @@
+from dataclasses import dataclass, field
+from sqlalchemy import func
+
+
+@dataclass
+class TicketStats:
+    """Ticket counts bucketed by status, category and priority"""
+    total: int = 0
+    by_status: dict = field(default_factory=dict)
+    by_category: dict = field(default_factory=dict)
+    by_priority: dict = field(default_factory=dict)
+    statuses: list = field(default_factory=list)
+    categories: list = field(default_factory=list)
+    priorities: list = field(default_factory=list)
+
+    def status_count(self, name):
+        return self.by_status.get(name, 0)
+
+    def category_count(self, name):
+        return self.by_category.get(name, 0)
+
+    def priority_count(self, name):
+        return self.by_priority.get(name, 0)
+
+    def as_dict(self):
+        """Flat stats dict of the total and workflow status counts; per-category/priority counts come from chart_data()"""
+        return {
+            'total_tickets': self.total,
+            'open_tickets': self.status_count('Open'),
+            'in_progress_tickets': self.status_count('In Progress'),
+            'resolved_tickets': self.status_count('Resolved'),
+            'closed_tickets': self.status_count('Closed'),
+        }
+
+    def chart_data(self):
+        """Labels and counts for the reports dashboard charts"""
+        return {
+            'status_labels': list(self.statuses),
+            'status': [self.status_count(name) for name in self.statuses],
+            'category_labels': list(self.categories),
+            'category': [self.category_count(name) for name in self.categories],
+            'priority_labels': list(self.priorities),
+            'priority': [self.priority_count(name) for name in self.priorities],
+        }
+
+
+def _bucket_names(configured, counts):
+    """Configured master data names followed by any extra names found in tickets"""
+    names = list(configured)
+    names.extend(sorted(name for name in counts if name not in names))
+    return names
+
+
+def get_ticket_stats():
+    """Compute all dashboard ticket counts with a single grouped query over the ticket_daily_stats rollup"""
+    from app import db
+    from models import TicketDailyStats
+    from utils.master_data_cache import get_active_categories, get_active_priorities, get_active_statuses
+
+    rows = db.session.query(
+        TicketDailyStats.status,
+        TicketDailyStats.category,
+        TicketDailyStats.priority,
+        func.sum(TicketDailyStats.ticket_count)
+    ).group_by(TicketDailyStats.status, TicketDailyStats.category, TicketDailyStats.priority).all()
+
+    stats = TicketStats()
+    for status, category, priority, count in rows:
+        count = int(count or 0)
+        if not count:
+            continue
+        stats.total += count
+        stats.by_status[status] = stats.by_status.get(status, 0) + count
+        stats.by_category[category] = stats.by_category.get(category, 0) + count
+        stats.by_priority[priority] = stats.by_priority.get(priority, 0) + count
+
+    # Bucket labels come from master data so new categories/priorities/statuses show up automatically
+    stats.statuses = _bucket_names(get_active_statuses(), stats.by_status)
+    stats.categories = _bucket_names(get_active_categories(), stats.by_category)
+    stats.priorities = _bucket_names(reversed(get_active_priorities()), stats.by_priority)
+    return stats
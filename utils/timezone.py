@@ -1,5 +1,5 @@
-from datetime import timedelta
-from sqlalchemy import text
+from datetime import timedelta, timezone as fixed_timezone
+import logging
 
 try:
     import pytz
@@ -7,55 +7,99 @@ try:
 except ImportError:
     HAS_PYTZ = False
 
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:
+    ZoneInfo = None
+
+DEFAULT_TIMEZONE_NAME = 'Asia/Kolkata'
+DEFAULT_UTC_OFFSET = '+05:30'
+
 def get_timezone_settings():
-    """Get timezone settings from database"""
+    """Get (timezone_name, utc_offset) from the cached active timezone settings"""
     try:
-        from app import db
-        with db.engine.connect() as conn:
-            result = conn.execute(text("SELECT timezone_name, utc_offset FROM timezone_settings WHERE is_active = true LIMIT 1"))
-            row = result.fetchone()
-            if row:
-                return row[0], row[1]  # timezone_name, utc_offset
-    except:
-        pass
+        from models import TimezoneSettings
+        from utils.master_data_cache import get_settings_snapshot
+        settings = get_settings_snapshot(TimezoneSettings, active_only=True)
+        if settings:
+            return settings.timezone_name, settings.utc_offset
+    except Exception as e:
+        logging.warning(f"Could not load timezone settings: {e}")
     # Default to IST if no settings found
-    return 'Asia/Kolkata', '+05:30'
+    return DEFAULT_TIMEZONE_NAME, DEFAULT_UTC_OFFSET
+
+def _parse_offset(utc_offset):
+    """Fixed tzinfo for a '+HH:MM'/'-HH:MM' offset string, or None if it is malformed"""
+    try:
+        sign = -1 if utc_offset.startswith('-') else 1
+        hours, minutes = map(int, utc_offset.lstrip('+-').split(':'))
+        return fixed_timezone(sign * timedelta(hours=hours, minutes=minutes))
+    except (AttributeError, ValueError):
+        return None
+
+def resolve_timezone(timezone_name, utc_offset):
+    """tzinfo for a timezone name, falling back to the fixed offset and then IST"""
+    if timezone_name:
+        try:
+            if HAS_PYTZ:
+                return pytz.timezone(timezone_name)
+            if ZoneInfo:
+                return ZoneInfo(timezone_name)
+        except Exception:
+            logging.warning(f"Unknown timezone {timezone_name!r}, using offset {utc_offset!r}")
+    return _parse_offset(utc_offset) or _parse_offset(DEFAULT_UTC_OFFSET)
+
+def get_timezone():
+    """Configured tzinfo, resolved once and cached until the timezone settings change"""
+    from utils.master_data_cache import cached
+    try:
+        return cached('timezone', lambda: resolve_timezone(*get_timezone_settings()))
+    except RuntimeError:
+        # No app context (e.g. a plain script): resolve without the shared cache
+        return resolve_timezone(DEFAULT_TIMEZONE_NAME, DEFAULT_UTC_OFFSET)
+
+def _utc_to_local(dt, tz):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=fixed_timezone.utc)
+    return dt.astimezone(tz).replace(tzinfo=None)
+
+def _local_to_utc(dt, tz):
+    if hasattr(tz, 'localize'):
+        # pytz zones need localize() to pick the right DST offset
+        local_dt = tz.localize(dt)
+    else:
+        local_dt = dt.replace(tzinfo=tz)
+    return local_dt.astimezone(fixed_timezone.utc).replace(tzinfo=None)
 
 def utc_to_ist(dt):
     """Convert a UTC datetime to configured timezone (defaults to IST)."""
     if dt is None:
         return None
-    
-    try:
-        timezone_name, utc_offset = get_timezone_settings()
-        
-        # If we have a timezone name, use pytz for proper conversion
-        if timezone_name and HAS_PYTZ:
-            try:
-                utc_dt = dt.replace(tzinfo=pytz.UTC)
-                target_tz = pytz.timezone(timezone_name)
-                return utc_dt.astimezone(target_tz).replace(tzinfo=None)
-            except:
-                pass
-        
-        # Fallback to manual offset calculation
-        if utc_offset.startswith('+'):
-            hours, minutes = map(int, utc_offset[1:].split(':'))
-            return dt + timedelta(hours=hours, minutes=minutes)
-        elif utc_offset.startswith('-'):
-            hours, minutes = map(int, utc_offset[1:].split(':'))
-            return dt - timedelta(hours=hours, minutes=minutes)
-    except:
-        pass
-    
-    # Final fallback to IST
-    return dt + timedelta(hours=5, minutes=30)
-
-def format_datetime_for_timezone(dt):
+    return _utc_to_local(dt, get_timezone())
+
+def utc_to_local_many(datetimes):
+    """Convert an iterable of UTC datetimes (None allowed) with one timezone lookup"""
+    tz = get_timezone()
+    return [_utc_to_local(dt, tz) if dt is not None else None for dt in datetimes]
+
+def local_to_utc(dt):
+    """Convert a naive datetime in the configured timezone to naive UTC (inverse of utc_to_ist)."""
+    if dt is None:
+        return None
+    return _local_to_utc(dt, get_timezone())
+
+def local_to_utc_many(datetimes):
+    """Convert an iterable of naive local datetimes (None allowed) to UTC with one timezone lookup"""
+    tz = get_timezone()
+    return [_local_to_utc(dt, tz) if dt is not None else None for dt in datetimes]
+
+def local_range_to_utc(start, end):
+    """Convert local [start, end) boundaries to UTC with a single timezone lookup."""
+    tz = get_timezone()
+    return _local_to_utc(start, tz), _local_to_utc(end, tz)
+
+def format_datetime_for_timezone(dt, fmt='%Y-%m-%d %H:%M:%S'):
     """Format datetime according to timezone settings"""
     if dt is None:
         return ''
-    converted_dt = utc_to_ist(dt)
-    if converted_dt is None:
-        return ''
-    return converted_dt.strftime('%Y-%m-%d %H:%M:%S')
\ No newline at end of file
+    return utc_to_ist(dt).strftime(fmt)
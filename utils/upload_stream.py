@@ -0,0 +1,147 @@
+import hashlib
+import logging
+import os
+import tempfile
+from flask import Request
+
+# Largest single attached file, in bytes
+MAX_UPLOAD_FILE_SIZE = int(os.environ.get('MAX_UPLOAD_FILE_SIZE', str(25 * 1024 * 1024)))
+# Largest request body (all files and form fields together); Flask answers 413 beyond it
+MAX_UPLOAD_REQUEST_SIZE = int(os.environ.get('MAX_UPLOAD_REQUEST_SIZE', str(60 * 1024 * 1024)))
+# Bytes buffered before the content type is checked
+SNIFF_BYTES = 16
+
+OLE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'  # legacy Office (doc/xls/ppt)
+ZIP = b'PK\x03\x04'  # Office Open XML (docx/xlsx/pptx)
+# Leading bytes each allowed extension must start with (None: any text without NUL bytes)
+FILE_SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpg': (b'\xff\xd8\xff',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'bmp': (b'BM',),
+    'pdf': (b'%PDF-',),
+    'doc': (OLE,),
+    'xls': (OLE,),
+    'ppt': (OLE,),
+    'docx': (ZIP,),
+    'xlsx': (ZIP,),
+    'pptx': (ZIP,),
+    'csv': None,
+}
+
+
+def sniff_matches(filename, head):
+    """True if the first bytes of a file fit the type its extension claims"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in FILE_SIGNATURES:
+        return False
+    signatures = FILE_SIGNATURES[extension]
+    if signatures is None:
+        return b'\x00' not in head
+    return head.startswith(signatures)
+
+
+class UploadStream:
+    """Receives one uploaded file from the form parser as it arrives.
+
+    The file is size-checked, hashed and type-checked while being read, and
+    written to a temporary file inside the object store, so store() only has
+    to rename it into place. A rejected file stops being written at once; the
+    rest of its bytes are read off the request and discarded.
+    """
+
+    def __init__(self, filename, max_size=MAX_UPLOAD_FILE_SIZE):
+        self.filename = filename or ''
+        self.max_size = max_size
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+        self.error = None
+        self.file = None
+        self.temp_path = None
+
+    def _open(self):
+        from utils.file_store import OBJECT_FOLDER
+
+        os.makedirs(OBJECT_FOLDER, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=OBJECT_FOLDER, prefix='.upload-')
+        self.file = os.fdopen(fd, 'w+b')
+
+    def _reject(self, error):
+        self.error = error
+        self.head = b''
+        self._discard()
+        logging.warning(f"Upload {self.filename!r} rejected: {error}")
+
+    def _check_head(self):
+        """Decide on the content type once enough bytes (or the whole file) have arrived"""
+        if not sniff_matches(self.filename, self.head):
+            self._reject('file content does not match its type')
+            return
+        self._open()
+        self.file.write(self.head)
+        self.head = b''
+
+    def write(self, data):
+        # Nothing is kept for rejected files or empty file inputs (no filename)
+        if self.error or not self.filename:
+            return len(data)
+        self.size += len(data)
+        if self.size > self.max_size:
+            self._reject(f'file is larger than {self.max_size // (1024 * 1024)} MB')
+            return len(data)
+        self.digest.update(data)
+        if self.file is None:
+            self.head += data
+            if len(self.head) >= SNIFF_BYTES:
+                self._check_head()
+        else:
+            self.file.write(data)
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        # The parser seeks to 0 once the file part is complete
+        if self.file is None and self.filename and not self.error:
+            self._check_head()
+        return self.file.seek(offset, whence) if self.file else 0
+
+    def tell(self):
+        return self.file.tell() if self.file else 0
+
+    def read(self, size=-1):
+        return self.file.read(size) if self.file else b''
+
+    def store(self):
+        """Move the received file into the object store. Returns (sha256, size)."""
+        from utils.file_store import place_object
+
+        if self.file is None:
+            self.seek(0)
+        if self.error or self.file is None:
+            raise ValueError(self.error or 'no file was uploaded')
+        self.file.close()
+        self.file = None
+        sha256 = self.digest.hexdigest()
+        place_object(self.temp_path, sha256)
+        self.temp_path = None
+        return sha256, self.size
+
+    def _discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+        self.temp_path = None
+
+    def close(self):
+        # Called when the request ends; anything not stored is thrown away
+        self._discard()
+
+
+class UploadRequest(Request):
+    """Request that streams file uploads through UploadStream instead of spooling them"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadStream(filename)